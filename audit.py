@@ -0,0 +1,158 @@
+"""Журнал действий администратора: рассылки, новости, удаления, ответы на вопросы, смена статусов.
+
+Таблица audit_log только пополняется: UPDATE и DELETE запрещены триггерами (см. db.py).
+Обработчик не ждёт записи в базу: AuditLog.record() кладёт запись в буфер в памяти, а фоновый
+поток пишет накопленное пачками (одна транзакция на пачку) раз в FLUSH_INTERVAL секунд или
+сразу, когда набралось MAX_BATCH записей. При ошибке записи пачка возвращается в буфер
+и повторяется на следующем проходе; при остановке процесса буфер дописывается (atexit).
+
+Рассылка порождает две записи с общей меткой ref: действие (сколько получателей
+запланировано) и итог доставки (сколько доставлено и не доставлено).
+"""
+import collections
+import json
+import logging
+import secrets
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+FLUSH_INTERVAL = 1.0  # сек
+MAX_BATCH = 500
+PAGE_SIZE = 15       # записей на странице /audit
+DEFAULT_DAYS = 7     # /audit без дат — последние 7 дней
+PREVIEW_LEN = 100    # сколько символов текста рассылки или ответа сохраняется в details
+# Длина цели и сведений в строке /audit: в target бывает весь список ID (/setstatus, сводка
+# новостей), а страница из PAGE_SIZE строк должна уместиться в 4096 символов сообщения
+TARGET_LEN = 40
+DETAILS_LEN = 120
+
+logger = logging.getLogger("audit")
+
+
+def new_ref():
+    """Метка, связывающая действие и итог его доставки."""
+    return secrets.token_hex(4)
+
+
+def preview(text, limit=PREVIEW_LEN):
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class AuditLog:
+    """Буфер записей журнала с фоновой записью пачками.
+
+    write(rows) — запись пачки строк (created_at, admin_id, action, target, recipients, ref, details)
+    одной транзакцией (обычно db.append_audit). Поток запускается лениво при первой записи.
+    """
+
+    def __init__(self, write, flush_interval=FLUSH_INTERVAL, max_batch=MAX_BATCH):
+        self.write = write
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._buffer = collections.deque()
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def record(self, action, admin_id=None, target=None, recipients=None, ref=None, **details):
+        """Добавить запись в буфер. Время фиксируется здесь (UTC, как CURRENT_TIMESTAMP)."""
+        self._buffer.append((datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), admin_id, action,
+                             None if target is None else str(target), recipients, ref,
+                             json.dumps(details, ensure_ascii=False) if details else None))
+        self._ensure_started()
+        if len(self._buffer) >= self.max_batch:
+            self._wake.set()
+
+    def pending(self):
+        return len(self._buffer)
+
+    def flush(self):
+        """Записать всё накопленное. Возвращает число записанных строк."""
+        written = 0
+        with self._flush_lock:
+            while self._buffer:
+                batch = []
+                while self._buffer and len(batch) < self.max_batch:
+                    batch.append(self._buffer.popleft())
+                try:
+                    self.write(batch)
+                except Exception:
+                    logger.exception("Ошибка записи журнала действий, повтор на следующем проходе",
+                                     extra={"rows": len(batch)})
+                    self._buffer.extendleft(reversed(batch))
+                    break
+                written += len(batch)
+        return written
+
+    def _ensure_started(self):
+        if self._thread:
+            return
+        with self._start_lock:
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, name="audit", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+def parse_range(args, today=None):
+    """Аргументы /audit «[ДД.ММ[.ГГГГ]] [ДД.ММ[.ГГГГ]]» → (первый день, последний день).
+    Без аргументов — последние DEFAULT_DAYS дней; одна дата — только этот день.
+    ValueError — при ошибке."""
+    today = today or date.today()
+    days = []
+    for arg in args:
+        # Без года дата разбирается сразу с текущим: strptime без года берёт 1900-й, и 29.02 не проходит
+        full = arg if arg.count(".") == 2 else f"{arg}.{today.year}"
+        try:
+            days.append(datetime.strptime(full, "%d.%m.%Y").date())
+        except ValueError:
+            raise ValueError(f"неверная дата: {arg}") from None
+    if len(days) > 2:
+        raise ValueError("укажите не больше двух дат")
+    if not days:
+        return today - timedelta(days=DEFAULT_DAYS - 1), today
+    first, last = days[0], days[-1]
+    if first > last:
+        raise ValueError("начало периода позже конца")
+    return first, last
+
+
+def utc_bounds(first, last):
+    """Границы периода [first 00:00, last+1 00:00) местного времени в UTC-строках created_at."""
+    def to_utc(day):
+        local = datetime.combine(day, datetime.min.time()).astimezone()
+        return local.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    return to_utc(first), to_utc(last + timedelta(days=1))
+
+
+def format_entry(row):
+    """Строка журнала для /audit; row — (id, created_at, admin_id, action, target, recipients, ref, details).
+    Длинные цель и сведения сокращаются (полностью они есть в /export audit)."""
+    entry_id, created_at, admin_id, action, target, recipients, ref, details = row
+    when = datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).astimezone()
+    parts = [f"{when:%d.%m %H:%M}", action]
+    if target:
+        parts.append(f"#{preview(target, TARGET_LEN)}")
+    if recipients is not None:
+        parts.append(f"→ {recipients}")
+    if details:
+        parts.append(preview(", ".join(f"{k}={v}" for k, v in json.loads(details).items()), DETAILS_LEN))
+    if admin_id:
+        parts.append(f"(админ {admin_id})")
+    if ref:
+        parts.append(f"[{ref}]")
+    return " ".join(parts)
+
+
+def format_page(rows, first, last):
+    header = f"Журнал действий {first:%d.%m.%Y}–{last:%d.%m.%Y} (время местное):"
+    if not rows:
+        return header + "\nЗаписей нет."
+    return header + "\n" + "\n".join(format_entry(row) for row in rows)
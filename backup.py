@@ -0,0 +1,181 @@
+"""Онлайн-резервное копирование базы без остановки бота: sqlite3 backup() небольшими шагами,
+сжатые снимки с ротацией.
+
+Копия снимается через то же соединение, через которое пишет бот (db.conn): изменения, сделанные
+во время копирования, SQLite переносит в копию сам, а блокировка держится только на время
+одного шага (BACKUP_PAGES страниц). Записи других процессов (workers.py пишет в базу на каждый
+апдейт) перезапускают копирование с начала; после MAX_RESTARTS перезапусков база копируется
+через отдельное соединение за один шаг — в режиме WAL это одна читающая транзакция, писатели
+её не ждут. Число перезапусков пишется в лог.
+
+Настройки (.env): BACKUP_DIR (по умолчанию backups), BACKUP_KEEP — сколько снимков хранить,
+BACKUP_PAGES — страниц за шаг, BACKUP_TIME — время ежедневного снимка (ЧЧ:ММ).
+"""
+import gzip
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+DEFAULT_DIR = "backups"
+DEFAULT_KEEP = 7
+DEFAULT_PAGES = 256      # страниц за шаг (1 МБ при странице 4 КБ)
+DEFAULT_SLEEP = 0.005    # пауза между шагами, сек: писатели успевают взять блокировку
+DEFAULT_TIME = "03:30"
+MAX_RESTARTS = 3         # перезапусков пошагового копирования до копирования за один шаг
+SUFFIX = ".sqlite.gz"
+
+logger = logging.getLogger("backup")
+_lock = threading.Lock()
+
+
+class BackupResult(NamedTuple):
+    path: str
+    db_size: int          # размер копии базы, байт
+    compressed_size: int  # размер сжатого снимка, байт
+    pages: int
+    seconds: float
+    removed: tuple        # снимки, удалённые ротацией
+    kept: int             # сколько снимков осталось
+
+
+def backup_settings():
+    """Настройки из окружения: (каталог, сколько хранить, страниц за шаг)."""
+    return (os.getenv("BACKUP_DIR", DEFAULT_DIR),
+            int(os.getenv("BACKUP_KEEP", DEFAULT_KEEP)),
+            int(os.getenv("BACKUP_PAGES", DEFAULT_PAGES)))
+
+
+def snapshot_name(db_file, when=None, n=0):
+    """«bot_data-20261019-033000.sqlite.gz»; n-й повтор в ту же секунду — «…-033000-n.sqlite.gz»."""
+    base = os.path.splitext(os.path.basename(db_file))[0]
+    return f"{base}-{(when or datetime.now()):%Y%m%d-%H%M%S}{f'-{n}' if n else ''}{SUFFIX}"
+
+
+def _snapshots(directory, db_file):
+    """[((метка времени, номер повтора), путь), ...] снимков базы db_file в каталоге. Имя должно
+    полностью совпадать с шаблоном snapshot_name: снимки «bot_data-test» не считаются снимками «bot_data»."""
+    base = os.path.splitext(os.path.basename(db_file))[0]
+    pattern = re.compile(rf"{re.escape(base)}-(\d{{8}}-\d{{6}})(?:-(\d+))?{re.escape(SUFFIX)}")
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        match = pattern.fullmatch(name)
+        if match:
+            found.append(((match.group(1), int(match.group(2) or 0)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def new_snapshot_path(directory, db_file, when=None):
+    """Путь для нового снимка. Снимок той же секунды не перезаписывается: новый получает номер
+    больше, чем у всех снимков этой секунды, и остаётся последним при сортировке."""
+    when = when or datetime.now()
+    stamp = f"{when:%Y%m%d-%H%M%S}"
+    taken = [n for (s, n), _path in _snapshots(directory, db_file) if s == stamp]
+    return os.path.join(directory, snapshot_name(db_file, when, max(taken) + 1 if taken else 0))
+
+
+def list_snapshots(directory, db_file):
+    """Снимки базы db_file в каталоге, от старых к новым."""
+    return [path for _key, path in _snapshots(directory, db_file)]
+
+
+def rotate(directory, db_file, keep):
+    """Удалить старые снимки, оставив keep последних. Возвращает удалённые пути."""
+    snapshots = list_snapshots(directory, db_file)
+    removed = snapshots[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return tuple(removed)
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def copy_database(conn, db_file, target, pages=DEFAULT_PAGES, sleep=DEFAULT_SLEEP, max_restarts=MAX_RESTARTS):
+    """Скопировать базу в соединение target. Сначала — шагами по pages страниц через conn;
+    если запись другого процесса перезапустила копирование больше max_restarts раз — за один шаг
+    через отдельное соединение с db_file. Возвращает (страниц, перезапусков, за один ли шаг)."""
+    progress = {"total": 0, "remaining": None, "restarts": 0}
+
+    def on_progress(status, remaining, total):
+        progress["total"] = total
+        # Оставшихся страниц стало больше — копирование началось заново
+        if progress["remaining"] is not None and remaining > progress["remaining"]:
+            progress["restarts"] += 1
+            if progress["restarts"] > max_restarts:
+                raise _TooManyRestarts()
+        progress["remaining"] = remaining
+
+    try:
+        conn.backup(target, pages=pages, progress=on_progress, sleep=sleep)
+        return progress["total"], progress["restarts"], False
+    except _TooManyRestarts:
+        logger.warning("Пошаговое копирование перезапускалось %d раз, копирование за один шаг",
+                       progress["restarts"], extra={"restarts": progress["restarts"]})
+    source = sqlite3.connect(db_file, timeout=30)
+    try:
+        source.backup(target, pages=-1)
+        total = source.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        source.close()
+    return total, progress["restarts"], True
+
+
+def create_snapshot(conn, db_file, directory=DEFAULT_DIR, keep=DEFAULT_KEEP, pages=DEFAULT_PAGES,
+                    sleep=DEFAULT_SLEEP):
+    """Скопировать базу через соединение conn в сжатый снимок и выполнить ротацию.
+    Копия проверяется (PRAGMA quick_check) до сжатия. RuntimeError — если копирование
+    уже идёт в этом процессе."""
+    if not _lock.acquire(blocking=False):
+        raise RuntimeError("резервное копирование уже выполняется")
+    started = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    path = new_snapshot_path(directory, db_file)
+    raw = path[:-len(".gz")] + ".tmp"
+    try:
+        target = sqlite3.connect(raw)
+        try:
+            total, restarts, single_step = copy_database(conn, db_file, target, pages, sleep)
+            check = target.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            target.close()
+        if check != "ok":
+            raise RuntimeError(f"копия базы повреждена: {check}")
+        db_size = os.path.getsize(raw)
+        with open(raw, "rb") as src, gzip.open(path + ".part", "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(path + ".part", path)
+    finally:
+        for leftover in (raw, path + ".part"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        _lock.release()
+    removed = rotate(directory, db_file, keep)
+    result = BackupResult(path, db_size, os.path.getsize(path), total,
+                          time.perf_counter() - started, removed, len(list_snapshots(directory, db_file)))
+    logger.info("Резервная копия создана", extra={"path": path, "db_size": db_size,
+                                                   "compressed_size": result.compressed_size,
+                                                   "pages": result.pages, "latency_ms": round(result.seconds * 1000, 1),
+                                                   "restarts": restarts, "single_step": single_step,
+                                                   "removed": len(removed)})
+    return result
+
+
+def format_size(size):
+    """Размер в байтах → «512 Б», «1.4 МБ»."""
+    if size < 1024:
+        return f"{size} Б"
+    for unit in ("КБ", "МБ", "ГБ"):
+        size /= 1024
+        if size < 1024 or unit == "ГБ":
+            return f"{size:.1f} {unit}"
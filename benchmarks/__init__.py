@@ -0,0 +1 @@
+"""Офлайн-бенчмарки бота (запуск из корня репозитория: python -m benchmarks.<имя>)."""
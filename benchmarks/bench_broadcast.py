@@ -0,0 +1,77 @@
+"""Бенчмарк рассылки: пропускная способность RateLimitedSender при разном HTTP-транспорте.
+
+    python -m benchmarks.bench_broadcast --messages 10000
+    python -m benchmarks.bench_broadcast --delay 0.05 --workers 8 --json broadcast.json
+
+Рассылка --messages сообщений разным чатам через bot.send_message против локального фейкового
+API с задержкой ответа --delay (имитация RTT до api.telegram.org). Ограничение скорости снято
+(--rate), чтобы мерить сам транспорт. Варианты:
+- telebot, 1 поток — транспорт telebot по умолчанию и один поток отправки (как было раньше);
+- telebot, N потоков — Session в каждом потоке, пересоздаётся раз в SESSION_TIME_TO_LIVE;
+- пул, N потоков — общий Session с пулом соединений (transport.py).
+Печатается время, сообщений в секунду и сколько TCP-соединений принял фейковый API.
+"""
+import argparse
+import sys
+import time
+
+import telebot
+from telebot import apihelper
+
+import transport
+from benchmarks.fake_api import FakeTelegramAPI
+from benchmarks.harness import BENCH_TOKEN, format_table, save_report
+from delivery import RateLimitedSender
+
+
+def use_default_transport():
+    apihelper.session = None
+    apihelper.SESSION_TIME_TO_LIVE = 600
+    apihelper.CONNECT_TIMEOUT, apihelper.READ_TIMEOUT = 15, 30
+
+
+def run_broadcast(api, name, workers, messages, rate, pooled, pool_size):
+    if pooled:
+        transport.install(transport.build_session(pool_size))
+    else:
+        use_default_transport()
+    bot = telebot.TeleBot(BENCH_TOKEN)
+    sender = RateLimitedSender(bot.send_message, rate=rate, workers=workers)
+    connections, sent = api.connections, api.calls["sendMessage"]
+    started = time.perf_counter()
+    batch = sender.submit_batch((chat_id, f"Новость #{chat_id}") for chat_id in range(1, messages + 1))
+    batch.wait()
+    seconds = time.perf_counter() - started
+    return {"transport": name, "workers": workers, "seconds": seconds, "msg_per_s": messages / seconds,
+            "delivered": batch.delivered, "failed": batch.failed,
+            "api_calls": api.calls["sendMessage"] - sent, "connections": api.connections - connections}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--delay", type=float, default=0.02, help="задержка ответа фейкового API, сек")
+    parser.add_argument("--workers", type=int, default=8, help="потоков отправки в многопоточных вариантах")
+    parser.add_argument("--rate", type=float, default=1e6, help="ограничение скорости, сообщений/с")
+    parser.add_argument("--pool-size", type=int, default=transport.DEFAULT_POOL_SIZE)
+    parser.add_argument("--json", help="сохранить отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    variants = [("telebot", 1, False), ("telebot", args.workers, False), ("пул", args.workers, True)]
+    rows = []
+    with FakeTelegramAPI(delay=args.delay) as api:
+        apihelper.API_URL = api.api_url
+        for name, workers, pooled in variants:
+            rows.append(run_broadcast(api, name, workers, args.messages, args.rate, pooled, args.pool_size))
+    use_default_transport()
+
+    print(f"{args.messages} сообщений, задержка API {args.delay * 1000:.0f} мс")
+    print(format_table(rows, [("transport", None), ("workers", None), ("seconds", "{:.2f}"),
+                              ("msg_per_s", "{:.0f}"), ("failed", None), ("connections", None)]))
+    if args.json:
+        save_report({"args": vars(args), "runs": rows}, args.json)
+    return 0 if all(r["failed"] == 0 for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Нагрузочный бенчмарк функций db.py на нескольких масштабах данных.
+
+    python -m benchmarks.bench_db --scales 1000,10000,100000 --requests-per-user 10
+
+Для каждой функции печатается медианное время вызова на каждом масштабе и
+показатель роста k (время ~ n^k между соседними масштабами). Функции с k выше
+--max-exponent помечаются как сверхлинейные; в этом случае код возврата 1.
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from benchmarks.datagen import USER_ID_BASE, open_db, populate
+from benchmarks.harness import format_table, save_report
+
+
+def _user(uid):
+    return SimpleNamespace(id=uid, first_name="Тест", last_name="Тестов", username=f"user{uid}")
+
+
+def build_cases(db, ctx):
+    """Список (имя, вызов без аргументов) для всех публичных функций db.py."""
+    rng = ctx.rng
+
+    def uid():
+        return USER_ID_BASE + rng.randrange(ctx.users)
+
+    def answer_one():
+        qid = ctx.open_questions.pop() if ctx.open_questions else 0
+        db.answer_question(qid, "Ответ")
+
+    def delete_faq():
+        db.add_faq("Временный вопрос?", "Временный ответ.")
+        db.delete_faq(db.cur.lastrowid)
+
+    def delete_resource():
+        db.add_resource("Временный", "https://example.org/tmp")
+        db.delete_resource(db.cur.lastrowid)
+
+    def delete_news():
+        db.add_news("Временная новость")
+        db.delete_news(db.cur.lastrowid)
+
+    return [
+        ("ensure_user", lambda: db.ensure_user(_user(uid()))),
+        ("update_user_group", lambda: db.update_user_group(uid(), "ПИ-21")),
+        ("update_user_subgroup", lambda: db.update_user_subgroup(uid(), 1)),
+        ("toggle_notify", lambda: db.toggle_notify(uid())),
+        ("toggle_reminders", lambda: db.toggle_reminders(uid())),
+        ("get_user_group_sub", lambda: db.get_user_group_sub(uid())),
+        ("get_user_profile", lambda: db.get_user_profile(uid())),
+        ("add_question", lambda: db.add_question(uid(), "Вопрос из бенчмарка")),
+        ("get_unanswered_questions", db.get_unanswered_questions),
+        ("answer_question", answer_one),
+        ("get_all_faq", db.get_all_faq),
+        ("add_faq", lambda: db.add_faq("Вопрос?", "Ответ.")),
+        ("delete_faq", delete_faq),
+        ("get_all_resources", db.get_all_resources),
+        ("add_resource", lambda: db.add_resource("Ресурс", "https://example.org")),
+        ("delete_resource", delete_resource),
+        ("insert_request", lambda: db.insert_request(uid(), "spravka", "Иван Иванов", "ПИ-21", "для стипендии")),
+        ("get_requests_by_user", lambda: db.get_requests_by_user(uid())),
+        ("get_all_news", db.get_all_news),
+        ("add_news", lambda: db.add_news("Новость из бенчмарка")),
+        ("delete_news", delete_news),
+        ("get_all_user_ids", db.get_all_user_ids),
+        ("get_users_for_notify", db.get_users_for_notify),
+        ("get_users_for_reminders", db.get_users_for_reminders),
+        ("get_stats", db.get_stats),
+    ]
+
+
+def measure(fn, min_time=0.2, max_repeats=200, min_repeats=3):
+    """Медианное время одного вызова fn (секунды)."""
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_repeats:
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+        if len(samples) >= min_repeats and time.perf_counter() - started > min_time:
+            break
+    return statistics.median(samples)
+
+
+def run_scale(tmp, users, requests_per_user, seed, min_time):
+    db = open_db(os.path.join(tmp, f"bench_{users}.sqlite"))
+    timings = populate(db.conn, users=users, requests=users * requests_per_user, seed=seed)
+    load_s = sum(seconds for _, seconds in timings.values())
+    rng = random.Random(seed)
+    open_questions = [row[0] for row in db.cur.execute("SELECT id FROM questions WHERE answered=0 LIMIT 1000")]
+    rng.shuffle(open_questions)
+    ctx = SimpleNamespace(rng=rng, users=users, open_questions=open_questions)
+    result = {name: measure(fn, min_time=min_time) for name, fn in build_cases(db, ctx)}
+    db.conn.close()
+    return result, load_s
+
+
+def growth_exponent(n1, t1, n2, t2):
+    if t1 <= 0 or t2 <= 0:
+        return 0.0
+    return math.log(t2 / t1) / math.log(n2 / n1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1000,10000,100000", help="числа пользователей через запятую")
+    parser.add_argument("--requests-per-user", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--min-time", type=float, default=0.2, help="минимальное время замера функции, сек")
+    parser.add_argument("--max-exponent", type=float, default=1.3,
+                        help="порог показателя роста, выше которого функция считается сверхлинейной")
+    parser.add_argument("--json", help="сохранить отчёт в JSON")
+    args = parser.parse_args(argv)
+    scales = sorted(int(s) for s in args.scales.split(","))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for users in scales:
+            results[users], load_s = run_scale(tmp, users, args.requests_per_user, args.seed, args.min_time)
+            print(f"масштаб {users} пользователей / {users * args.requests_per_user} заявок: загрузка {load_s:.2f} с",
+                  file=sys.stderr)
+
+    rows = []
+    flagged = []
+    for name in results[scales[0]]:
+        row = {"function": name}
+        exponents = []
+        for i, users in enumerate(scales):
+            row[f"n={users}"] = results[users][name] * 1000
+            if i:
+                prev = scales[i - 1]
+                exponents.append(growth_exponent(prev, results[prev][name], users, results[users][name]))
+        k = max(exponents) if exponents else 0.0
+        row["k"] = k
+        row["flag"] = "СВЕРХЛИНЕЙНО" if k > args.max_exponent else ""
+        if row["flag"]:
+            flagged.append(name)
+        rows.append(row)
+
+    columns = [("function", None)] + [(f"n={u}", "{:.3f}") for u in scales] + [("k", "{:.2f}"), ("flag", None)]
+    print("Время вызова, мс (медиана); k — показатель роста времени от числа пользователей")
+    print(format_table(rows, columns))
+    if args.json:
+        save_report({"scales": scales, "requests_per_user": args.requests_per_user, "rows": rows}, args.json)
+    if flagged:
+        print(f"\nСверхлинейный рост: {', '.join(flagged)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Бенчмарк пакетного построения расписаний: на месте против пула процессов (render_pool.py).
+
+    python -m benchmarks.bench_render --groups 300 --processes 4 --sizes 10,100,1000,5000,20000
+
+Для каждого размера пакета печатается время на месте и в (прогретом) пуле, ускорение и
+точка окупаемости — минимальный размер пакета, с которого пул быстрее. Её стоит
+использовать как RENDER_POOL_MIN_BATCH.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from benchmarks.harness import format_table, save_report
+from datetime import date, timedelta
+
+from render_pool import RenderPool
+from schedule_engine import ScheduleSource, default_semester_start
+from timetable import WEEK_DAYS
+
+SLOTS = ["08:30-10:00", "10:15-11:45", "12:00-13:30", "14:00-15:30", "15:45-17:15"]
+SUBJECTS = ["Математический анализ", "Физика", "Программирование", "Английский язык",
+            "Алгоритмы и структуры данных", "Линейная алгебра", "История", "Философия"]
+
+
+def synth_source(groups, seed=1):
+    """Синтетическое расписание: groups групп × 6 дней × до 5 пар, часть — по подгруппам
+    и только по чётным или нечётным неделям."""
+    rng = random.Random(seed)
+    lessons = []
+    for g in range(groups):
+        name = f"ГР-{g:04d}"
+        for day in WEEK_DAYS:
+            for slot in SLOTS[:rng.randint(2, 5)]:
+                lessons.append((name, day, slot, rng.choice((0, 0, 1, 2)), rng.choice(SUBJECTS),
+                                rng.choice((None, None, None, 0, 1))))
+    return ScheduleSource(tuple(lessons), (), (), default_semester_start())
+
+
+def timed(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--groups", type=int, default=300)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--sizes", default="10,50,100,500,1000,5000,20000")
+    parser.add_argument("--kind", choices=["week", "day"], default="week")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="сохранить отчёт в JSON")
+    args = parser.parse_args(argv)
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+
+    source = synth_source(args.groups)
+    group_names = sorted({r[0] for r in source.lessons})
+    rng = random.Random(2)
+    days = [date.today() + timedelta(days=i) for i in range(14)]
+
+    def make_keys(n):
+        return [(rng.choice(group_names), rng.choice((1, 2)), rng.choice(days)) for _ in range(n)]
+
+    inline = RenderPool(processes=0)
+    inline.set_source(source)
+    pool = RenderPool(processes=args.processes, min_batch=1)
+    pool.set_source(source, start=inline.engine.start)
+    t0 = time.perf_counter()
+    pool.warm_up()
+    startup = time.perf_counter() - t0
+
+    rows = []
+    crossover = None
+    try:
+        for n in sizes:
+            keys = make_keys(n)
+            assert inline.render_schedules(args.kind, keys) == pool.render_schedules(args.kind, keys)
+            t_inline = timed(lambda: inline.render_schedules(args.kind, keys), args.repeats)
+            t_pool = timed(lambda: pool.render_schedules(args.kind, keys), args.repeats)
+            speedup = t_inline / t_pool if t_pool else 0.0
+            if crossover is None and speedup > 1:
+                crossover = n
+            rows.append({"batch": n, "inline_ms": t_inline * 1000, "pool_ms": t_pool * 1000, "speedup": speedup})
+    finally:
+        pool.shutdown()
+
+    print(f"{len(source.lessons)} строк расписания, {len(group_names)} групп, {args.processes} процессов, "
+          f"старт пула {startup * 1000:.0f} мс, пакеты «{args.kind}»")
+    print(format_table(rows, [("batch", None), ("inline_ms", "{:.2f}"), ("pool_ms", "{:.2f}"), ("speedup", "{:.2f}")]))
+    if crossover is None:
+        print("\nПул не окупился ни на одном размере пакета.")
+    else:
+        print(f"\nПул окупается с пакетов от ~{crossover} ключей (RENDER_POOL_MIN_BATCH={crossover}).")
+    if args.json:
+        save_report({"processes": args.processes, "startup_ms": startup * 1000, "rows": rows,
+                     "crossover": crossover}, args.json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
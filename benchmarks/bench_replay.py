@@ -0,0 +1,256 @@
+"""Офлайн-реплей апдейтов Telegram через bot.py против локального фейкового API.
+
+Примеры:
+    python -m benchmarks.bench_replay --users 200 --updates 5000
+    python -m benchmarks.bench_replay --record stream.jsonl          # сохранить сгенерированный поток
+    python -m benchmarks.bench_replay --replay stream.jsonl          # воспроизвести записанный поток
+    python -m benchmarks.bench_replay --json out.json --baseline base.json
+
+Отчёт: p50/p95/p99 задержки обработчика по типам апдейтов и апдейтов в секунду.
+При --baseline возвращает код 1, если p95 какого-либо типа вырос сильнее --tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_api import FakeTelegramAPI
+from benchmarks.harness import (
+    BENCH_ADMIN_ID, compare_with_baseline, format_table, load_bot, load_report,
+    save_report, summarize,
+)
+
+GROUPS = [("ПИ-21", 1), ("ПИ-21", 2), ("ПИ-22", 1), ("ПИ-22", 2), ("ПИ-23", 1)]
+FIRST_NAMES = ["Анна", "Борис", "Вера", "Глеб", "Дарья", "Егор", "Жанна", "Илья"]
+QUESTIONS = [
+    "Когда начнется экзаменационная сессия?",
+    "Где можно посмотреть расписание занятий?",
+    "Как получить справку для военкомата?",
+    "Можно ли перенести пересдачу?",
+    "Кто куратор нашей группы?",
+]
+WIZARDS = {
+    "spravka": ["Иван Иванов", "ПИ-21", "для стипендии"],
+    "otsrochka": ["Петр Петров", "ПИ-22", "болезнь"],
+    "hvost": ["Анна Смирнова", "ПИ-23", "Математика"],
+}
+
+# Веса действий пользователя в синтетическом потоке
+ACTIONS = [
+    ("start", 8),
+    ("schedule_today", 22),
+    ("schedule_week", 14),
+    ("wizard", 12),
+    ("question", 18),
+    ("faq", 6),
+    ("faq_search", 3),
+    ("news", 6),
+    ("status", 6),
+    ("broadcast", 1),
+]
+
+
+class UpdateFactory:
+    """Конструктор JSON-апдейтов в формате Bot API."""
+
+    def __init__(self):
+        self.update_id = 0
+        self.message_id = 0
+
+    def _user(self, uid):
+        return {"id": uid, "is_bot": False, "first_name": FIRST_NAMES[uid % len(FIRST_NAMES)],
+                "username": f"user{uid}"}
+
+    def _message(self, uid, text):
+        self.message_id += 1
+        msg = {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "from": self._user(uid),
+            "chat": {"id": uid, "type": "private", "first_name": FIRST_NAMES[uid % len(FIRST_NAMES)]},
+            "text": text,
+        }
+        if text.startswith("/"):
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return msg
+
+    def message(self, uid, text):
+        self.update_id += 1
+        return {"update_id": self.update_id, "message": self._message(uid, text)}
+
+    def callback(self, uid, data):
+        self.update_id += 1
+        msg = self._message(uid, "Выберите тип заявки:")
+        msg["from"] = {"id": 1000000, "is_bot": True, "first_name": "BenchBot"}
+        return {"update_id": self.update_id, "callback_query": {
+            "id": str(self.update_id), "from": self._user(uid), "message": msg,
+            "chat_instance": str(uid), "data": data,
+        }}
+
+
+def synthesize(users, count, seed=1, admin_id=BENCH_ADMIN_ID):
+    """Сгенерировать поток [(kind, update)] с реалистичной смесью и перемежением диалогов."""
+    rng = random.Random(seed)
+    factory = UpdateFactory()
+    uids = [100 + i for i in range(users)]
+    pending = {}  # uid -> оставшиеся шаги мастера заявки
+    stream = []
+    # Каждый пользователь сначала регистрируется и указывает группу
+    for uid in uids:
+        grp, sub = GROUPS[uid % len(GROUPS)]
+        stream.append(("start", factory.message(uid, "/start")))
+        stream.append(("setup", factory.message(uid, f"/setgroup {grp}")))
+        stream.append(("setup", factory.message(uid, f"/setsub {sub}")))
+    names, weights = zip(*ACTIONS)
+    while len(stream) < count:
+        uid = rng.choice(uids)
+        steps = pending.get(uid)
+        if steps:
+            kind, text = steps.pop(0)
+            stream.append((kind, factory.message(uid, text)))
+            if not steps:
+                pending.pop(uid)
+            continue
+        action = rng.choices(names, weights)[0]
+        if action == "start":
+            stream.append(("start", factory.message(uid, "/start")))
+        elif action == "schedule_today":
+            stream.append(("schedule_today", factory.message(uid, "📅 Расписание (сегодня)")))
+        elif action == "schedule_week":
+            stream.append(("schedule_week", factory.message(uid, "📅 Расписание (неделя)")))
+        elif action == "wizard":
+            req_type = rng.choice(list(WIZARDS))
+            kind = f"wizard_{req_type}"
+            if rng.random() < 0.5:
+                stream.append((kind, factory.message(uid, f"/{req_type}")))
+            else:
+                stream.append((kind, factory.callback(uid, f"req_{req_type}")))
+            pending[uid] = [(kind, text) for text in WIZARDS[req_type]]
+        elif action == "question":
+            stream.append(("question", factory.message(uid, rng.choice(QUESTIONS))))
+        elif action == "faq_search":
+            stream.append(("faq_search", factory.message(uid, "/faq " + rng.choice(QUESTIONS))))
+        elif action == "broadcast":
+            stream.append(("broadcast", factory.message(admin_id, "/anons Плановое объявление")))
+        else:
+            stream.append((action, factory.message(uid, f"/{action}")))
+    return stream[:count]
+
+
+def classify(update):
+    """Определить тип записанного апдейта без метки kind."""
+    if "callback_query" in update:
+        return "callback"
+    text = (update.get("message") or {}).get("text") or ""
+    if text.startswith("/"):
+        return text.split()[0][1:].split("@")[0]
+    if text.startswith("📅"):
+        return "schedule_button"
+    return "text"
+
+
+def load_stream(path):
+    """Прочитать JSONL: строки вида {"kind": ..., "update": {...}} или сырые апдейты."""
+    stream = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            if "update" in obj:
+                stream.append((obj.get("kind") or classify(obj["update"]), obj["update"]))
+            else:
+                stream.append((classify(obj), obj))
+    return stream
+
+
+def save_stream(stream, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for kind, update in stream:
+            f.write(json.dumps({"kind": kind, "update": update}, ensure_ascii=False) + "\n")
+
+
+def replay(bot_module, stream, warmup=0):
+    """Прогнать поток через bot.process_new_updates, вернуть (задержки по kind, ошибки, время)."""
+    import telebot
+
+    latencies = {}
+    errors = {}
+    started = time.perf_counter()
+    for i, (kind, raw) in enumerate(stream):
+        update = telebot.types.Update.de_json(raw)
+        t0 = time.perf_counter()
+        try:
+            bot_module.bot.process_new_updates([update])
+        except Exception:
+            errors[kind] = errors.get(kind, 0) + 1
+        dt = time.perf_counter() - t0
+        if i >= warmup:
+            latencies.setdefault(kind, []).append(dt)
+    elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--api-delay", type=float, default=0.0, help="задержка фейкового API, сек")
+    parser.add_argument("--replay", help="JSONL с записанными апдейтами")
+    parser.add_argument("--record", help="сохранить сгенерированный поток в JSONL")
+    parser.add_argument("--json", help="сохранить отчёт в JSON")
+    parser.add_argument("--baseline", help="JSON-отчёт прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        stream = load_stream(args.replay)
+    else:
+        stream = synthesize(args.users, args.updates, args.seed)
+    if args.record:
+        save_stream(stream, args.record)
+
+    with tempfile.TemporaryDirectory() as tmp, FakeTelegramAPI(delay=args.api_delay) as api:
+        bot_module = load_bot(api.api_url, os.path.join(tmp, "bench.sqlite"))
+        latencies, errors, elapsed = replay(bot_module, stream, args.warmup)
+        bot_module.db.conn.close()
+        api_calls = dict(api.calls)
+
+    all_latencies = [x for values in latencies.values() for x in values]
+    by_kind = {kind: summarize(values) for kind, values in sorted(latencies.items())}
+    by_kind["ALL"] = summarize(all_latencies)
+    report = {
+        "updates": len(stream),
+        "elapsed_s": elapsed,
+        "updates_per_s": len(stream) / elapsed if elapsed else 0.0,
+        "errors": errors,
+        "api_calls": api_calls,
+        "latency": by_kind,
+    }
+
+    rows = [dict(kind=k, **v) for k, v in by_kind.items()]
+    print(format_table(rows, [("kind", None), ("count", None), ("p50_ms", "{:.2f}"),
+                              ("p95_ms", "{:.2f}"), ("p99_ms", "{:.2f}"), ("max_ms", "{:.2f}")]))
+    print(f"\n{report['updates']} апдейтов за {elapsed:.2f} с — {report['updates_per_s']:.0f} апд/с")
+    print(f"Вызовы API: {sum(api_calls.values())}, ошибки обработчиков: {sum(errors.values())}")
+    if args.json:
+        save_report(report, args.json)
+    if args.baseline:
+        regressions = compare_with_baseline(by_kind, load_report(args.baseline)["latency"],
+                                            tolerance=args.tolerance)
+        if regressions:
+            print("\nРегрессии относительно базовой линии:")
+            print("\n".join("  " + r for r in regressions))
+            return 1
+        print("\nРегрессий относительно базовой линии нет.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Бенчмарк запуска бота по фазам: импорт, настройки, база, бот, расписание, первый getUpdates.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --schedule schedule.xlsx --json startup.json
+
+Каждый прогон — отдельный процесс Python (холодный импорт) против фейкового API и новой
+временной базы; в очереди фейкового API лежит один апдейт /start, так что фаза first_poll
+включает ответ getUpdates и постановку обработчика. Печатается медиана и максимум по фазам.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.fake_api import FakeTelegramAPI
+from benchmarks.harness import BENCH_ADMIN_ID, BENCH_TOKEN, format_table, save_report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Код дочернего процесса: те же фазы, что в bot.main(), но без polling
+CHILD = """
+import json
+import bot
+bot.create_app()
+bot.get_render_pool()
+bot.first_poll()
+print(json.dumps(bot.startup_timer.as_dict()))
+"""
+
+
+def start_update(update_id):
+    user = {"id": 500 + update_id, "is_bot": False, "first_name": "Bench"}
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "chat": {"id": user["id"], "type": "private"},
+        "from": user, "text": "/start", "entities": [{"type": "bot_command", "offset": 0, "length": 6}]}}
+
+
+def run_once(api, tmp, n, schedule_file):
+    env = dict(os.environ, BOT_TOKEN=BENCH_TOKEN, ADMIN_ID=str(BENCH_ADMIN_ID),
+               DB_FILE=os.path.join(tmp, f"startup-{n}.sqlite"), TELEGRAM_API_URL=api.api_url, LOG_FILE="")
+    api.push_updates([start_update(n + 1)])
+    # Рабочий каталог с расписанием: bot.py ищет schedule.xlsx в текущем каталоге
+    workdir = os.path.join(tmp, f"run-{n}")
+    os.makedirs(workdir)
+    if schedule_file:
+        os.symlink(os.path.abspath(schedule_file), os.path.join(workdir, "schedule.xlsx"))
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=workdir, env=env, capture_output=True,
+                         text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--schedule", default=os.path.join(ROOT, "schedule.xlsx"),
+                        help="файл расписания (пусто — без расписания)")
+    parser.add_argument("--json", help="сохранить отчёт в JSON")
+    args = parser.parse_args(argv)
+    schedule_file = args.schedule if args.schedule and os.path.exists(args.schedule) else None
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp, FakeTelegramAPI() as api:
+        for n in range(args.runs):
+            runs.append(run_once(api, tmp, n, schedule_file))
+
+    phases = list(runs[0])
+    rows = [{"phase": name, "median_ms": statistics.median(r[name] for r in runs),
+             "max_ms": max(r[name] for r in runs)} for name in phases]
+    print(f"{args.runs} запусков, расписание: {schedule_file or 'нет'}")
+    print(format_table(rows, [("phase", None), ("median_ms", "{:.1f}"), ("max_ms", "{:.1f}")]))
+    if args.json:
+        save_report({"runs": runs, "phases": rows}, args.json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Генератор синтетических данных большого объёма для базы бота.
+
+Все вставки идут через executemany внутри одной транзакции на таблицу.
+
+    python -m benchmarks.datagen --db big.sqlite --users 100000 --requests 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+GROUP_PREFIXES = ["ПИ", "ИК", "БИ", "ФИ", "КП", "ПС"]
+FIRST_NAMES = ["Иван", "Петр", "Анна", "Мария", "Николай", "Сергей", "Алексей", "Ольга", "Дарья", "Егор"]
+LAST_NAMES = ["Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов"]
+REQUEST_TYPES = [("spravka", 5), ("otsrochka", 2), ("hvost", 3)]
+REQUEST_DETAILS = {
+    "spravka": ["для стипендии", "для военкомата", "для общежития", "по месту работы"],
+    "otsrochka": ["болезнь", "семейные обстоятельства", "участие в конференции"],
+    "hvost": ["Математика", "История", "Информатика", "Физика", "Английский язык"],
+}
+QUESTION_TEMPLATES = [
+    "Когда начнется экзаменационная сессия?",
+    "Где можно посмотреть расписание занятий?",
+    "Как восстановить пароль от электронной почты?",
+    "Когда будет пересдача по предмету {n}?",
+    "Можно ли получить справку до {n} числа?",
+]
+
+GROUPS = [f"{p}-{y}" for p in GROUP_PREFIXES for y in range(18, 26)]
+USER_ID_BASE = 1_000_000  # не пересекается с примерными пользователями из db.py
+
+
+def _ts(rng, now, days=365):
+    return (now - timedelta(seconds=rng.randrange(days * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def gen_users(rng, n):
+    for i in range(n):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        grp = rng.choice(GROUPS) if rng.random() < 0.9 else None
+        sub = rng.choice((1, 2)) if grp else None
+        yield (USER_ID_BASE + i, first, last, f"user{i}", grp, sub,
+               int(rng.random() < 0.4), int(rng.random() < 0.3))
+
+
+def gen_requests(rng, n, users, now):
+    types, weights = zip(*REQUEST_TYPES)
+    for _ in range(n):
+        uid = USER_ID_BASE + rng.randrange(users)
+        req_type = rng.choices(types, weights)[0]
+        created = _ts(rng, now)
+        yield (uid, req_type, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", rng.choice(GROUPS),
+               rng.choice(REQUEST_DETAILS[req_type]), "Принята", created, created)
+
+
+def gen_questions(rng, n, users, now, answered_share=0.7):
+    for _ in range(n):
+        uid = USER_ID_BASE + rng.randrange(users)
+        text = rng.choice(QUESTION_TEMPLATES).format(n=rng.randint(1, 30))
+        asked = _ts(rng, now)
+        if rng.random() < answered_share:
+            yield (uid, text, asked, 1, "Ответ администрации.", asked)
+        else:
+            yield (uid, text, asked, 0, None, None)
+
+
+def gen_news(rng, n, now):
+    for i in range(n):
+        yield (f"Объявление №{i}: изменения в расписании группы {rng.choice(GROUPS)}.", _ts(rng, now))
+
+
+def populate(conn, users=1000, requests=10000, questions=None, news=None, faq=50, resources=20, seed=1):
+    """Заполнить базу синтетическими данными. Возвращает словарь {таблица: (строк, секунд)}.
+
+    questions по умолчанию — users // 2, news — max(10, users // 100).
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    questions = users // 2 if questions is None else questions
+    news = max(10, users // 100) if news is None else news
+    plan = [
+        ("users", "INSERT OR IGNORE INTO users (user_id, first_name, last_name, username, group_name, subgroup, "
+                  "notify, reminders) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", gen_users(rng, users)),
+        ("requests", "INSERT INTO requests (user_id, type, name, group_name, details, status, created_at, "
+                     "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", gen_requests(rng, requests, users, now)),
+        ("questions", "INSERT INTO questions (user_id, question, asked_at, answered, answer, answered_at) "
+                      "VALUES (?, ?, ?, ?, ?, ?)", gen_questions(rng, questions, users, now)),
+        ("news", "INSERT INTO news (content, created_at) VALUES (?, ?)", gen_news(rng, news, now)),
+        ("faq", "INSERT INTO faq (question, answer) VALUES (?, ?)",
+         ((f"Вопрос FAQ №{i}?", f"Ответ на вопрос №{i}.") for i in range(faq))),
+        ("resources", "INSERT INTO resources (name, url) VALUES (?, ?)",
+         ((f"Ресурс {i}", f"https://example.org/{i}") for i in range(resources))),
+    ]
+    counts = {"users": users, "requests": requests, "questions": questions,
+              "news": news, "faq": faq, "resources": resources}
+    timings = {}
+    for table, sql, rows in plan:
+        t0 = time.perf_counter()
+        with conn:  # одна транзакция на таблицу
+            conn.executemany(sql, rows)
+        timings[table] = (counts[table], time.perf_counter() - t0)
+    return timings
+
+
+def open_db(path):
+    """Создать схему бота в файле path (db.init_db) и вернуть модуль db."""
+    import importlib
+
+    os.environ["DB_FILE"] = path
+    sys.modules.pop("db", None)
+    module = importlib.import_module("db")
+    module.init_db(path)
+    return module
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="путь к файлу базы (будет создан)")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=1000000)
+    parser.add_argument("--questions", type=int)
+    parser.add_argument("--news", type=int)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} уже существует")
+    db = open_db(args.db)
+    timings = populate(db.conn, args.users, args.requests, args.questions, args.news, seed=args.seed)
+    for table, (rows, seconds) in timings.items():
+        print(f"{table:10} {rows:>9} строк за {seconds:6.2f} с")
+    db.conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
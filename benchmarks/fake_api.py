@@ -0,0 +1,136 @@
+"""Локальный фейковый Telegram Bot API для бенчмарков без токена и сети."""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# Методы, которые в настоящем API возвращают объект Message
+MESSAGE_METHODS = {"sendMessage", "editMessageText", "editMessageReplyMarkup", "sendDocument", "forwardMessage"}
+
+BOT_USER = {"id": 1000000, "is_bot": True, "first_name": "BenchBot", "username": "bench_bot"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, как у api.telegram.org
+    disable_nagle_algorithm = True  # иначе заголовки и тело ждут delayed ACK (~40 мс)
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.api._lock:
+            self.server.api.connections += 1
+
+    def _params(self):
+        parts = urlsplit(self.path)
+        params = dict(parse_qsl(parts.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length)
+            ctype = self.headers.get("Content-Type", "")
+            if ctype.startswith("application/json"):
+                params.update(json.loads(body))
+            elif ctype.startswith("application/x-www-form-urlencoded"):
+                params.update(parse_qsl(body.decode("utf-8")))
+        return parts.path, params
+
+    def _handle(self):
+        path, params = self._params()
+        method = path.rsplit("/", 1)[-1]
+        result = self.server.api.dispatch(method, params)
+        payload = json.dumps({"ok": True, "result": result}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # клиент закрыл соединение (например, процесс бота остановлен) — не шумим
+
+
+class FakeTelegramAPI:
+    """HTTP-сервер, имитирующий ответы Bot API и считающий вызовы методов.
+
+    delay — искусственная задержка ответа в секундах (имитация сетевого RTT).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0):
+        self.delay = delay
+        self.calls = Counter()
+        self.connections = 0  # принятые TCP-соединения (без keep-alive — по одному на запрос)
+        self._lock = threading.Lock()
+        self._message_id = 0
+        self._updates = []
+        self._server = _Server((host, port), _Handler)
+        self._server.api = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self):
+        """Шаблон для telebot.apihelper.API_URL."""
+        return self.url + "/bot{0}/{1}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def push_updates(self, updates):
+        """Добавить апдейты, которые вернёт getUpdates."""
+        with self._lock:
+            self._updates.extend(updates)
+
+    def dispatch(self, method, params):
+        """Сформировать результат для метода API."""
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.calls[method] += 1
+            self._message_id += 1
+            message_id = self._message_id
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            offset = int(params.get("offset") or 0)
+            with self._lock:
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+                batch = self._updates[:100]
+            if not batch:
+                time.sleep(0.1)  # вместо настоящего long polling
+            return batch
+        if method in MESSAGE_METHODS:
+            chat_id = int(params.get("chat_id") or 0)
+            return {
+                "message_id": int(params.get("message_id") or message_id),
+                "date": int(time.time()),
+                "from": BOT_USER,
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return True
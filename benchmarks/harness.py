@@ -0,0 +1,105 @@
+"""Общие функции бенчмарков: перцентили, отчёты, сравнение с базовой линией."""
+import json
+import math
+
+
+def percentile(values, p):
+    """Перцентиль p (0..100) методом линейной интерполяции по отсортированной выборке."""
+    if not values:
+        return 0.0
+    data = sorted(values)
+    k = (len(data) - 1) * p / 100.0
+    lo = math.floor(k)
+    hi = math.ceil(k)
+    if lo == hi:
+        return data[lo]
+    return data[lo] + (data[hi] - data[lo]) * (k - lo)
+
+
+def summarize(latencies):
+    """Сводка по списку задержек в секундах (результат — в миллисекундах)."""
+    return {
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def format_table(rows, columns):
+    """Отформатировать список словарей как текстовую таблицу."""
+    header = [name for name, _ in columns]
+    lines = []
+    for row in rows:
+        cells = []
+        for name, fmt in columns:
+            value = row.get(name, "")
+            cells.append(fmt.format(value) if fmt and value != "" else str(value))
+        lines.append(cells)
+    widths = [max(len(h), *(len(r[i]) for r in lines)) if lines else len(h) for i, h in enumerate(header)]
+    out = ["  ".join(h.ljust(w) for h, w in zip(header, widths))]
+    out.append("  ".join("-" * w for w in widths))
+    for cells in lines:
+        out.append("  ".join(c.ljust(w) for c, w in zip(cells, widths)))
+    return "\n".join(out)
+
+
+def save_report(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load_report(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_with_baseline(current, baseline, metric="p95_ms", tolerance=0.25, min_abs_ms=0.5):
+    """Найти регрессии: ключи, где metric вырос больше чем на tolerance (доля) и на min_abs_ms.
+
+    current и baseline — словари {ключ: сводка summarize()}.
+    Возвращает список строк с описанием регрессий (пустой, если всё в порядке).
+    """
+    regressions = []
+    for key, base in baseline.items():
+        cur = current.get(key)
+        if not cur or metric not in base:
+            continue
+        old, new = base[metric], cur[metric]
+        if new - old > min_abs_ms and new > old * (1 + tolerance):
+            regressions.append(f"{key}: {metric} {old:.2f} → {new:.2f} ({(new / old - 1) * 100 if old else float('inf'):+.0f}%)")
+    return regressions
+
+
+BENCH_TOKEN = "123456:BENCHMARK-TOKEN"
+BENCH_ADMIN_ID = 999999
+
+
+def load_bot(api_url, db_file, admin_id=BENCH_ADMIN_ID):
+    """Импортировать bot.py и создать бота (create_app) против фейкового API и временной базы.
+
+    Обработчики выполняются синхронно (threaded=False), чтобы измерять
+    задержку каждого апдейта в вызывающем потоке.
+    """
+    import importlib
+    import os
+    import sys
+
+    import telebot
+
+    os.environ["BOT_TOKEN"] = BENCH_TOKEN
+    os.environ["ADMIN_ID"] = str(admin_id)
+    os.environ["DB_FILE"] = db_file
+    # Синтетический поток шлёт сообщения быстрее любого человека — защиту от флуда
+    # выключаем, если бенчмарк не задал её явно
+    os.environ.setdefault("FLOOD_RATE", "0")
+    os.environ.setdefault("DUPLICATE_WINDOW", "0")
+    telebot.apihelper.API_URL = api_url
+    for name in ("bot", "db"):
+        sys.modules.pop(name, None)
+    bot_module = importlib.import_module("bot")
+    bot_module.create_app()
+    bot_module.get_render_pool()  # расписание загружается заранее, а не в первом измеряемом апдейте
+    bot_module.bot.threaded = False
+    return bot_module
@@ -1,31 +1,154 @@
+import time
+
+from startup import HandlerRegistry, StartupTimer
+
+# Отсчёт времени запуска начинается до импорта telebot и модулей бота (фаза «import»)
+startup_timer = StartupTimer()
+
 import os
+import re
+import atexit
 import json
+import logging
 import threading
 import schedule
-import time
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
 
-import pandas as pd
 import telebot
 from dotenv import load_dotenv
 
+import audit
+import backup
 import db  # наш модуль с базой данных
+import digest
+import export
+import health
+import inline
+import logs
+import navigation
+import retention
+import schedule_engine
+import timetable
+import transport
+from delivery import DEFAULT_RATE as DELIVERY_RATE, DEFAULT_WORKERS, RateLimitedSender
+from flood import DEFAULT_BURST, DEFAULT_DUPLICATE_WINDOW, DEFAULT_RATE, FloodGuard
+from render_pool import DEFAULT_MIN_BATCH, RenderPool
+from workers import SharedState, SqliteHandlerBackend, instance_id
 
 # ——————————————————————————————————————————————————————
-# 1) Настройка и загрузка токена
+# 1) Настройка и создание бота (create_app)
 # ——————————————————————————————————————————————————————
-load_dotenv()
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-if not BOT_TOKEN:
-    raise Exception("Не найден токен BOT_TOKEN. Убедитесь, что .env содержит BOT_TOKEN=<ваш токен>")
-bot = telebot.TeleBot(BOT_TOKEN)
-
-# ID администратора (для привилегированных команд), задается в .env
-ADMIN_ID = os.getenv("ADMIN_ID")
-ADMIN_ID = int(ADMIN_ID) if ADMIN_ID else None
+# Импорт модуля ничего не запускает: обработчики только описываются (handlers), а бот,
+# база и расписание создаются в create_app() и при первом обращении. Поэтому модуль можно
+# импортировать без токена и сети (workers.py, benchmarks/).
+logger = logging.getLogger("bot")
+handlers = HandlerRegistry()
+
+bot = None          # telebot.TeleBot — создаётся в create_app()
+sender = None       # очередь исходящих рассылок с ограничением скорости (SEND_RATE в .env)
+flood_guard = None  # защита от флуда (настройки — в .env, см. flood.py)
+ADMIN_ID = None     # ID администратора (для привилегированных команд), задается в .env
+audit_log = None    # журнал действий администратора (audit.py), пишется фоновым потоком
+
+# Признаки жизни (health.py): отметки циклов polling и планировщика, перезапуск фоновых потоков
+heartbeats = health.Heartbeats()
+supervisor = health.ThreadSupervisor()
+
+FLOOD_WARNING = "⏳ Слишком много сообщений. Подождите немного и повторите."
+
+# Кнопки основной клавиатуры (/start); их повторное нажатие не считается дублем (flood.py)
+MENU_ROWS = (("📅 Расписание (сегодня)", "📅 Расписание (неделя)"),
+             ("📰 Новости", "❓ FAQ", "📖 Ресурсы"),
+             ("📝 Подать заявку", "📋 Мои заявки"),
+             ("💬 Задать вопрос", "👤 Мой профиль"))
+
+class FloodMiddleware(telebot.handler_backends.BaseMiddleware):
+    """Отбрасывает лишние апдейты до обработчиков, то есть до записи в базу и ответов."""
+
+    def __init__(self, guard):
+        super().__init__()
+        self.guard = guard
+        self.update_types = ['message', 'callback_query']
+
+    def pre_process(self, update, data):
+        if isinstance(update, telebot.types.CallbackQuery):
+            chat_id, text = update.from_user.id, None
+        else:
+            chat_id, text = update.chat.id, update.text
+        reason = self.guard.check(chat_id, text, awaiting_reply=awaiting_reply)
+        if reason is None:
+            return None
+        logger.info("Апдейт отброшен защитой от флуда", extra={"chat_id": chat_id, "reason": reason})
+        if reason == "rate" and self.guard.should_warn(chat_id):
+            sender.submit(chat_id, FLOOD_WARNING)
+        return telebot.handler_backends.CancelUpdate()
+
+    def post_process(self, update, data, exception):
+        pass
+
+def awaiting_reply(chat_id):
+    """Ждёт ли чат ответа на шаг диалога (зарегистрирован next-step обработчик)."""
+    backend = bot.next_step_backend
+    if isinstance(backend, SqliteHandlerBackend):
+        return backend.has_handlers(chat_id)
+    return chat_id in backend.handlers
+
+def track_polling(app):
+    """Отмечать в heartbeats каждый успешный getUpdates (цикл polling жив) и задержку апдейтов."""
+    get_updates = app.get_updates
+
+    def get_updates_tracked(*args, **kwargs):
+        updates = get_updates(*args, **kwargs)
+        dates = [u.message.date for u in updates if u.message]
+        heartbeats.beat("polling", updates=len(updates), lag_s=health.update_lag(dates))
+        return updates
+
+    app.get_updates = get_updates_tracked
+
+def create_app(token=None, flood_middleware=True):
+    """Создать бота: прочитать .env, открыть базу, зарегистрировать middleware и обработчики.
+    Расписание загружается лениво (get_render_pool). Повторный вызов возвращает того же бота.
+    flood_middleware=False — апдейты уже проверены защитой от флуда до обработчиков
+    (процессы-обработчики workers.py: проверку выполняет поллер)."""
+    global bot, sender, flood_guard, ADMIN_ID, audit_log
+    if bot is not None:
+        return bot
+    with startup_timer.phase("config"):
+        load_dotenv()
+        token = token or os.getenv("BOT_TOKEN")
+        if not token:
+            raise Exception("Не найден токен BOT_TOKEN. Убедитесь, что .env содержит BOT_TOKEN=<ваш токен>")
+        # Альтернативный адрес Bot API (локальный сервер Bot API или фейковый API бенчмарков)
+        if os.getenv("TELEGRAM_API_URL"):
+            telebot.apihelper.API_URL = os.getenv("TELEGRAM_API_URL")
+        # Общий пул соединений, таймауты и повторы для всех вызовов API (transport.py)
+        transport.configure_from_env()
+        ADMIN_ID = int(os.getenv("ADMIN_ID")) if os.getenv("ADMIN_ID") else None
+    with startup_timer.phase("db"):
+        db.init_db()
+        audit_log = audit.AuditLog(db.append_audit)
+        atexit.register(audit_log.flush)  # дописать буфер журнала при остановке
+    with startup_timer.phase("bot"):
+        app = telebot.TeleBot(token, use_class_middlewares=True)
+        sender = RateLimitedSender(app.send_message, rate=float(os.getenv("SEND_RATE", DELIVERY_RATE)),
+                                   workers=int(os.getenv("SEND_WORKERS", DEFAULT_WORKERS)))
+        flood_guard = FloodGuard(rate=float(os.getenv("FLOOD_RATE", DEFAULT_RATE)),
+                                 burst=int(os.getenv("FLOOD_BURST", DEFAULT_BURST)),
+                                 duplicate_window=float(os.getenv("DUPLICATE_WINDOW", DEFAULT_DUPLICATE_WINDOW)),
+                                 exempt=[ADMIN_ID] if ADMIN_ID else [],
+                                 repeatable=[text for row in MENU_ROWS for text in row])
+        if flood_middleware:
+            app.setup_middleware(FloodMiddleware(flood_guard))
+        handlers.register(app)
+        init_conversation_state(app)
+        # Запись в лог каждого обработанного апдейта: обработчик, пользователь, время, исход
+        logs.instrument_bot(app)
+        track_polling(app)
+        bot = app
+    return bot
 
 # Игнорируем все стикеры
-@bot.message_handler(content_types=['sticker'])
+@handlers.message_handler(content_types=['sticker'])
 def handle_sticker(m):
     return
 
@@ -33,70 +156,74 @@ def handle_sticker(m):
 # 2) Загрузка расписания из Excel
 # ——————————————————————————————————————————————————————
 SCHEDULE_FILE = "schedule.xlsx"
-try:
-    schedule_df = pd.read_excel(SCHEDULE_FILE, engine="openpyxl", sheet_name="Schedule")
-    # Убираем пробелы вокруг имён столбцов
-    schedule_df.columns = schedule_df.columns.str.strip()
-    # Проверяем, что теперь есть все нужные
-    expected = {'Group','Day','Time','Subgroup','Class'}
-    missing = expected - set(schedule_df.columns)
-    if missing:
-        raise KeyError(f"В файле {SCHEDULE_FILE} нет столбцов: {', '.join(missing)}")
-    # Для удобства: пустые Subgroup → NaN → оставить как есть
-    schedule_df['Subgroup'] = schedule_df['Subgroup'].fillna(0).astype(int)
-except FileNotFoundError:
-    print(f"⚠️ Файл {SCHEDULE_FILE} не найден — расписание недоступно.")
-    schedule_df = pd.DataFrame(columns=['Group','Day','Time','Subgroup','Class'])
-except KeyError as e:
-    print(f"❌ Ошибка структуры {SCHEDULE_FILE}: {e}")
-    schedule_df = pd.DataFrame(columns=['Group','Day','Time','Subgroup','Class'])
+
+def semester_start():
+    """Начало учебного года для подсчёта чётности недель (SEMESTER_START=ГГГГ-ММ-ДД в .env);
+    None — 1 сентября."""
+    value = os.getenv("SEMESTER_START")
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+def load_schedule_source(path=SCHEDULE_FILE):
+    """Прочитать книгу расписания (см. schedule_engine.py); при ошибке — пустое расписание
+    с сообщением в лог."""
+    try:
+        return schedule_engine.read_workbook(path, semester_start())
+    except FileNotFoundError:
+        logger.warning("Файл %s не найден — расписание недоступно", path)
+    except (KeyError, ValueError) as e:
+        logger.error("Ошибка структуры %s: %s", path, e)
+    return schedule_engine.empty_source(semester_start())
+
+def schedule_mtime(path=SCHEDULE_FILE):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+schedule_file_mtime = None
+schedule_reload_lock = threading.Lock()
+
+# Скомпилированное расписание и пакетное построение текстов (пул процессов включается через RENDER_PROCESSES)
+render_pool = None
+
+def get_render_pool():
+    """Пул построения расписаний. При первом обращении читает и компилирует schedule.xlsx
+    (фаза запуска «schedule»)."""
+    global render_pool, schedule_file_mtime
+    if render_pool is None:
+        with schedule_reload_lock:
+            if render_pool is None:
+                with startup_timer.phase("schedule"):
+                    pool = RenderPool(processes=int(os.getenv("RENDER_PROCESSES", "0")),
+                                      min_batch=int(os.getenv("RENDER_POOL_MIN_BATCH", str(DEFAULT_MIN_BATCH))))
+                    schedule_file_mtime = schedule_mtime()
+                    pool.set_source(load_schedule_source())
+                    render_pool = pool
+    return render_pool
+
+def current_schedule():
+    """Скомпилированное расписание, окно которого покрывает вчера и две недели вперёд
+    (при смене дат окно перекомпилируется)."""
+    pool = get_render_pool()
+    engine = pool.engine
+    today = date.today()
+    if not (engine.covers(today - timedelta(days=1)) and engine.covers(today + timedelta(days=14))):
+        with schedule_reload_lock:
+            engine = pool.engine
+            if not engine.covers(today + timedelta(days=14)):
+                engine = pool.set_source(engine.source)
+    return engine
 
 # Функции для получения расписания
+def get_day_schedule(group_name: str, subgroup: int, day: date) -> str:
+    # Строки "08:30-10:00  Математический анализ": общие занятия и занятия нужной подгруппы
+    return timetable.render_day(current_schedule(), group_name, subgroup, day)
+
 def get_today_schedule(group_name: str, subgroup: int) -> str:
-    days_map = {
-        0: "Понедельник",1: "Вторник",2: "Среда",
-        3: "Четверг",4: "Пятница",5: "Суббота",6: "Воскресенье"
-    }
-    today = days_map[datetime.now().weekday()]
-    df = schedule_df[
-        (schedule_df['Group'].str.lower() == group_name.lower()) &
-        (schedule_df['Day'] == today)
-    ]
-    # Фильтруем по подгруппе: показываем общие (Subgroup==0) и нужную подгруппу
-    df = df[(df['Subgroup'] == 0) | (df['Subgroup'] == subgroup)]
-    # Сортируем по времени
-    df = df.sort_values('Time')
-    # Формируем строки: "08:30-10:00  Математический анализ"
-    lines = [f"{row.Time}  {row.Class}" for _, row in df.iterrows()]
-    return "\n".join(lines)
+    return get_day_schedule(group_name, subgroup, date.today())
 
 def get_week_schedule(group_name: str, subgroup: int) -> dict:
-    result = {}
-    for day in ["Понедельник","Вторник","Среда","Четверг","Пятница","Суббота"]:
-        df = schedule_df[
-            (schedule_df['Group'].str.lower() == group_name.lower()) &
-            (schedule_df['Day'] == day)
-        ]
-        df = df[(df['Subgroup'] == 0) | (df['Subgroup'] == subgroup)]
-        df = df.sort_values('Time')
-        lines = [f"{row.Time}  {row.Class}" for _, row in df.iterrows()]
-        result[day] = "\n".join(lines) if lines else ""
-    return result
-
-def filter_by_subgroup(text: str, subgroup: int) -> str:
-    """Отфильтровать текст расписания по подгруппе (если указана 1 или 2)."""
-    if not subgroup or not text:
-        return text
-    lines_out = []
-    for line in text.splitlines():
-        if "(1 подгр" in line or "(2 подгр" in line:
-            # Оставляем только строки, относящиеся к выбранной подгруппе
-            if f"{subgroup} подгр" in line:
-                lines_out.append(line)
-        else:
-            # Строки без указания подгруппы показываем для всех
-            lines_out.append(line)
-    return "\n".join(lines_out).strip()
+    return timetable.render_week(current_schedule(), group_name, subgroup, date.today())
 
 # ——————————————————————————————————————————————————————
 # 3) Инициализация базы данных (вынесено в db.py)
@@ -113,7 +240,7 @@ REQUEST_LABELS = {
 # ——————————————————————————————————————————————————————
 # 4) Обработчики команд пользователя и меню
 # ——————————————————————————————————————————————————————
-@bot.message_handler(commands=['start'])
+@handlers.message_handler(commands=['start'])
 def cmd_start(m):
     uid = m.chat.id
     user = m.from_user
@@ -123,16 +250,21 @@ def cmd_start(m):
             "/setgroup <группа> — указать вашу учебную группу\n"
             "/setsub <1|2> — указать вашу подгруппу (если есть)\n"
             "/schedule — расписание на сегодня\n"
+            "/tomorrow — расписание на завтра\n"
+            "/now — какое занятие идёт сейчас\n"
+            "/next — следующее занятие\n"
             "/week — расписание на неделю\n"
             "/notify — вкл/выкл ежедневные уведомления расписания\n"
             "/reminders — вкл/выкл напоминания о дедлайнах и мотивации\n"
-            "/faq — часто задаваемые вопросы\n"
+            "/digest — новости сразу или сводкой раз в день\n"
+            "/faq [запрос] — часто задаваемые вопросы (или поиск по ним)\n"
             "/resources — полезные ссылки\n"
             "/spravka — заявка на справку\n"
             "/otsrochka — заявление на отсрочку\n"
             "/hvost — заявка на пересдачу\n"
             "/status — статус ваших заявок\n"
-            "/news — последние новости и объявления")
+            "/news — последние новости и объявления\n"
+            "В любом чате: @имя\\_бота <группа> [подгруппа] — расписание группы")
     text += ("\nТакже вы можете просто написать мне свой вопрос, и он будет передан администрации.")
     if ADMIN_ID and uid == ADMIN_ID:
         text += ("\n\n*Администратор:* "
@@ -146,17 +278,23 @@ def cmd_start(m):
                  "/list — посмотреть все категории\n"
                  "/questions — непрочитанные вопросы пользователей\n"
                  "/answer <id> — ответить на вопрос\n"
-                 "/stats — статистика использования")
+                 "/answerbulk — ответить на много вопросов сразу\n"
+                 "/requests — заявки студентов\n"
+                 "/setstatus <ID,...> <статус> — сменить статус заявок\n"
+                 "/inclass [ЧЧ:ММ] [ДД.ММ] — какие группы на занятиях в это время\n"
+                 "/reloadschedule — перечитать расписание и разослать изменения\n"
+                 "/stats — статистика использования\n"
+                 "/export <requests|questions|news|audit|users> [фильтр=значение] [csv|xlsx] — выгрузка в файл\n"
+                 "/backup — резервная копия базы\n"
+                 "/audit [ДД.ММ] [ДД.ММ] — журнал действий администратора")
     bot.send_message(uid, text, parse_mode="Markdown")
     # Клавиатура с основными действиями
     keyboard = telebot.types.ReplyKeyboardMarkup(resize_keyboard=True)
-    keyboard.row("📅 Расписание (сегодня)", "📅 Расписание (неделя)")
-    keyboard.row("📰 Новости", "❓ FAQ", "📖 Ресурсы")
-    keyboard.row("📝 Подать заявку", "📋 Мои заявки")
-    keyboard.row("💬 Задать вопрос", "👤 Мой профиль")
+    for row in MENU_ROWS:
+        keyboard.row(*row)
     bot.send_message(uid, "Выберите действие на клавиатуре ниже:", reply_markup=keyboard)
 
-@bot.message_handler(commands=['setgroup'])
+@handlers.message_handler(commands=['setgroup'])
 def cmd_setgroup(m):
     uid = m.chat.id
     user = m.from_user
@@ -168,7 +306,7 @@ def cmd_setgroup(m):
     db.update_user_group(uid, grp)
     bot.reply_to(m, f"Группа установлена: *{grp}*", parse_mode="Markdown")
 
-@bot.message_handler(commands=['setsub'])
+@handlers.message_handler(commands=['setsub'])
 def cmd_setsub(m):
     uid = m.chat.id
     user = m.from_user
@@ -180,49 +318,156 @@ def cmd_setsub(m):
     db.update_user_subgroup(uid, sub)
     bot.reply_to(m, f"Подгруппа установлена: *{sub}*", parse_mode="Markdown")
 
-@bot.message_handler(commands=['schedule'])
-def cmd_schedule(m):
-    uid = m.chat.id
-    user = m.from_user
-    db.ensure_user(user)
-    grp, sub = db.get_user_group_sub(uid) or (None, None)
+def user_group_or_reply(m):
+    """Группа и подгруппа пользователя или None (с подсказкой, что указать)."""
+    db.ensure_user(m.from_user)
+    grp, sub = db.get_user_group_sub(m.chat.id) or (None, None)
     if not grp:
-        return bot.reply_to(m, "Сначала укажите группу — /setgroup <код_группы>.")
+        bot.reply_to(m, "Сначала укажите группу — /setgroup <код_группы>.")
+        return None
     if sub is None:
-        return bot.reply_to(m, "Сначала укажите подгруппу — /setsub 1 или 2.")
-    # Получаем расписание на сегодня с учётом времени и подгруппы
-    classes_today = get_today_schedule(grp, sub)
-    if not classes_today:
-        return bot.send_message(uid, f"У вас нет занятий сегодня ({grp}, подгруппа {sub}).", parse_mode="Markdown")
-    bot.send_message(
-        uid,
-        f"*Расписание на сегодня ({grp}, подгруппа {sub}):*\n{classes_today}",
-        parse_mode="Markdown"
-    )
-
-@bot.message_handler(commands=['week'])
+        bot.reply_to(m, "Сначала укажите подгруппу — /setsub 1 или 2.")
+        return None
+    return grp, sub
+
+# Расписание по дням и неделям отправляется одним сообщением с кнопками навигации;
+# нажатия редактируют это сообщение (callback_navigation), а не присылают новое
+def schedule_view(grp, sub, kind, day):
+    """(текст, клавиатура) расписания на дату (kind=navigation.DAY) или на неделю с этой датой."""
+    engine = current_schedule()
+    today = date.today()
+    if kind == navigation.DAY:
+        text = timetable.format_day_message(grp, sub, day, get_day_schedule(grp, sub, day), today)
+        return text, navigation.day_keyboard(day, today, engine.covers)
+    monday = day - timedelta(days=day.weekday())
+    text = get_render_pool().render_schedules("week", [(grp, sub, monday)])[0]
+    return (text or timetable.format_empty_week(grp, sub, monday),
+            navigation.week_keyboard(monday, today, engine.covers))
+
+def send_schedule_view(m, kind, day):
+    group = user_group_or_reply(m)
+    if not group:
+        return
+    text, markup = schedule_view(*group, kind, day)
+    bot.send_message(m.chat.id, text, parse_mode="Markdown", reply_markup=markup)
+
+@handlers.message_handler(commands=['schedule'])
+def cmd_schedule(m):
+    # Расписание на сегодня с учётом подгруппы
+    send_schedule_view(m, navigation.DAY, date.today())
+
+@handlers.message_handler(commands=['tomorrow'])
+def cmd_tomorrow(m):
+    send_schedule_view(m, navigation.DAY, date.today() + timedelta(days=1))
+
+@handlers.message_handler(commands=['next'])
+def cmd_next(m):
+    group = user_group_or_reply(m)
+    if not group:
+        return
+    now = datetime.now()
+    lesson = current_schedule().next_lesson(*group, now)
+    if not lesson:
+        return bot.send_message(m.chat.id, "В ближайшие недели занятий не найдено.")
+    wait = lesson.start - schedule_engine.minute_of(now)
+    bot.send_message(m.chat.id, f"Следующее занятие: {timetable.format_lesson(lesson)} "
+                                f"(через {timetable.format_duration(wait)}).")
+
+@handlers.message_handler(commands=['now'])
+def cmd_now(m):
+    group = user_group_or_reply(m)
+    if not group:
+        return
+    now = datetime.now()
+    engine = current_schedule()
+    current = engine.current_lessons(*group, now)
+    if current:
+        lines = [f"Сейчас идёт: {timetable.format_lesson(lesson, with_day=False)} "
+                 f"(до конца {timetable.format_duration(lesson.end - schedule_engine.minute_of(now))})"
+                 for lesson in current]
+        return bot.send_message(m.chat.id, "\n".join(lines))
+    text = "Сейчас занятий нет."
+    lesson = engine.next_lesson(*group, now)
+    if lesson:
+        text += f" Следующее: {timetable.format_lesson(lesson)}."
+    bot.send_message(m.chat.id, text)
+
+@handlers.message_handler(commands=['week'])
 def cmd_week(m):
-    uid = m.chat.id
-    user = m.from_user
-    db.ensure_user(user)
-    grp, sub = db.get_user_group_sub(uid) or (None, None)
-    if not grp:
-        return bot.reply_to(m, "Сначала укажите группу — /setgroup <код_группы>.")
-    if sub is None:
-        return bot.reply_to(m, "Сначала укажите подгруппу — /setsub 1 или 2.")
-    # Получаем расписание на всю неделю
-    week = get_week_schedule(grp, sub)
-    # Проверим, есть ли хоть одно занятие
-    if not any(week.values()):
-        return bot.send_message(uid, "Расписание на неделю не найдено.", parse_mode="Markdown")
-    lines = [f"*Расписание на неделю ({grp}, подгруппа {sub}):*"]
-    order = ["Понедельник","Вторник","Среда","Четверг","Пятница","Суббота"]
-    for day in order:
-        cls = week.get(day) or "_(нет занятий)_"
-        lines.append(f"\n*{day}:*\n{cls}")
-    bot.send_message(uid, "\n".join(lines), parse_mode="Markdown")
-
-@bot.message_handler(commands=['notify'])
+    # Расписание на всю неделю; соседние недели — кнопками
+    send_schedule_view(m, navigation.WEEK, date.today())
+
+NAVIGATION_STALE = "Кнопка устарела — отправьте команду ещё раз."
+
+@handlers.callback_query_handler(func=lambda call: navigation.is_navigation(call.data))
+def callback_navigation(call):
+    """Кнопки навигации (navigation.py): расписание по дням и неделям, страницы новостей и FAQ.
+    Сообщение редактируется на месте."""
+    parsed = navigation.unpack(call.data)
+    try:
+        if parsed is None:
+            raise ValueError(call.data)
+        kind, arg = parsed
+        if kind == navigation.AUDIT:
+            if not ADMIN_ID or call.from_user.id != ADMIN_ID:
+                raise ValueError(call.data)
+            text, markup = audit_view(*navigation.unpack_audit(arg))
+            bot.answer_callback_query(call.id)
+            return edit_in_place(call.message, text, markup, parse_mode=None)
+        if kind in (navigation.DAY, navigation.WEEK):
+            grp, sub = db.get_user_group_sub(call.message.chat.id) or (None, None)
+            if not grp or sub is None:
+                return bot.answer_callback_query(call.id, "Сначала укажите группу и подгруппу — /setgroup, /setsub.")
+            text, markup = schedule_view(grp, sub, kind, navigation.unpack_date(arg))
+        else:
+            text, markup = listing_view(kind, max(0, int(arg)))
+            if not text:
+                return bot.answer_callback_query(call.id, "Список пуст.")
+    except ValueError:
+        return bot.answer_callback_query(call.id, NAVIGATION_STALE)
+    bot.answer_callback_query(call.id, cache_time=navigation.ANSWER_CACHE_TIME)
+    edit_in_place(call.message, text, markup)
+
+def edit_in_place(message, text, markup, parse_mode="Markdown"):
+    """Заменить текст и кнопки сообщения бота."""
+    try:
+        bot.edit_message_text(text, message.chat.id, message.message_id, parse_mode=parse_mode, reply_markup=markup)
+    except telebot.apihelper.ApiTelegramException as e:
+        # Например, «Сегодня» на сегодняшнем дне после смены даты: текст не изменился
+        if "message is not modified" not in str(e):
+            raise
+
+# Inline-режим: «@бот ПИ-21» в любом чате (inline.py). Результаты для всех групп строятся
+# один раз на расписание и дату; повторы одинаковых запросов Telegram отдаёт из своего кэша
+inline_results = inline.ResultCache()
+INLINE_NOT_FOUND = "Группа не найдена — открыть бота"
+INLINE_NO_GROUP = "Укажите свою группу в боте"
+
+def inline_result_set():
+    engine = current_schedule()
+    today = date.today()
+    return inline_results.get(engine, today, lambda: inline.build_result_set(
+        engine, today, lambda keys: get_render_pool().render_schedules("week", keys)))
+
+@handlers.inline_handler(func=lambda query: True)
+def inline_schedule(query):
+    text = query.query.strip()
+    personal = not text
+    if personal:
+        # Пустой запрос — своя группа из профиля
+        grp, sub = db.get_user_group_sub(query.from_user.id) or (None, None)
+        text = f"{grp} {sub or ''}" if grp else ""
+    results, next_offset = inline.page(inline_result_set().search(text) if text else [], query.offset)
+    cache_time = inline.PERSONAL_CACHE_TIME if personal else int(os.getenv("INLINE_CACHE_TIME",
+                                                                            inline.DEFAULT_CACHE_TIME))
+    button = None
+    if not results:
+        button = telebot.types.InlineQueryResultsButton(INLINE_NOT_FOUND if text else INLINE_NO_GROUP,
+                                                        start_parameter="inline")
+    bot.answer_inline_query(query.id, results, cache_time=inline.cache_time(cache_time),
+                            is_personal=personal, next_offset=next_offset, button=button)
+
+@handlers.message_handler(commands=['notify'])
 def cmd_notify(m):
     uid = m.chat.id
     user = m.from_user
@@ -231,7 +476,14 @@ def cmd_notify(m):
     state_text = "включены" if new_state else "отключены"
     bot.reply_to(m, f"Ежедневные уведомления расписания {state_text}.", parse_mode="Markdown")
 
-@bot.message_handler(commands=['reminders'])
+@handlers.message_handler(commands=['digest'])
+def cmd_digest(m):
+    uid = m.chat.id
+    db.ensure_user(m.from_user)
+    mode = db.toggle_news_mode(uid)
+    bot.reply_to(m, f"Новости будут приходить {digest.describe_mode(mode)}. Переключить: /digest")
+
+@handlers.message_handler(commands=['reminders'])
 def cmd_reminders(m):
     uid = m.chat.id
     user = m.from_user
@@ -240,38 +492,87 @@ def cmd_reminders(m):
     state_text = "включены" if new_state else "отключены"
     bot.reply_to(m, f"Учебные напоминания {state_text}.", parse_mode="Markdown")
 
-@bot.message_handler(commands=['faq'])
+@handlers.message_handler(commands=['faq'])
 def cmd_faq(m):
     uid = m.chat.id
     user = m.from_user
     db.ensure_user(user)
+    parts = m.text.split(maxsplit=1) if m.text and m.text.startswith('/') else []
+    if len(parts) > 1 and parts[1].strip():
+        return faq_search_reply(uid, parts[1].strip())
+    text, markup = listing_view(navigation.FAQ, 0)
+    if not text:
+        return bot.send_message(uid, "FAQ недоступен или пока пуст.")
+    bot.send_message(uid, text, parse_mode="Markdown", reply_markup=markup)
+
+def render_faq_page(page):
+    """Страница FAQ: (текст, число страниц); (None, 0), если FAQ пуст."""
     faq_list = db.get_all_faq()
     if not faq_list:
-        return bot.send_message(uid, "FAQ недоступен или пока пуст.")
-    text = "*Часто задаваемые вопросы:*"
-    for i, (q, a) in enumerate(faq_list, start=1):
+        return None, 0
+    pages = navigation.page_count(len(faq_list))
+    page = min(page, pages - 1)
+    start = page * navigation.PAGE_SIZE
+    text = "*Часто задаваемые вопросы:*" + (f" (стр. {page + 1}/{pages})" if pages > 1 else "")
+    for i, (q, a) in enumerate(faq_list[start:start + navigation.PAGE_SIZE], start=start + 1):
+        text += f"\n\n*{i}. {q}*\n_{a}_"
+    return text, pages
+
+def escape_markdown(text):
+    """Экранировать служебные символы Markdown (parse_mode="Markdown") вне сущностей."""
+    return re.sub(r"([_*`\[])", r"\\\1", text)
+
+def faq_search_reply(uid, query):
+    """Ответить результатами поиска по FAQ (не более 5 записей, лучшие первыми)."""
+    results = db.search_faq(query, limit=5)
+    if not results:
+        return bot.send_message(uid, "По вашему запросу в FAQ ничего не найдено. "
+                                     "Вы можете задать вопрос администрации, просто написав его.")
+    # Запрос — текст пользователя: вне жирного span и с экранированием, иначе «_» или «*»
+    # в нём ломают разметку и Telegram отклоняет сообщение
+    text = f"*Найдено в FAQ по запросу* «{escape_markdown(query)}»:"
+    for i, (_fid, q, a, _score) in enumerate(results, start=1):
         text += f"\n\n*{i}. {q}*\n_{a}_"
     bot.send_message(uid, text, parse_mode="Markdown")
 
-@bot.message_handler(commands=['resources'])
+@handlers.message_handler(commands=['resources'])
 def cmd_resources(m):
     uid = m.chat.id
     user = m.from_user
     db.ensure_user(user)
+    text = db.cached_content("resources", "message", render_resources)
+    if not text:
+        return bot.send_message(uid, "Список ресурсов пуст.")
+    bot.send_message(uid, text, parse_mode="Markdown")
+
+def render_resources():
+    """Собрать сообщение со списком ресурсов (None, если список пуст)."""
     res_list = db.get_all_resources()
     if not res_list:
-        return bot.send_message(uid, "Список ресурсов пуст.")
+        return None
     text = "*Полезные ресурсы:*"
     for name, url in res_list:
         text += f"\n{name}: {url}"
-    bot.send_message(uid, text, parse_mode="Markdown")
+    return text
 
 # ——————————————————————————————————————————————————————
 # 5) Функции подачи заявок (справка, отсрочка, пересдача)
 # ——————————————————————————————————————————————————————
+# Промежуточные данные многошаговых диалогов {chat_id: dict}. В многопроцессном режиме
+# (STATE_BACKEND=sqlite, см. workers.py) хранятся в базе и видны всем процессам;
+# вложенный dict после изменения нужно сохранять присваиванием temp_request[uid] = data.
 temp_request = {}
 
-@bot.message_handler(commands=['spravka'])
+def init_conversation_state(app):
+    """Выбрать хранилище состояний диалогов по STATE_BACKEND (вызывается из create_app)."""
+    global temp_request
+    if db.SHARED_STATE:
+        temp_request = SharedState(db)
+        app.next_step_backend = SqliteHandlerBackend(db, resolve=lambda name: logs.logged_handler(globals()[name]))
+    else:
+        temp_request = {}
+
+@handlers.message_handler(commands=['spravka'])
 def cmd_spravka(m):
     uid = m.chat.id
     user = m.from_user
@@ -287,19 +588,16 @@ def spravka_name_step(m):
 
 def spravka_group_step(m):
     uid = m.chat.id
-    if uid in temp_request:
-        temp_request[uid]["group"] = m.text.strip()
-    else:
-        temp_request[uid] = {"group": m.text.strip()}
+    data = temp_request.get(uid) or {}
+    data["group"] = m.text.strip()
+    temp_request[uid] = data
     bot.send_message(uid, "3⃣ Укажите *тип справки*:", parse_mode="Markdown")
     bot.register_next_step_handler(m, spravka_type_step)
 
 def spravka_type_step(m):
     uid = m.chat.id
-    if uid not in temp_request:
-        temp_request[uid] = {}
-    temp_request[uid]["details"] = m.text.strip()
-    req = temp_request.pop(uid)
+    req = temp_request.pop(uid, None) or {}
+    req["details"] = m.text.strip()
     db.insert_request(uid, "spravka", req.get("name"), req.get("group"), req.get("details"), "Принята")
     bot.send_message(uid,
                      f"✅ Заявка на справку принята!\n"
@@ -307,7 +605,7 @@ def spravka_type_step(m):
                      "Статус заявки можно посмотреть командой /status.",
                      parse_mode="Markdown")
 
-@bot.message_handler(commands=['otsrochka'])
+@handlers.message_handler(commands=['otsrochka'])
 def cmd_otsrochka(m):
     uid = m.chat.id
     user = m.from_user
@@ -323,19 +621,16 @@ def ots_name_step(m):
 
 def ots_group_step(m):
     uid = m.chat.id
-    if uid in temp_request:
-        temp_request[uid]["group"] = m.text.strip()
-    else:
-        temp_request[uid] = {"group": m.text.strip()}
+    data = temp_request.get(uid) or {}
+    data["group"] = m.text.strip()
+    temp_request[uid] = data
     bot.send_message(uid, "3⃣ Укажите *причину отсрочки*:", parse_mode="Markdown")
     bot.register_next_step_handler(m, ots_reason_step)
 
 def ots_reason_step(m):
     uid = m.chat.id
-    if uid not in temp_request:
-        temp_request[uid] = {}
-    temp_request[uid]["details"] = m.text.strip()
-    req = temp_request.pop(uid)
+    req = temp_request.pop(uid, None) or {}
+    req["details"] = m.text.strip()
     db.insert_request(uid, "otsrochka", req.get("name"), req.get("group"), req.get("details"), "Принята")
     bot.send_message(uid,
                      f"✅ Заявление на отсрочку принято!\n"
@@ -343,7 +638,7 @@ def ots_reason_step(m):
                      "Статус заявки можно проверить командой /status.",
                      parse_mode="Markdown")
 
-@bot.message_handler(commands=['hvost'])
+@handlers.message_handler(commands=['hvost'])
 def cmd_hvost(m):
     uid = m.chat.id
     user = m.from_user
@@ -359,19 +654,16 @@ def hvost_name_step(m):
 
 def hvost_group_step(m):
     uid = m.chat.id
-    if uid in temp_request:
-        temp_request[uid]["group"] = m.text.strip()
-    else:
-        temp_request[uid] = {"group": m.text.strip()}
+    data = temp_request.get(uid) or {}
+    data["group"] = m.text.strip()
+    temp_request[uid] = data
     bot.send_message(uid, "3⃣ Укажите *дисциплину для пересдачи*:", parse_mode="Markdown")
     bot.register_next_step_handler(m, hvost_subject_step)
 
 def hvost_subject_step(m):
     uid = m.chat.id
-    if uid not in temp_request:
-        temp_request[uid] = {}
-    temp_request[uid]["details"] = m.text.strip()
-    req = temp_request.pop(uid)
+    req = temp_request.pop(uid, None) or {}
+    req["details"] = m.text.strip()
     db.insert_request(uid, "hvost", req.get("name"), req.get("group"), req.get("details"), "Принята")
     bot.send_message(uid,
                      f"✅ Заявка на пересдачу принята!\n"
@@ -379,42 +671,76 @@ def hvost_subject_step(m):
                      "Статус заявки можно проверить командой /status.",
                      parse_mode="Markdown")
 
-@bot.message_handler(commands=['status'])
+STATUS_LIMIT = 10  # сколько последних изменённых заявок показывает /status
+
+@handlers.message_handler(commands=['status'])
 def cmd_status(m):
     uid = m.chat.id
     user = m.from_user
     db.ensure_user(user)
-    requests_list = db.get_requests_by_user(uid)
+    requests_list = db.get_requests_by_user(uid, limit=STATUS_LIMIT)
     if not requests_list:
         return bot.reply_to(m, "У вас нет отправленных заявок.")
     text = "*Статус ваших заявок:*\n"
-    for req_type, details, status in requests_list:
+    for req_type, details, status, updated_at in requests_list:
         label = REQUEST_LABELS.get(req_type, req_type)
-        text += f"– {label} ({details}): {status}\n"
+        text += f"– {label} ({details}): {status} — {format_db_date(updated_at)}\n"
+    total = db.count_requests_by_user(uid)
+    if total > len(requests_list):
+        text += f"\n_Показаны последние {len(requests_list)} изменений из {total} заявок._"
     bot.send_message(uid, text, parse_mode="Markdown")
 
+def format_db_date(value):
+    """Дата-время SQLite (UTC) → «ДД.ММ.ГГГГ» в местном времени."""
+    if not value:
+        return "—"
+    try:
+        dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+        return dt.astimezone().strftime("%d.%m.%Y")
+    except ValueError:
+        return value.split(" ")[0]
+
 # ——————————————————————————————————————————————————————
 # 6) Администраторские команды (новости, рассылка, ответы)
 # ——————————————————————————————————————————————————————
-@bot.message_handler(commands=['news'])
+@handlers.message_handler(commands=['news'])
 def cmd_news(m):
     uid = m.chat.id
     user = m.from_user
     db.ensure_user(user)
+    text, markup = listing_view(navigation.NEWS, 0)
+    if not text:
+        return bot.send_message(uid, "Новостей пока нет.")
+    bot.send_message(uid, text, parse_mode="Markdown", reply_markup=markup)
+
+def render_news_page(page):
+    """Страница новостей, новые первыми: (текст, число страниц); (None, 0), если новостей нет."""
     news_list = db.get_all_news()
     if not news_list:
-        return bot.send_message(uid, "Новостей пока нет.")
-    text = "*Новости и объявления:*"
-    for content, dt in news_list:
+        return None, 0
+    pages = navigation.page_count(len(news_list))
+    page = min(page, pages - 1)
+    start = page * navigation.PAGE_SIZE
+    text = "*Новости и объявления:*" + (f" (стр. {page + 1}/{pages})" if pages > 1 else "")
+    for content, dt in news_list[start:start + navigation.PAGE_SIZE]:
         try:
             date_obj = datetime.strptime(dt, "%Y-%m-%d %H:%M:%S")
             date_str = date_obj.strftime("%d.%m.%Y")
-        except:
+        except (TypeError, ValueError):
             date_str = dt.split(" ")[0]
         text += f"\n[{date_str}] {content}"
-    bot.send_message(uid, text, parse_mode="Markdown")
+    return text, pages
+
+def listing_view(kind, page):
+    """(текст, клавиатура) страницы новостей или FAQ. Страницы кэшируются до изменения таблицы
+    (db.cached_content), поэтому листание не обращается к базе."""
+    table, render = {navigation.NEWS: ("news", render_news_page), navigation.FAQ: ("faq", render_faq_page)}[kind]
+    text, pages = db.cached_content(table, ("page", page), lambda: render(page))
+    if not text:
+        return None, None
+    return text, navigation.page_keyboard(kind, min(page, pages - 1), pages)
 
-@bot.message_handler(commands=['addnews'])
+@handlers.message_handler(commands=['addnews'])
 def cmd_addnews(m):
     if not ADMIN_ID or m.chat.id != ADMIN_ID:
         return
@@ -425,7 +751,7 @@ def cmd_addnews(m):
     else:
         content = parts[1].strip()
         if content:
-            broadcast_news(content)
+            publish_news(m, content)
         else:
             bot.reply_to(m, "Текст новости не должен быть пустым.")
 
@@ -435,19 +761,67 @@ def addnews_step(m):
     content = m.text.strip()
     if not content:
         return bot.reply_to(m, "Текст новости не должен быть пустым.")
-    broadcast_news(content)
+    publish_news(m, content)
+
+def publish_news(m, content):
+    delay = broadcast_news(content, admin_id=m.chat.id)
+    if delay:
+        bot.reply_to(m, f"Новость сохранена. Все новости за {delay // 60} мин. уйдут одной сводкой.")
+
+def broadcast_news(content: str, admin_id=None):
+    """Добавить новость и разослать пользователям с мгновенной доставкой — сразу или, если задано
+    окно NEWS_DIGEST_WINDOW, сводкой по его окончании. Возвращает задержку рассылки в секундах."""
+    news_id = db.add_news(content)
+    window = digest.window_seconds()
+    audit_log.record("addnews", admin_id, target=news_id, text=audit.preview(content), digest_window=window)
+    if window <= 0:
+        deliver_news(digest.INSTANT)
+        return 0
+    schedule_news_flush(window)
+    return window
+
+news_flush_timer = None
+news_flush_lock = threading.Lock()
+
+def schedule_news_flush(delay):
+    """Открыть окно сводки: через delay секунд разослать всё накопленное. Пока окно открыто,
+    новые новости только добавляются в него. После перезапуска окно закроет планировщик
+    (flush_news_digest)."""
+    global news_flush_timer
+    with news_flush_lock:
+        if news_flush_timer and news_flush_timer.is_alive():
+            return
+        news_flush_timer = threading.Timer(delay, flush_news_digest)
+        news_flush_timer.daemon = True
+        news_flush_timer.start()
+
+def deliver_news(mode, min_age=0):
+    """Разослать новости, ещё не отправленные в режиме mode, одной сводкой всем пользователям
+    с этим режимом. Возвращает число поставленных в очередь сообщений."""
+    news = db.claim_pending_news(mode, min_age)
+    if not news:
+        return 0
+    texts = digest.format_digest([content for _, content in news], mode)
+    users = db.get_user_ids_by_news_mode(mode)
+    ref = audit.new_ref()
+    audit_log.record("news_delivery", target=",".join(str(news_id) for news_id, _ in news),
+                     recipients=len(users), ref=ref, mode=mode, messages=len(users) * len(texts))
+    # Части длинной сводки одного пользователя попадают в одну очередь отправителя — по порядку
+    sender.submit_batch([(user_id, text) for user_id in users for text in texts], parse_mode="Markdown",
+                        on_complete=lambda delivered, failed: audit_delivery(ref, delivered, failed))
+    logger.info("Рассылка новостей", extra={"mode": mode, "news": len(news), "users": len(users),
+                                             "messages": len(users) * len(texts)})
+    return len(users) * len(texts)
+
+def flush_news_digest():
+    """Разослать мгновенную сводку, если окно самой старой неразосланной новости закрыто."""
+    try:
+        deliver_news(digest.INSTANT, min_age=digest.window_seconds())
+    except Exception:
+        # Исключение не должно останавливать поток планировщика
+        logger.exception("Ошибка рассылки сводки новостей")
 
-def broadcast_news(content: str):
-    """Добавить новость и разослать всем пользователям."""
-    db.add_news(content)
-    all_users = db.get_all_user_ids()
-    for user_id in all_users:
-        try:
-            bot.send_message(user_id, f"📢 *Новое объявление:* {content}", parse_mode="Markdown")
-        except Exception as e:
-            continue
-            
-@bot.message_handler(commands=['delnews'])
+@handlers.message_handler(commands=['delnews'])
 def cmd_delnews(m):
     # Доступно только администратору
     if not ADMIN_ID or m.chat.id != ADMIN_ID:
@@ -457,12 +831,13 @@ def cmd_delnews(m):
         return bot.reply_to(m, "Использование: /delnews <ID>")
     news_id = int(parts[1])
     success = db.delete_news(news_id)
+    audit_log.record("delnews", m.chat.id, target=news_id, found=success)
     if success:
         bot.reply_to(m, f"Новость с ID {news_id} удалена.")
     else:
         bot.reply_to(m, f"Новость с ID {news_id} не найдена.")
 
-@bot.message_handler(commands=['anons', 'broadcast'])
+@handlers.message_handler(commands=['anons', 'broadcast'])
 def cmd_anons(m):
     if not ADMIN_ID or m.chat.id != ADMIN_ID:
         return
@@ -486,19 +861,23 @@ def anons_step(m):
     broadcast_message(announcement)
 
 def broadcast_message(text: str):
-    """Разослать всем пользователям заданный текст."""
+    """Поставить в очередь рассылки текст для всех пользователей; итог — администратору и в журнал."""
     all_users = db.get_all_user_ids()
-    count = 0
-    for user_id in all_users:
-        try:
-            bot.send_message(user_id, text)
-            count += 1
-        except:
-            continue
-    if ADMIN_ID:
-        bot.send_message(ADMIN_ID, f"Отправлено объявление {count} пользователям.")
+    ref = audit.new_ref()
+    audit_log.record("anons", ADMIN_ID, recipients=len(all_users), ref=ref, text=audit.preview(text))
+
+    def report(delivered, failed):
+        audit_delivery(ref, delivered, failed)
+        if ADMIN_ID:
+            bot.send_message(ADMIN_ID, f"Отправлено объявление {delivered} пользователям"
+                                       + (f", не доставлено: {failed}." if failed else "."))
+    sender.submit_batch([(user_id, text) for user_id in all_users], on_complete=report)
 
-@bot.message_handler(commands=['addfaq'])
+def audit_delivery(ref, delivered, failed):
+    """Итог доставки рассылки в журнал (та же метка ref, что у действия)."""
+    audit_log.record("delivered", recipients=delivered + failed, ref=ref, delivered=delivered, failed=failed)
+
+@handlers.message_handler(commands=['addfaq'])
 def cmd_addfaq(m):
     if not ADMIN_ID or m.chat.id != ADMIN_ID:
         return
@@ -529,7 +908,7 @@ def addfaq_answer_step(m):
     db.add_faq(question_text, answer_text)
     bot.send_message(m.chat.id, f"✅ FAQ добавлен: {question_text} – {answer_text}")
 
-@bot.message_handler(commands=['delfaq'])
+@handlers.message_handler(commands=['delfaq'])
 def cmd_delfaq(m):
     if not ADMIN_ID or m.chat.id != ADMIN_ID:
         return
@@ -538,12 +917,13 @@ def cmd_delfaq(m):
         return bot.reply_to(m, "Используйте: /delfaq <ID>")
     faq_id = int(parts[1])
     success = db.delete_faq(faq_id)
+    audit_log.record("delfaq", m.chat.id, target=faq_id, found=success)
     if success:
         bot.reply_to(m, f"FAQ с ID {faq_id} удален.")
     else:
         bot.reply_to(m, f"FAQ с ID {faq_id} не найден.")
 
-@bot.message_handler(commands=['addresource'])
+@handlers.message_handler(commands=['addresource'])
 def cmd_addresource(m):
     if not ADMIN_ID or m.chat.id != ADMIN_ID:
         return
@@ -574,7 +954,7 @@ def addres_url_step(m):
     db.add_resource(name, url)
     bot.send_message(m.chat.id, f"✅ Ресурс добавлен: {name} – {url}")
 
-@bot.message_handler(commands=['delresource'])
+@handlers.message_handler(commands=['delresource'])
 def cmd_delresource(m):
     if not ADMIN_ID or m.chat.id != ADMIN_ID:
         return
@@ -583,47 +963,60 @@ def cmd_delresource(m):
         return bot.reply_to(m, "Используйте: /delresource <ID>")
     res_id = int(parts[1])
     success = db.delete_resource(res_id)
+    audit_log.record("delresource", m.chat.id, target=res_id, found=success)
     if success:
         bot.reply_to(m, f"Ресурс с ID {res_id} удален.")
     else:
         bot.reply_to(m, f"Ресурс с ID {res_id} не найден.")
 
-@bot.message_handler(commands=['questions'])
+@handlers.message_handler(commands=['questions'])
 def cmd_questions(m):
     if not ADMIN_ID or m.chat.id != ADMIN_ID:
         return
-    questions_list = db.get_unanswered_questions()
-    if not questions_list:
+    clusters = db.get_question_clusters()
+    if not clusters:
         return bot.send_message(m.chat.id, "Нет новых вопросов от пользователей.")
     text = "*Вопросы от пользователей:*"
-    for qid, first_name, question, asked_dt in questions_list:
+    for cluster_id, count, ids, first_name, question, asked_dt in clusters:
         name = first_name or "Пользователь"
         try:
             dt_obj = datetime.strptime(asked_dt, "%Y-%m-%d %H:%M:%S")
             dt_str = dt_obj.strftime("%d.%m.%Y %H:%M")
-        except:
+        except (TypeError, ValueError):
             dt_str = asked_dt
-        text += f"\nID{qid} от {name} ({dt_str}): {question}"
+        if count == 1:
+            text += f"\nID{ids[0]} от {name} ({dt_str}): {question}"
+        else:
+            shown = ", ".join(str(i) for i in ids[:10]) + (", …" if count > 10 else "")
+            text += f"\n🔁 ×{count} (ID {shown}), первый от {name} ({dt_str}): {question}"
+    text += "\n\nОтветить на один вопрос: /answer <ID> <текст>\nОтветить всем похожим: /answer <ID>\\* <текст>"
     bot.send_message(m.chat.id, text, parse_mode="Markdown")
 
-@bot.message_handler(commands=['answer'])
+@handlers.message_handler(commands=['answer'])
 def cmd_answer(m):
     if not ADMIN_ID or m.chat.id != ADMIN_ID:
         return
     parts = m.text.split(maxsplit=2)
     if len(parts) < 2:
-        return bot.reply_to(m, "Используйте: /answer <ID> <текст ответа>")
-    if not parts[1].isdigit():
+        return bot.reply_to(m, "Используйте: /answer <ID> <текст ответа> (или <ID>* — ответить всем похожим вопросам)")
+    # «12*» — ответить на вопрос 12 и все похожие на него из того же кластера
+    whole_cluster = parts[1].endswith("*")
+    qid_str = parts[1].rstrip("*")
+    if not qid_str.isdigit():
         return bot.reply_to(m, "Неверный формат ID.")
-    qid = int(parts[1])
+    qid = int(qid_str)
     if len(parts) >= 3:
         answer_text = parts[2].strip()
         if not answer_text:
             return bot.reply_to(m, "Текст ответа не должен быть пустым.")
-        send_answer_to_user(qid, answer_text)
+        if whole_cluster:
+            send_answer_to_cluster(qid, answer_text)
+        else:
+            send_answer_to_user(qid, answer_text)
     else:
-        temp_request[m.chat.id] = {"answer_qid": qid}
-        msg = bot.reply_to(m, f"Введите ответ на вопрос ID{qid}:")
+        temp_request[m.chat.id] = {"answer_qid": qid, "answer_cluster": whole_cluster}
+        target = f"вопросы, похожие на ID{qid}" if whole_cluster else f"вопрос ID{qid}"
+        msg = bot.reply_to(m, f"Введите ответ на {target}:")
         bot.register_next_step_handler(msg, answer_text_step)
 
 def answer_text_step(m):
@@ -637,21 +1030,289 @@ def answer_text_step(m):
         return bot.reply_to(m, "Ошибка: не выбран вопрос для ответа.")
     qid = data["answer_qid"]
     temp_request.pop(m.chat.id, None)
-    send_answer_to_user(qid, answer_text)
+    if data.get("answer_cluster"):
+        send_answer_to_cluster(qid, answer_text)
+    else:
+        send_answer_to_user(qid, answer_text)
 
 def send_answer_to_user(qid: int, answer_text: str):
     """Отправить ответ пользователю и отметить вопрос как отвеченный."""
     info = db.answer_question(qid, answer_text)
     if not info:
+        audit_log.record("answer", ADMIN_ID, target=qid, found=False)
         return bot.send_message(ADMIN_ID, f"Вопрос ID{qid} не найден или уже закрыт.")
     user_id, question_text = info
+    delivered = False
     try:
         bot.send_message(user_id, f"✉️ Ответ на ваш вопрос \"{question_text}\":\n{answer_text}")
+        delivered = True
         bot.send_message(ADMIN_ID, f"Ответ пользователю {user_id} отправлен.")
-    except:
+    except Exception as e:
+        logger.warning("Ответ на вопрос %s не доставлен: %s", qid, e, extra={"user_id": user_id})
         bot.send_message(ADMIN_ID, f"Не удалось доставить ответ пользователю {user_id}. Возможно, он остановил бота.")
+    finally:
+        audit_log.record("answer", ADMIN_ID, target=qid, recipients=1, user_id=user_id, delivered=delivered,
+                         text=audit.preview(answer_text))
+
+def send_answer_to_cluster(qid: int, answer_text: str):
+    """Ответить на все вопросы кластера, к которому относится вопрос qid (одним UPDATE),
+    и разослать ответ авторам — по одному сообщению на пользователя."""
+    cluster_id = db.get_question_cluster_id(qid)
+    if cluster_id is None:
+        return bot.send_message(ADMIN_ID, f"Вопрос ID{qid} не найден или уже закрыт.")
+    closed = db.answer_cluster(cluster_id, answer_text)
+    deliver_answers([(qid, user_id, question_text, answer_text) for qid, user_id, question_text in closed],
+                    "answer_cluster", target=qid, text=audit.preview(answer_text))
+
+def deliver_answers(closed, action, target=None, **details):
+    """Поставить в очередь рассылки ответы на закрытые вопросы (qid, user_id, question, answer):
+    одно сообщение на пользователя и ответ. Действие action записывается в журнал, по завершении
+    администратору приходит итог."""
+    grouped = {}
+    for _qid, user_id, question_text, answer_text in closed:
+        grouped.setdefault((user_id, answer_text), []).append(question_text)
+    messages = []
+    for (user_id, answer_text), questions in grouped.items():
+        quoted = "\n".join(f"«{q}»" for q in questions)
+        messages.append((user_id, f"✉️ Ответ на ваш вопрос:\n{quoted}\n\n{answer_text}"))
+    total = len(closed)
+    ref = audit.new_ref()
+    audit_log.record(action, ADMIN_ID, target=target, recipients=len(messages), ref=ref, closed=total, **details)
+
+    def report(delivered, failed):
+        audit_delivery(ref, delivered, failed)
+        bot.send_message(ADMIN_ID, f"Закрыто вопросов: {total}. Ответов доставлено: {delivered}, "
+                                   f"не доставлено: {failed}.")
+    sender.submit_batch(messages, on_complete=report)
+
+# Строка пакетного ответа: «12 текст» или «12,15,18 текст»
+BULK_LINE_RE = re.compile(r"^\s*(\d+(?:\s*,\s*\d+)*)\s+(.+?)\s*$")
+
+def parse_bulk_answers(text):
+    """Разобрать строки «ID[,ID...] текст ответа». Возвращает (пары (qid, ответ), номера ошибочных строк)."""
+    pairs, bad = [], []
+    for lineno, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        match = BULK_LINE_RE.match(line)
+        if not match:
+            bad.append(lineno)
+            continue
+        ids, answer_text = match.groups()
+        pairs.extend((int(qid), answer_text) for qid in ids.split(","))
+    return pairs, bad
 
-@bot.message_handler(commands=['stats'])
+@handlers.message_handler(commands=['answerbulk'])
+def cmd_answerbulk(m):
+    if not ADMIN_ID or m.chat.id != ADMIN_ID:
+        return
+    parts = m.text.split(maxsplit=1)
+    if len(parts) < 2:
+        msg = bot.reply_to(m, "Отправьте ответы, по одному на строке:\n<ID> <текст ответа>\n"
+                              "или <ID>,<ID>,... <текст> — один ответ на несколько вопросов.")
+        return bot.register_next_step_handler(msg, answerbulk_step)
+    process_bulk_answers(m, parts[1])
+
+def answerbulk_step(m):
+    if not ADMIN_ID or m.chat.id != ADMIN_ID:
+        return
+    process_bulk_answers(m, m.text or "")
+
+def process_bulk_answers(m, text):
+    """Применить пакет ответов одной транзакцией и поставить доставку в очередь."""
+    pairs, bad = parse_bulk_answers(text)
+    if bad:
+        return bot.reply_to(m, f"Не удалось разобрать строки: {', '.join(map(str, bad))}. "
+                               "Формат: <ID> <текст ответа>. Ничего не изменено.")
+    if not pairs:
+        return bot.reply_to(m, "Нет ответов для сохранения.")
+    closed = db.answer_questions_bulk(pairs)
+    skipped = len({qid for qid, _ in pairs}) - len(closed)
+    bot.reply_to(m, f"Сохранено ответов: {len(closed)}" +
+                    (f", пропущено (не найдены или уже закрыты): {skipped}" if skipped else "") +
+                    ". Рассылка поставлена в очередь.")
+    deliver_answers(closed, "answerbulk", skipped=skipped)
+
+REQUESTS_PAGE_SIZE = 20
+REQUESTS_USAGE = ("Использование: /requests [type=spravka|otsrochka|hvost] [group=<группа>] "
+                  f"[status={'|'.join(db.REQUEST_STATUSES)}] [after=<ID>]\n"
+                  "По умолчанию показываются незакрытые заявки.")
+
+def parse_requests_filters(args):
+    """Разобрать аргументы /requests. Возвращает словарь фильтров; ValueError — при ошибке."""
+    filters = {"type": None, "group": None, "status": None, "after": 0}
+    for token in args:
+        name, sep, value = token.partition("=")
+        name = name.lower()
+        if not sep or name not in filters or not value:
+            raise ValueError(f"непонятный фильтр «{token}»")
+        if name == "type" and value not in REQUEST_LABELS:
+            raise ValueError(f"неизвестный тип заявки «{value}»")
+        if name == "status" and value not in db.REQUEST_STATUSES:
+            raise ValueError(f"неизвестный статус «{value}»")
+        if name == "after":
+            if not value.isdigit():
+                raise ValueError("after должен быть числом")
+            value = int(value)
+        filters[name] = value
+    return filters
+
+def requests_page_callback(filters, last_id):
+    """callback_data кнопки «Дальше» (не длиннее 64 байт) или None, если фильтры не помещаются."""
+    data = f"rqp:{last_id}:{filters['type'] or ''}:{filters['status'] or ''}:{filters['group'] or ''}"
+    return data if len(data.encode("utf-8")) <= 64 else None
+
+def send_requests_page(chat_id, filters):
+    statuses = (db.REQUEST_STATUSES[filters["status"]],) if filters["status"] else db.OPEN_REQUEST_STATUSES
+    rows = db.get_requests_page(statuses, filters["type"], filters["group"], filters["after"], REQUESTS_PAGE_SIZE)
+    if not rows:
+        return bot.send_message(chat_id, "Заявок не найдено." if not filters["after"] else "Больше заявок нет.")
+    lines = ["Заявки (ID | тип | ФИО, группа — детали: статус):"]
+    for rid, _uid, req_type, name, group_name, details, status, _updated in rows:
+        lines.append(f"{rid} | {REQUEST_LABELS.get(req_type, req_type)} | {name}, {group_name} — {details}: {status}")
+    markup = None
+    if len(rows) == REQUESTS_PAGE_SIZE:
+        data = requests_page_callback(filters, rows[-1][0])
+        if data:
+            markup = telebot.types.InlineKeyboardMarkup()
+            markup.add(telebot.types.InlineKeyboardButton("Дальше ▶", callback_data=data))
+        else:
+            lines.append(f"\nСледующая страница: добавьте after={rows[-1][0]}")
+    lines.append("\nСменить статус: /setstatus <ID,ID,ID-ID> <статус> [комментарий]")
+    bot.send_message(chat_id, "\n".join(lines), reply_markup=markup)
+
+@handlers.message_handler(commands=['requests'])
+def cmd_requests(m):
+    if not ADMIN_ID or m.chat.id != ADMIN_ID:
+        return
+    try:
+        filters = parse_requests_filters(m.text.split()[1:])
+    except ValueError as e:
+        return bot.reply_to(m, f"Ошибка: {e}.\n\n{REQUESTS_USAGE}")
+    send_requests_page(m.chat.id, filters)
+
+@handlers.callback_query_handler(func=lambda call: call.data and call.data.startswith("rqp:"))
+def callback_requests_page(call):
+    bot.answer_callback_query(call.id)
+    if not ADMIN_ID or call.message.chat.id != ADMIN_ID:
+        return
+    _, last_id, req_type, status, group_name = call.data.split(":", 4)
+    send_requests_page(call.message.chat.id, {"type": req_type or None, "status": status or None,
+                                              "group": group_name or None, "after": int(last_id)})
+
+def parse_id_list(text):
+    """«12,15,20-25» → множество ID; ValueError — при ошибке."""
+    ids = set()
+    for part in text.split(","):
+        start, sep, end = part.strip().partition("-")
+        if not start.isdigit() or (sep and not end.isdigit()):
+            raise ValueError(f"неверный ID «{part.strip()}»")
+        if sep:
+            if int(end) - int(start) > 10000:
+                raise ValueError(f"слишком длинный диапазон «{part.strip()}»")
+            ids.update(range(int(start), int(end) + 1))
+        else:
+            ids.add(int(start))
+    return ids
+
+@handlers.message_handler(commands=['setstatus'])
+def cmd_setstatus(m):
+    if not ADMIN_ID or m.chat.id != ADMIN_ID:
+        return
+    parts = m.text.split(maxsplit=3)
+    usage = ("Использование: /setstatus <ID,ID,ID-ID> <статус> [комментарий]\n"
+             "Статусы: " + ", ".join(f"{code} — {name}" for code, name in db.REQUEST_STATUSES.items()))
+    if len(parts) < 3 or parts[2].lower() not in db.REQUEST_STATUSES:
+        return bot.reply_to(m, usage)
+    try:
+        ids = parse_id_list(parts[1])
+    except ValueError as e:
+        return bot.reply_to(m, f"Ошибка: {e}.\n\n{usage}")
+    status = db.REQUEST_STATUSES[parts[2].lower()]
+    comment = parts[3].strip() if len(parts) > 3 else ""
+    changed = db.set_requests_status(ids, status)
+    skipped = len(ids) - len(changed)
+    bot.reply_to(m, f"Статус «{status}» установлен для {len(changed)} заявок" +
+                    (f", пропущено (не найдены или переход недопустим): {skipped}" if skipped else "") +
+                    (". Уведомления поставлены в очередь." if changed else "."))
+    ref = audit.new_ref() if changed else None
+    audit_log.record("setstatus", m.chat.id, target=parts[1], recipients=len({c[1] for c in changed}), ref=ref,
+                     status=status, changed=len(changed), skipped=skipped)
+    if changed:
+        notify_status_change(changed, status, comment, ref)
+
+def notify_status_change(changed, status, comment="", ref=None):
+    """Поставить в очередь рассылки уведомления о смене статуса: одно сообщение на студента.
+    ref — метка действия в журнале, к которой записывается итог доставки."""
+    grouped = {}
+    for _rid, user_id, req_type, details in changed:
+        grouped.setdefault(user_id, []).append(f"– {REQUEST_LABELS.get(req_type, req_type)} ({details})")
+    messages = []
+    for user_id, lines in grouped.items():
+        text = f"📋 Статус ваших заявок изменён на «{status}»:\n" + "\n".join(lines)
+        if comment:
+            text += f"\n\n{comment}"
+        messages.append((user_id, text))
+
+    def report(delivered, failed):
+        if ref:
+            audit_delivery(ref, delivered, failed)
+        bot.send_message(ADMIN_ID, f"Уведомления о статусе «{status}»: доставлено {delivered}, "
+                                   f"не доставлено {failed}.")
+    sender.submit_batch(messages, on_complete=report)
+
+def parse_moment(args, now=None):
+    """Аргументы «[ЧЧ:ММ] [ДД.ММ[.ГГГГ]]» → datetime (по умолчанию — сейчас); ValueError — при ошибке."""
+    now = now or datetime.now()
+    moment = now.replace(second=0, microsecond=0)
+    for arg in args:
+        if ":" in arg:
+            t = datetime.strptime(arg, "%H:%M")
+            moment = moment.replace(hour=t.hour, minute=t.minute)
+        else:
+            # Без года дата разбирается сразу с текущим: strptime без года берёт 1900-й, и 29.02 не проходит
+            d = datetime.strptime(arg if arg.count(".") == 2 else f"{arg}.{now.year}", "%d.%m.%Y")
+            moment = moment.replace(year=d.year, month=d.month, day=d.day)
+    return moment
+
+INCLASS_LIMIT = 80  # строк в ответе /inclass (ограничение длины сообщения)
+
+@handlers.message_handler(commands=['inclass'])
+def cmd_inclass(m):
+    if not ADMIN_ID or m.chat.id != ADMIN_ID:
+        return
+    try:
+        moment = parse_moment(m.text.split()[1:])
+    except ValueError:
+        return bot.reply_to(m, "Использование: /inclass [ЧЧ:ММ] [ДД.ММ[.ГГГГ]] — по умолчанию текущий момент.")
+    engine = current_schedule()
+    if not engine.covers(moment.date()):
+        return bot.reply_to(m, f"Расписание загружено на {engine.start:%d.%m.%Y}–{engine.end - timedelta(days=1):%d.%m.%Y}.")
+    busy = engine.groups_in_class(moment)
+    header = f"Группы на занятиях {moment:%d.%m.%Y %H:%M}"
+    if not busy:
+        return bot.send_message(m.chat.id, f"{header}: нет.")
+    lines = [f"{header} ({len(busy)}):"]
+    busy.sort(key=lambda item: (item[0], item[1].subgroup))
+    for group_name, lesson in busy[:INCLASS_LIMIT]:
+        sub = f" (подгр. {lesson.subgroup})" if lesson.subgroup else ""
+        lines.append(f"{group_name}{sub}: {lesson.time_range} — {lesson.title}")
+    if len(busy) > INCLASS_LIMIT:
+        lines.append(f"…и ещё {len(busy) - INCLASS_LIMIT}")
+    bot.send_message(m.chat.id, "\n".join(lines))
+
+@handlers.message_handler(commands=['reloadschedule'])
+def cmd_reloadschedule(m):
+    if not ADMIN_ID or m.chat.id != ADMIN_ID:
+        return
+    changed = reload_schedule(force=True)
+    if not changed:
+        return bot.reply_to(m, "Расписание перечитано, изменений на ближайшие дни нет.")
+    bot.reply_to(m, f"Расписание обновлено: изменилось {changed} дней групп на ближайшие "
+                    f"{SCHEDULE_DIFF_DAYS} дней. "
+                    "Подписчикам затронутых групп отправлены изменения.")
+
+@handlers.message_handler(commands=['stats'])
 def cmd_stats(m):
     if not ADMIN_ID or m.chat.id != ADMIN_ID:
         return
@@ -661,33 +1322,118 @@ def cmd_stats(m):
     text += f"Отправлено заявок: {stats['requests_total']} (Справок: {stats['spravka']}, Отсрочек: {stats['otsrochka']}, Пересдач: {stats['hvost']})\n"
     text += f"Вопросов получено: {stats['questions_total']} (из них без ответа: {stats['questions_unanswered']})\n"
     text += f"Новостей опубликовано: {stats['news']}\n"
+    text += (f"В архиве: заявок {stats['requests_archived']}, вопросов {stats['questions_archived']}, "
+             f"новостей {stats['news_archived']}\n")
     text += f"FAQ записей: {stats['faq']}, ресурсов: {stats['resources']}"
     bot.send_message(m.chat.id, text, parse_mode="Markdown")
 
+AUDIT_USAGE = ("Использование: /audit [ДД.ММ[.ГГГГ]] [ДД.ММ[.ГГГГ]] — журнал действий за период "
+               f"(без дат — последние {audit.DEFAULT_DAYS} дней, одна дата — этот день).")
+
+@handlers.message_handler(commands=['audit'])
+def cmd_audit(m):
+    if not ADMIN_ID or m.chat.id != ADMIN_ID:
+        return
+    try:
+        first, last = audit.parse_range(m.text.split()[1:])
+    except ValueError as e:
+        return bot.reply_to(m, f"Ошибка: {e}.\n\n{AUDIT_USAGE}")
+    audit_log.flush()  # записи этого процесса, ещё не записанные фоновым потоком, тоже попадут в выборку
+    text, markup = audit_view(first, last)
+    bot.send_message(m.chat.id, text, reply_markup=markup)
+
+def audit_view(first, last, cursor=""):
+    """(текст, клавиатура) страницы журнала за период; cursor — «b<ID>»/«a<ID>» (navigation.pack_audit)."""
+    since, until = audit.utc_bounds(first, last)
+    before = int(cursor[1:]) if cursor.startswith("b") else None
+    after = int(cursor[1:]) if cursor.startswith("a") else None
+    rows, has_older, has_newer = db.get_audit_page(since, until, before, after, audit.PAGE_SIZE)
+    return audit.format_page(rows, first, last), navigation.audit_keyboard(first, last, rows, has_older, has_newer)
+
+EXPORT_USAGE = ("Использование: /export <requests|questions|news|audit|users> [фильтр=значение ...] [csv|xlsx]\n"
+                "Фильтры: requests — type, group, status, user, archived, from, to; "
+                "questions — answered, user, archived, from, to; news — archived, from, to; "
+                "audit — action, admin, ref, from, to; users — group, subgroup, notify, reminders.\n"
+                "Заявки, вопросы и новости выгружаются вместе с архивом (archived=1).\n"
+                "Пример: /export requests type=spravka from=2024-09-01 xlsx")
+
+@handlers.message_handler(commands=['export'])
+def cmd_export(m):
+    if not ADMIN_ID or m.chat.id != ADMIN_ID:
+        return
+    try:
+        table, filters, fmt = export.parse_export_args(m.text.split()[1:])
+    except ValueError as e:
+        return bot.reply_to(m, f"Ошибка: {e}.\n\n{EXPORT_USAGE}")
+    audit_log.record("export", m.chat.id, target=table, format=fmt, filters=filters)
+    bot.reply_to(m, "⏳ Готовлю выгрузку…")
+    # Большая выгрузка может занять время — не занимаем поток обработчиков
+    threading.Thread(target=send_export, args=(m.chat.id, table, filters, fmt), daemon=True).start()
+
+def send_export(chat_id, table, filters, fmt):
+    """Сформировать файл выгрузки и отправить его документом."""
+    path = None
+    try:
+        path, count = export.write_export(table, filters, fmt)
+        with open(path, "rb") as f:
+            bot.send_document(chat_id, f, visible_file_name=export.export_file_name(table, fmt),
+                              caption=f"Выгрузка {table}: {count} строк")
+    except Exception as e:
+        logger.exception("Ошибка выгрузки %s", table, extra={"filters": filters, "format": fmt})
+        bot.send_message(chat_id, f"Не удалось сформировать выгрузку: {e}")
+    finally:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+def run_backup():
+    """Снимок базы (backup.py) с настройками из .env."""
+    directory, keep, pages = backup.backup_settings()
+    return backup.create_snapshot(db.conn, db.DB_FILE, directory, keep, pages)
+
+@handlers.message_handler(commands=['backup'])
+def cmd_backup(m):
+    if not ADMIN_ID or m.chat.id != ADMIN_ID:
+        return
+    bot.reply_to(m, "⏳ Создаю резервную копию…")
+    threading.Thread(target=send_backup_report, args=(m.chat.id,), daemon=True).start()
+
+def send_backup_report(chat_id):
+    """Создать снимок базы и сообщить размер и длительность."""
+    try:
+        result = run_backup()
+    except Exception as e:
+        logger.exception("Ошибка резервного копирования")
+        return bot.send_message(chat_id, f"Не удалось создать резервную копию: {e}")
+    bot.send_message(chat_id, f"✅ Резервная копия: {os.path.basename(result.path)}\n"
+                              f"База: {backup.format_size(result.db_size)} ({result.pages} страниц), "
+                              f"сжато: {backup.format_size(result.compressed_size)}\n"
+                              f"Время: {result.seconds:.2f} с\n"
+                              f"Хранится снимков: {result.kept} (удалено старых: {len(result.removed)})")
+
 # ——————————————————————————————————————————————————————
 # 7) Обработчики кнопок меню (ReplyKeyboard)
 # ——————————————————————————————————————————————————————
-@bot.message_handler(func=lambda m: m.text == "📅 Расписание (сегодня)")
+@handlers.message_handler(func=lambda m: m.text == "📅 Расписание (сегодня)")
 def menu_today(m):
     cmd_schedule(m)
 
-@bot.message_handler(func=lambda m: m.text == "📅 Расписание (неделя)")
+@handlers.message_handler(func=lambda m: m.text == "📅 Расписание (неделя)")
 def menu_week(m):
     cmd_week(m)
 
-@bot.message_handler(func=lambda m: m.text == "📰 Новости")
+@handlers.message_handler(func=lambda m: m.text == "📰 Новости")
 def menu_news(m):
     cmd_news(m)
 
-@bot.message_handler(func=lambda m: m.text == "❓ FAQ")
+@handlers.message_handler(func=lambda m: m.text == "❓ FAQ")
 def menu_faq(m):
     cmd_faq(m)
 
-@bot.message_handler(func=lambda m: m.text == "📖 Ресурсы")
+@handlers.message_handler(func=lambda m: m.text == "📖 Ресурсы")
 def menu_resources(m):
     cmd_resources(m)
 
-@bot.message_handler(func=lambda m: m.text == "📝 Подать заявку")
+@handlers.message_handler(func=lambda m: m.text == "📝 Подать заявку")
 def menu_request(m):
     uid = m.chat.id
     kb = telebot.types.InlineKeyboardMarkup()
@@ -696,16 +1442,16 @@ def menu_request(m):
     kb.add(telebot.types.InlineKeyboardButton("Пересдача", callback_data="req_hvost"))
     bot.send_message(uid, "Выберите тип заявки:", reply_markup=kb)
 
-@bot.message_handler(func=lambda m: m.text == "📋 Мои заявки")
+@handlers.message_handler(func=lambda m: m.text == "📋 Мои заявки")
 def menu_status(m):
     cmd_status(m)
 
-@bot.message_handler(func=lambda m: m.text == "💬 Задать вопрос")
+@handlers.message_handler(func=lambda m: m.text == "💬 Задать вопрос")
 def menu_question(m):
     uid = m.chat.id
     bot.send_message(uid, "Напишите свой вопрос в ответном сообщении, и он будет сохранен для последующего ответа")
 
-@bot.message_handler(commands=['list'])
+@handlers.message_handler(commands=['list'])
 def cmd_list(m):
     # Доступно только администратору
     if not ADMIN_ID or m.chat.id != ADMIN_ID:
@@ -748,7 +1494,7 @@ def cmd_list(m):
             for rid, content, dt in rows:
                 try:
                     date_str = datetime.strptime(dt, "%Y-%m-%d %H:%M:%S").strftime("%d.%m.%Y")
-                except:
+                except (TypeError, ValueError):
                     date_str = dt.split(" ")[0]
                 text += f"\n{rid} | [{date_str}] {content}"
 
@@ -767,13 +1513,13 @@ def cmd_list(m):
 
     bot.send_message(m.chat.id, text, parse_mode="Markdown")
 
-@bot.message_handler(func=lambda m: m.text == "👤 Мой профиль")
+@handlers.message_handler(func=lambda m: m.text == "👤 Мой профиль")
 def menu_profile(m):
     uid = m.chat.id
     profile = db.get_user_profile(uid)
     if not profile:
         return bot.send_message(uid, "Данные профиля не найдены.")
-    grp, sub, notify_flag, rem_flag = profile
+    grp, sub, notify_flag, rem_flag, news_mode = profile
     grp = grp or "<не указана>"
     sub = sub if sub else "<нет>"
     notify_text = "включены" if notify_flag else "отключены"
@@ -782,11 +1528,12 @@ def menu_profile(m):
             f"Группа: {grp}\n"
             f"Подгруппа: {sub}\n"
             f"Уведомления расписания: {notify_text}\n"
-            f"Учебные напоминания: {rem_text}")
+            f"Учебные напоминания: {rem_text}\n"
+            f"Новости: {digest.describe_mode(news_mode)}")
     bot.send_message(uid, text, parse_mode="Markdown")
 
 # Обработчик inline-кнопок для выбора типа заявки
-@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("req_"))
+@handlers.callback_query_handler(func=lambda call: call.data and call.data.startswith("req_"))
 def callback_request_type(call):
     uid = call.message.chat.id
     if call.data == "req_spravka":
@@ -811,7 +1558,7 @@ def callback_request_type(call):
 # ——————————————————————————————————————————————————————
 # 8) Логирование вопросов пользователей
 # ——————————————————————————————————————————————————————
-@bot.message_handler(func=lambda message: True, content_types=['text'])
+@handlers.message_handler(func=lambda message: True, content_types=['text'])
 def catch_all_text(m):
     if m.chat.type != "private":
         return
@@ -822,24 +1569,55 @@ def catch_all_text(m):
     question_text = m.text.strip()
     if not question_text:
         return
+    # Сначала пробуем ответить из FAQ; вопрос уходит администрации только по кнопке
+    match = db.best_faq_match(question_text)
+    if match:
+        _fid, faq_q, faq_a = match
+        temp_request[m.chat.id] = {"pending_question": question_text}
+        kb = telebot.types.InlineKeyboardMarkup()
+        kb.add(telebot.types.InlineKeyboardButton("👍 Это ответ на мой вопрос", callback_data="faqq_ok"))
+        kb.add(telebot.types.InlineKeyboardButton("✉️ Отправить вопрос администрации", callback_data="faqq_send"))
+        return bot.reply_to(m, f"Возможно, это ответ на ваш вопрос:\n\n*{faq_q}*\n_{faq_a}_",
+                            parse_mode="Markdown", reply_markup=kb)
     db.add_question(m.chat.id, question_text)
     bot.reply_to(m, "✅ Ваш вопрос отправлен. Мы ответим на него в ближайшее время.")
 
+# Обработчик кнопок под автоответом из FAQ
+@handlers.callback_query_handler(func=lambda call: call.data in ("faqq_ok", "faqq_send"))
+def callback_faq_answer(call):
+    uid = call.message.chat.id
+    data = temp_request.get(uid) or {}
+    question_text = data.get("pending_question")
+    if question_text:
+        temp_request.pop(uid, None)
+    bot.edit_message_reply_markup(uid, call.message.message_id, reply_markup=None)
+    if call.data == "faqq_ok":
+        return bot.answer_callback_query(call.id, "Рады помочь!")
+    if not question_text:
+        # Вопрос хранится в памяти: после перезапуска бота или нового сообщения его уже нет
+        bot.answer_callback_query(call.id, "Вопрос не найден")
+        return bot.send_message(uid, "Не удалось найти ваш вопрос. Пожалуйста, отправьте его ещё раз.")
+    db.add_question(uid, question_text)
+    bot.answer_callback_query(call.id, "Вопрос отправлен")
+    bot.send_message(uid, "✅ Ваш вопрос отправлен. Мы ответим на него в ближайшее время.")
+
 # ——————————————————————————————————————————————————————
 # 9) Ежедневные рассылки (расписание и напоминания)
 # ——————————————————————————————————————————————————————
 def send_daily_schedule():
     """Ежедневная отправка расписания на сегодня (08:00) всем, кто включил notify."""
     users_list = db.get_users_for_notify()
+    current_schedule()
+    today = date.today()
+    # Текст строится один раз на пару (группа, подгруппа); большие пакеты — в пуле процессов
+    keys = sorted({(group_name, sub or 0) for _, group_name, sub in users_list})
+    texts = dict(zip(keys, get_render_pool().render_schedules("day", [(g, s, today) for g, s in keys])))
+    messages = []
     for user_id, group_name, sub in users_list:
-        classes_today = get_today_schedule(group_name)
-        if not classes_today:
-            continue
-        classes_today = filter_by_subgroup(classes_today, sub)
-        try:
-            bot.send_message(user_id, f"*Расписание на сегодня ({group_name}):*\n{classes_today}", parse_mode="Markdown")
-        except:
-            continue
+        classes_today = texts[(group_name, sub or 0)]
+        if classes_today:
+            messages.append((user_id, timetable.format_daily_message(group_name, classes_today)))
+    sender.submit_batch(messages, parse_mode="Markdown")
 
 def send_daily_reminders():
     """Ежедневная отправка дедлайнов/мотивации (09:00) всем, кто включил reminders.""" 
@@ -869,23 +1647,159 @@ def send_daily_reminders():
     for user_id in users_to_remind:
         try:
             bot.send_message(user_id, text, parse_mode="Markdown")
-        except:
+        except Exception as e:
+            logger.warning("Напоминание не доставлено: %s", e, extra={"user_id": user_id})
             continue
-            
-# Планируем ежедневные задачи
-schedule.every().day.at("08:00").do(send_daily_schedule)
-schedule.every().day.at("09:00").do(send_daily_reminders)
+
+SCHEDULE_CHECK_INTERVAL = 60  # сек; как часто проверять, не изменился ли schedule.xlsx
+SCHEDULE_DIFF_DAYS = 14       # за сколько дней вперёд сравнивать расписание при изменении файла
+
+def reload_schedule(force=False):
+    """Перечитать schedule.xlsx, если файл изменился, и разослать изменения затронутым группам.
+    Расписание обновляется в каждом процессе; рассылку выполняет только один экземпляр (claim_job_run
+    по времени изменения файла). Сравниваются ближайшие SCHEDULE_DIFF_DAYS дней, поэтому учитываются
+    и чётность недель, и замены по датам. Возвращает число изменившихся ключей
+    (группа, подгруппа, дата) или None, если файл не менялся."""
+    global schedule_file_mtime
+    pool = get_render_pool()
+    with schedule_reload_lock:
+        mtime = schedule_mtime()
+        if mtime is None or (mtime == schedule_file_mtime and not force):
+            return None
+        logger.info("Перезагрузка расписания", extra={"mtime": mtime, "force": force})
+        old = pool.engine
+        source = load_schedule_source()
+        if not source.lessons and old.source.lessons:
+            # Файл пуст или не читается (например, ещё сохраняется) — не рассылаем «удаление» всего
+            logger.warning("Новое расписание пустое — перезагрузка отложена")
+            return None
+        new = pool.set_source(source)
+        schedule_file_mtime = mtime
+        changes, names = timetable.diff_schedules(old, new, date.today(), SCHEDULE_DIFF_DAYS)
+    if changes and db.claim_job_run("schedule_changes", str(mtime)):
+        sent = notify_schedule_changes(changes, names)
+        logger.info("Изменения расписания разосланы", extra={"changes": len(changes), "messages": sent})
+    return len(changes)
+
+def notify_schedule_changes(changes, names):
+    """Разослать подписчикам (notify=1) затронутых групп только изменившиеся строки."""
+    groups = sorted({names[group] for group, _sub, _day in changes})
+    texts = {}
+    messages = []
+    display = {db.group_key(name): name for name in groups}
+    for user_id, group, sub in db.get_subscribers_in_groups(groups):
+        key = (group, sub or 0)
+        if key not in texts:
+            day_changes = timetable.changes_for(changes, group, sub)
+            texts[key] = timetable.format_changes_message(display[group], day_changes) if day_changes else None
+        if texts[key]:
+            messages.append((user_id, texts[key]))
+    sender.submit_batch(messages, parse_mode="Markdown")
+    return len(messages)
+
+def watch_schedule_file():
+    """Фоновая проверка изменений schedule.xlsx."""
+    while True:
+        time.sleep(SCHEDULE_CHECK_INTERVAL)
+        try:
+            reload_schedule()
+        except Exception:
+            logger.exception("Ошибка перезагрузки расписания")
+
+def run_daily_job(name, func):
+    """Выполнить ежедневную задачу не более одного раза в сутки на все экземпляры бота."""
+    if not db.claim_job_run(name, datetime.now().strftime("%Y-%m-%d")):
+        return
+    started = time.perf_counter()
+    try:
+        func()
+    except Exception:
+        # Исключение не должно останавливать поток планировщика
+        logger.exception("Ошибка ежедневной задачи %s", name, extra={"job": name})
+        return
+    logger.info("Ежедневная задача выполнена", extra={"job": name,
+                                                       "latency_ms": round((time.perf_counter() - started) * 1000, 2)})
+
+# Аренда роли планировщика: при нескольких экземплярах задачи выполняет только один
+SCHEDULER_LEASE_TTL = 180
+
+# Планировщик отмечается в heartbeats раз в минуту; задачи (резервная копия, архивация)
+# выполняются в том же потоке, поэтому допустимый возраст отметки больше
+SCHEDULER_MAX_AGE = 900
+POLLING_MAX_AGE = 120  # long polling возвращается не реже чем раз в 20 с
 
 # Запуск отдельного потока для выполнения задач schedule
 def run_scheduler():
+    # Ежедневные задачи планируются при запуске потока, а не при импорте модуля. После падения
+    # поток перезапускается (health.ThreadSupervisor) — старые задачи убираются, чтобы не задвоиться
+    schedule.clear()
+    schedule.every().day.at("08:00").do(run_daily_job, "daily_schedule", send_daily_schedule)
+    schedule.every().day.at("09:00").do(run_daily_job, "daily_reminders", send_daily_reminders)
+    schedule.every().day.at(os.getenv("BACKUP_TIME", backup.DEFAULT_TIME)).do(run_daily_job, "backup", run_backup)
+    schedule.every().day.at(os.getenv("RETENTION_TIME", retention.DEFAULT_TIME)).do(
+        run_daily_job, "retention", retention.run_retention)
+    schedule.every().day.at(digest.digest_time()).do(run_daily_job, "news_digest",
+                                                     lambda: deliver_news(digest.DAILY))
+    if digest.window_seconds() > 0:
+        schedule.every().minute.do(flush_news_digest)
+    owner = instance_id()
     while True:
-        schedule.run_pending()
+        leader = db.acquire_lease("scheduler", owner, SCHEDULER_LEASE_TTL)
+        if leader:
+            schedule.run_pending()
+        heartbeats.beat("scheduler", leader=leader)
         time.sleep(60)
 
-threading.Thread(target=run_scheduler, daemon=True).start()
+def health_report():
+    """Отчёт для /healthz: (здоров ли, словарь)."""
+    beats = heartbeats.snapshot()
+    threads = supervisor.status()
+    ok = not any(b["stale"] for b in beats.values()) and all(t["alive"] for t in threads.values())
+    return ok, {"status": "ok" if ok else "stale",
+                "uptime_s": round(startup_timer.total(), 1),
+                "heartbeats": beats,
+                "threads": threads,
+                "last_update_id": bot.last_update_id if bot else None,
+                "delivery_pending": sender.pending() if sender else None,
+                "jobs": db.get_job_runs()}
+
+def start_background(polling=True):
+    """Фоновые потоки под надзором (планировщик, слежение за schedule.xlsx), проверка их
+    каждые health.SUPERVISE_INTERVAL секунд и эндпоинт /healthz."""
+    supervisor.start("scheduler", run_scheduler)
+    supervisor.start("schedule_watcher", watch_schedule_file)
+    heartbeats.expect("scheduler", SCHEDULER_MAX_AGE)
+    if polling:
+        heartbeats.expect("polling", POLLING_MAX_AGE)
+    threading.Thread(target=supervisor.run, name="watchdog", daemon=True).start()
+    health.serve(health_report)
+
+startup_timer.record("import", time.perf_counter() - startup_timer.started)
 
 # ——————————————————————————————————————————————————————
 # 10) Запуск бота
 # ——————————————————————————————————————————————————————
-print("Бот запущен...")
-bot.polling(none_stop=True)
+def first_poll():
+    """Первый getUpdates без ожидания: ожидающие апдейты обрабатываются сразу, а время ответа
+    Bot API попадает в отчёт о запуске. polling() продолжит со следующего апдейта."""
+    with startup_timer.phase("first_poll"):
+        try:
+            bot.process_new_updates(bot.get_updates(offset=bot.last_update_id + 1, timeout=10,
+                                                    long_polling_timeout=0))
+        except Exception as e:
+            logger.warning("Ошибка первого getUpdates: %s", e)
+
+def main():
+    """Запуск по фазам: логирование, create_app (настройки, база, бот), расписание, фоновые
+    потоки и /healthz, первый getUpdates; затем отчёт о времени фаз и обычный polling."""
+    logs.setup_logging()
+    create_app()
+    get_render_pool()
+    start_background()
+    first_poll()
+    startup_timer.log()
+    logger.info("Бот запущен")
+    bot.polling(none_stop=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,156 +1,429 @@
 import sqlite3
 import os
+import re
 import json
+import threading
+import time
 from datetime import datetime
 
-# Database file name
-DB_FILE = "bot_data.sqlite"
-
-# Connect to SQLite database (create if not exists)
-conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-cur = conn.cursor()
-
-# Create tables if they do not exist
-cur.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    user_id INTEGER PRIMARY KEY,
-    first_name TEXT,
-    last_name TEXT,
-    username TEXT,
-    group_name TEXT,
-    subgroup INTEGER,
-    notify INTEGER DEFAULT 0,
-    reminders INTEGER DEFAULT 0
-);
-""")
-cur.execute("""
-CREATE TABLE IF NOT EXISTS requests (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    type TEXT,
-    name TEXT,
-    group_name TEXT,
-    details TEXT,
-    status TEXT,
-    created_at TEXT DEFAULT CURRENT_TIMESTAMP
-);
-""")
-cur.execute("""
-CREATE TABLE IF NOT EXISTS questions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    question TEXT,
-    asked_at TEXT DEFAULT CURRENT_TIMESTAMP,
-    answered INTEGER DEFAULT 0,
-    answer TEXT,
-    answered_at TEXT
-);
-""")
-cur.execute("""
-CREATE TABLE IF NOT EXISTS news (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    content TEXT,
-    created_at TEXT DEFAULT CURRENT_TIMESTAMP
-);
-""")
-cur.execute("""
-CREATE TABLE IF NOT EXISTS faq (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    question TEXT,
-    answer TEXT
-);
-""")
-cur.execute("""
-CREATE TABLE IF NOT EXISTS resources (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT,
-    url TEXT
-);
-""")
-conn.commit()
-
-# Автоматическое заполнение базы данными при первом запуске, если она пуста
-cur.execute("SELECT COUNT(*) FROM users")
-users_count = cur.fetchone()[0]
-cur.execute("SELECT COUNT(*) FROM requests")
-requests_count = cur.fetchone()[0]
-cur.execute("SELECT COUNT(*) FROM questions")
-questions_count = cur.fetchone()[0]
-cur.execute("SELECT COUNT(*) FROM news")
-news_count = cur.fetchone()[0]
-cur.execute("SELECT COUNT(*) FROM faq")
-faq_count = cur.fetchone()[0]
-cur.execute("SELECT COUNT(*) FROM resources")
-res_count = cur.fetchone()[0]
-if users_count == 0 and requests_count == 0 and questions_count == 0 and news_count == 0 and faq_count == 0 and res_count == 0:
-    # Добавляем 5 примерных пользователей (с разными группами)
-    sample_users = [
-        (1, "Иван", "Иванов", "ivanov", "ПИ-21", 1, 0, 0),
-        (2, "Петр", "Петров", "petrov", "ПИ-22", 2, 0, 0),
-        (3, "Николай", "Николаев", "nick", "ИК-19", 1, 0, 0),
-        (4, "Сергей", "Сергеев", "sergey", "БИ-20", 2, 0, 0),
-        (5, "Алексей", "Алексеев", "alex", "ФИ-18", 1, 0, 0)
-    ]
-    for user in sample_users:
-        cur.execute("INSERT OR IGNORE INTO users (user_id, first_name, last_name, username, group_name, subgroup, notify, reminders) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", user)
-    # Добавляем по 3 заявки каждого типа (spravka, otsrochka, hvost)
-    sample_requests = [
-        # spravka
-        (1, "spravka", "Иван Иванов", "ПИ-21", "для стипендии", "Принята"),
-        (2, "spravka", "Петр Петров", "ПИ-22", "для военкомата", "Принята"),
-        (3, "spravka", "Николай Николаев", "ИК-19", "для общежития", "Принята"),
-        # otsrochka
-        (2, "otsrochka", "Петр Петров", "ПИ-22", "болезнь", "Принята"),
-        (4, "otsrochka", "Сергей Сергеев", "БИ-20", "семейные обстоятельства", "Принята"),
-        (5, "otsrochka", "Алексей Алексеев", "ФИ-18", "участие в конференции", "Принята"),
-        # hvost (пересдача)
-        (1, "hvost", "Иван Иванов", "ПИ-21", "Математика", "Принята"),
-        (3, "hvost", "Николай Николаев", "ИК-19", "История", "Принята"),
-        (5, "hvost", "Алексей Алексеев", "ФИ-18", "Информатика", "Принята")
-    ]
-    for req in sample_requests:
-        cur.execute("INSERT INTO requests (user_id, type, name, group_name, details, status) VALUES (?, ?, ?, ?, ?, ?)", req)
-    # Добавляем 3 примера FAQ (вопрос + ответ)
-    sample_faq = [
-        ("Как подать заявку на справку?", "Используйте команду /spravka и следуйте инструкциям."),
-        ("Как включить напоминания о дедлайнах?", "Отправьте команду /reminders для включения или отключения напоминаний."),
-        ("Что делать, если я пропустил экзамен по болезни?", "Вы можете подать заявку на пересдачу экзамена командой /hvost.")
-    ]
-    for q, a in sample_faq:
-        cur.execute("INSERT INTO faq (question, answer) VALUES (?, ?)", (q, a))
-    # Добавляем 3 ресурса (название + URL)
-    sample_resources = [
-        ("📚 Электронная библиотека", "https://library.mgppu.ru"),
-        ("🌐 Сайт МГППУ", "https://mgppu.ru"),
-        ("🎓 Личный кабинет студента", "https://lk.mgppu.ru")
-    ]
-    for name, url in sample_resources:
-        cur.execute("INSERT INTO resources (name, url) VALUES (?, ?)", (name, url))
-    # Добавляем 3 новости/объявления
-    sample_news = [
-        "Начало сессии перенесено на 10 июня.",
-        "Прием заявок на стипендию открыт.",
-        "Опубликовано новое расписание занятий."
-    ]
-    for content in sample_news:
-        cur.execute("INSERT INTO news (content) VALUES (?)", (content,))
-    # Добавляем 3 вопроса от пользователей (один из них сразу с ответом администратора)
-    sample_questions = [
-        (1, "Когда начнется экзаменационная сессия?"),
-        (2, "Где можно посмотреть расписание занятий?"),
-        (3, "Как восстановить пароль от электронной почты?")
-    ]
-    answered_qid = None
-    for user_id, question_text in sample_questions:
-        cur.execute("INSERT INTO questions (user_id, question) VALUES (?, ?)", (user_id, question_text))
-        if answered_qid is None:
-            answered_qid = cur.lastrowid
-    # Отмечаем один вопрос (первый) как отвеченный администратором
-    if answered_qid:
-        cur.execute("UPDATE questions SET answered=1, answer=?, answered_at=? WHERE id=?", 
-                    ("Экзаменационная сессия начнется в следующем месяце.", datetime.now().strftime("%Y-%m-%d %H:%M:%S"), answered_qid))
+from similarity import SimilarityIndex
+from timetable import group_key
+
+# Database file name (можно переопределить через переменную окружения DB_FILE)
+DB_FILE = os.getenv("DB_FILE", "bot_data.sqlite")
+
+# Где хранится состояние диалогов: "memory" (один процесс) или "sqlite" (общее для
+# нескольких процессов/реплик, см. workers.py)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+SHARED_STATE = STATE_BACKEND == "sqlite"
+
+# Режимы доставки новостей (users.news_mode, см. digest.py)
+NEWS_MODES = ("instant", "daily")
+
+# Соединение открывается в init_db() (bot.create_app, бенчмарки), а не при импорте модуля:
+# импорт db ничего не создаёт на диске
+conn = None
+cur = None
+FTS_ENABLED = False
+
+def init_db(path=None):
+    """Открыть базу (path или DB_FILE из окружения), создать таблицы, выполнить миграции и
+    заполнить пустую базу примерами. Повторный вызов ничего не делает. Возвращает соединение."""
+    global DB_FILE, STATE_BACKEND, SHARED_STATE, conn, cur
+    if conn is not None:
+        return conn
+    # Окружение перечитывается: .env загружается после импорта модуля (см. bot.create_app)
+    DB_FILE = path or os.getenv("DB_FILE", DB_FILE)
+    STATE_BACKEND = os.getenv("STATE_BACKEND", STATE_BACKEND)
+    SHARED_STATE = STATE_BACKEND == "sqlite"
+    # Connect to SQLite database (create if not exists)
+    # timeout — сколько ждать блокировку, если в базу пишет другой процесс
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False, timeout=30)
+    cur = conn.cursor()
+    # Освобождённые страницы возвращаются ОС по частям (incremental_vacuum). Для новой базы
+    # режим включается здесь; существующую переводит enable_incremental_vacuum
+    # (вручную: python -m retention --enable-incremental-vacuum)
+    cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    # WAL: читатели не блокируют писателя и наоборот (важно при нескольких процессах)
+    cur.execute("PRAGMA journal_mode=WAL")
+    create_schema()
+    seed_sample_data()
+    return conn
+
+def create_schema():
+    """Таблицы, индексы и миграции (все операции идемпотентны)."""
+    global FTS_ENABLED
+    # Create tables if they do not exist
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        first_name TEXT,
+        last_name TEXT,
+        username TEXT,
+        group_name TEXT,
+        subgroup INTEGER,
+        notify INTEGER DEFAULT 0,
+        reminders INTEGER DEFAULT 0
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        type TEXT,
+        name TEXT,
+        group_name TEXT,
+        details TEXT,
+        status TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        question TEXT,
+        asked_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        answered INTEGER DEFAULT 0,
+        answer TEXT,
+        answered_at TEXT
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS news (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS faq (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        question TEXT,
+        answer TEXT
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS resources (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        url TEXT
+    );
+    """)
+    conn.commit()
+
+    # Служебные таблицы для работы нескольких процессов: аренда ролей (lease), очередь апдейтов,
+    # состояние диалогов, next-step обработчики и версии кэшируемого контента
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY,
+        owner TEXT,
+        expires_at REAL
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS bot_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS update_queue (
+        update_id INTEGER PRIMARY KEY,
+        chat_id INTEGER,
+        payload TEXT,
+        claimed_by TEXT,
+        claimed_at REAL
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_update_queue_chat ON update_queue(chat_id, update_id)")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS conversation_state (
+        chat_id INTEGER PRIMARY KEY,
+        data TEXT,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS next_step_handlers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER,
+        callback TEXT,
+        args TEXT
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_next_step_chat ON next_step_handlers(chat_id)")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS content_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    """)
+    cur.executemany("INSERT OR IGNORE INTO content_versions (name, version) VALUES (?, 0)",
+                    [("faq",), ("resources",), ("news",), ("questions",)])
+    conn.commit()
+
+    # Миграция: кластер похожих вопросов (cluster_id = ID первого вопроса кластера)
+    cur.execute("PRAGMA table_info(questions)")
+    if "cluster_id" not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE questions ADD COLUMN cluster_id INTEGER")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_open_cluster ON questions(answered, cluster_id)")
+    conn.commit()
+
+    # Миграция: время последнего изменения заявки (для /status и списка заявок администратора)
+    cur.execute("PRAGMA table_info(requests)")
+    if "updated_at" not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE requests ADD COLUMN updated_at TEXT")
+        cur.execute("UPDATE requests SET updated_at = created_at")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_requests_user_updated ON requests(user_id, updated_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_requests_status ON requests(status, id)")
+    conn.commit()
+
+    # Миграция: нормализованное название группы (group_key) для выборки подписчиков конкретных
+    # групп (уведомления об изменениях расписания). Считается в Python: lower() в SQLite
+    # не меняет регистр кириллицы
+    cur.execute("PRAGMA table_info(users)")
+    if "group_key" not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE users ADD COLUMN group_key TEXT")
+    cur.execute("DROP INDEX IF EXISTS idx_users_group")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_group_key ON users(group_key)")
+    cur.execute("SELECT DISTINCT group_name FROM users WHERE group_key IS NULL AND group_name IS NOT NULL")
+    cur.executemany("UPDATE users SET group_key=? WHERE group_name=? AND group_key IS NULL",
+                    [(group_key(name), name) for (name,) in cur.fetchall()])
     conn.commit()
 
+    # Миграция: режим доставки новостей (digest.py) — 'instant' или 'daily'; рассылка выбирает
+    # получателей по индексу. Отметки «разослано до ID новости» для каждого режима ставятся на
+    # текущую последнюю новость, чтобы старые новости не ушли повторно.
+    cur.execute("PRAGMA table_info(users)")
+    if "news_mode" not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE users ADD COLUMN news_mode TEXT NOT NULL DEFAULT 'instant'")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_news_mode ON users(news_mode)")
+    cur.executemany("INSERT OR IGNORE INTO bot_state (key, value) "
+                    "SELECT ?, COALESCE(MAX(id), 0) FROM news", [(f"news_sent:{m}",) for m in NEWS_MODES])
+    conn.commit()
+
+    # Архив (см. archive_rows и retention.py): отвеченные вопросы, старые новости и закрытые заявки
+    # переносятся из рабочих таблиц, чтобы те оставались небольшими. ID не переиспользуются
+    # (AUTOINCREMENT), поэтому в архиве они уникальны.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS questions_archive (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        question TEXT,
+        asked_at TEXT,
+        answered INTEGER,
+        answer TEXT,
+        answered_at TEXT,
+        cluster_id INTEGER,
+        archived_at TEXT
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS news_archive (
+        id INTEGER PRIMARY KEY,
+        content TEXT,
+        created_at TEXT,
+        archived_at TEXT
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS requests_archive (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        type TEXT,
+        name TEXT,
+        group_name TEXT,
+        details TEXT,
+        status TEXT,
+        created_at TEXT,
+        updated_at TEXT,
+        archived_at TEXT
+    );
+    """)
+    # Представления «рабочая таблица + архив» (столбец archived: 0/1) — для выгрузки и статистики.
+    # CAST задаёт столбцу тип INTEGER, чтобы фильтр archived=1 из /export (строка) совпадал
+    for table, columns in ARCHIVE_COLUMNS.items():
+        cols = ", ".join(columns)
+        cur.execute(f"CREATE VIEW IF NOT EXISTS {table}_all AS "
+                    f"SELECT {cols}, CAST(0 AS INTEGER) AS archived FROM {table} "
+                    f"UNION ALL SELECT {cols}, CAST(1 AS INTEGER) FROM {table}_archive")
+    # /news сортирует новости по дате: индекс (created_at, rowid) избавляет от сортировки таблицы
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_news_created ON news(created_at)")
+    conn.commit()
+
+    # Журнал действий администратора (audit.py): только добавление — триггеры запрещают
+    # изменение и удаление записей. created_at — UTC, как CURRENT_TIMESTAMP
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS audit_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT NOT NULL,
+        admin_id INTEGER,
+        action TEXT NOT NULL,
+        target TEXT,
+        recipients INTEGER,
+        ref TEXT,
+        details TEXT
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_audit_created ON audit_log(created_at)")
+    for event in ("UPDATE", "DELETE"):
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS audit_log_no_{event.lower()} BEFORE {event} ON audit_log "
+                    f"BEGIN SELECT RAISE(ABORT, 'audit_log: записи журнала нельзя изменять'); END;")
+    conn.commit()
+
+    # Полнотекстовый индекс FAQ (FTS5, external content: тексты хранятся только в faq).
+    # Триггеры держат индекс в синхронизации с таблицей faq. Если SQLite собран без FTS5,
+    # поиск работает через LIKE (см. search_faq).
+    try:
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='faq_fts'")
+        fts_exists = cur.fetchone() is not None
+        cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS faq_fts USING fts5(
+            question, answer, content='faq', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        );
+        """)
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS faq_ai AFTER INSERT ON faq BEGIN
+            INSERT INTO faq_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer);
+        END;
+        """)
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS faq_ad AFTER DELETE ON faq BEGIN
+            INSERT INTO faq_fts(faq_fts, rowid, question, answer) VALUES ('delete', old.id, old.question, old.answer);
+        END;
+        """)
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS faq_au AFTER UPDATE ON faq BEGIN
+            INSERT INTO faq_fts(faq_fts, rowid, question, answer) VALUES ('delete', old.id, old.question, old.answer);
+            INSERT INTO faq_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer);
+        END;
+        """)
+        if not fts_exists:
+            # Индекс создан впервые для уже заполненной базы — проиндексировать существующие записи
+            cur.execute("INSERT INTO faq_fts(faq_fts) VALUES ('rebuild')")
+        conn.commit()
+        FTS_ENABLED = True
+    except sqlite3.OperationalError:
+        conn.rollback()
+        FTS_ENABLED = False
+
+def seed_sample_data():
+    """Автоматическое заполнение базы примерами при первом запуске, если она пуста."""
+    cur.execute("SELECT COUNT(*) FROM users")
+    users_count = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM requests")
+    requests_count = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM questions")
+    questions_count = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM news")
+    news_count = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM faq")
+    faq_count = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM resources")
+    res_count = cur.fetchone()[0]
+    if users_count == 0 and requests_count == 0 and questions_count == 0 and news_count == 0 and faq_count == 0 and res_count == 0:
+        # Добавляем 5 примерных пользователей (с разными группами)
+        sample_users = [
+            (1, "Иван", "Иванов", "ivanov", "ПИ-21", 1, 0, 0),
+            (2, "Петр", "Петров", "petrov", "ПИ-22", 2, 0, 0),
+            (3, "Николай", "Николаев", "nick", "ИК-19", 1, 0, 0),
+            (4, "Сергей", "Сергеев", "sergey", "БИ-20", 2, 0, 0),
+            (5, "Алексей", "Алексеев", "alex", "ФИ-18", 1, 0, 0)
+        ]
+        for user in sample_users:
+            cur.execute("INSERT OR IGNORE INTO users (user_id, first_name, last_name, username, group_name, subgroup, notify, reminders, group_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", user + (group_key(user[4]),))
+        # Добавляем по 3 заявки каждого типа (spravka, otsrochka, hvost)
+        sample_requests = [
+            # spravka
+            (1, "spravka", "Иван Иванов", "ПИ-21", "для стипендии", "Принята"),
+            (2, "spravka", "Петр Петров", "ПИ-22", "для военкомата", "Принята"),
+            (3, "spravka", "Николай Николаев", "ИК-19", "для общежития", "Принята"),
+            # otsrochka
+            (2, "otsrochka", "Петр Петров", "ПИ-22", "болезнь", "Принята"),
+            (4, "otsrochka", "Сергей Сергеев", "БИ-20", "семейные обстоятельства", "Принята"),
+            (5, "otsrochka", "Алексей Алексеев", "ФИ-18", "участие в конференции", "Принята"),
+            # hvost (пересдача)
+            (1, "hvost", "Иван Иванов", "ПИ-21", "Математика", "Принята"),
+            (3, "hvost", "Николай Николаев", "ИК-19", "История", "Принята"),
+            (5, "hvost", "Алексей Алексеев", "ФИ-18", "Информатика", "Принята")
+        ]
+        for req in sample_requests:
+            cur.execute("INSERT INTO requests (user_id, type, name, group_name, details, status, updated_at) VALUES (?, ?, ?, ?, ?, ?, datetime('now'))", req)
+        # Добавляем 3 примера FAQ (вопрос + ответ)
+        sample_faq = [
+            ("Как подать заявку на справку?", "Используйте команду /spravka и следуйте инструкциям."),
+            ("Как включить напоминания о дедлайнах?", "Отправьте команду /reminders для включения или отключения напоминаний."),
+            ("Что делать, если я пропустил экзамен по болезни?", "Вы можете подать заявку на пересдачу экзамена командой /hvost.")
+        ]
+        for q, a in sample_faq:
+            cur.execute("INSERT INTO faq (question, answer) VALUES (?, ?)", (q, a))
+        # Добавляем 3 ресурса (название + URL)
+        sample_resources = [
+            ("📚 Электронная библиотека", "https://library.mgppu.ru"),
+            ("🌐 Сайт МГППУ", "https://mgppu.ru"),
+            ("🎓 Личный кабинет студента", "https://lk.mgppu.ru")
+        ]
+        for name, url in sample_resources:
+            cur.execute("INSERT INTO resources (name, url) VALUES (?, ?)", (name, url))
+        # Добавляем 3 новости/объявления
+        sample_news = [
+            "Начало сессии перенесено на 10 июня.",
+            "Прием заявок на стипендию открыт.",
+            "Опубликовано новое расписание занятий."
+        ]
+        for content in sample_news:
+            cur.execute("INSERT INTO news (content) VALUES (?)", (content,))
+        # Примеры считаются уже разосланными
+        cur.execute("UPDATE bot_state SET value=(SELECT MAX(id) FROM news) WHERE key LIKE 'news_sent:%'")
+        # Добавляем 3 вопроса от пользователей (один из них сразу с ответом администратора)
+        sample_questions = [
+            (1, "Когда начнется экзаменационная сессия?"),
+            (2, "Где можно посмотреть расписание занятий?"),
+            (3, "Как восстановить пароль от электронной почты?")
+        ]
+        answered_qid = None
+        for user_id, question_text in sample_questions:
+            cur.execute("INSERT INTO questions (user_id, question) VALUES (?, ?)", (user_id, question_text))
+            if answered_qid is None:
+                answered_qid = cur.lastrowid
+        # Отмечаем один вопрос (первый) как отвеченный администратором
+        if answered_qid:
+            cur.execute("UPDATE questions SET answered=1, answer=?, answered_at=? WHERE id=?", 
+                        ("Экзаменационная сессия начнется в следующем месяце.", datetime.now().strftime("%Y-%m-%d %H:%M:%S"), answered_qid))
+        conn.commit()
+
+# Кэш готовых сообщений для редко меняющихся таблиц (FAQ, ресурсы, новости).
+# У каждой таблицы есть номер версии; функции добавления/удаления увеличивают его после commit,
+# и закэшированные значения со старой версией при следующем чтении строятся заново.
+content_versions = {"faq": 0, "resources": 0, "news": 0, "questions": 0}
+content_cache = {}
+
+def content_version(table):
+    """Текущая версия таблицы. При общем состоянии (несколько процессов) версия читается из базы,
+    чтобы изменения, сделанные другим процессом, тоже сбрасывали кэш."""
+    if SHARED_STATE:
+        row = conn.execute("SELECT version FROM content_versions WHERE name=?", (table,)).fetchone()
+        return row[0] if row else 0
+    return content_versions[table]
+
+def cached_content(table, key, build):
+    """Вернуть закэшированное значение для (table, key) или построить его вызовом build()."""
+    version = content_version(table)  # версия фиксируется до построения значения
+    entry = content_cache.get((table, key))
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    value = build()
+    content_cache[(table, key)] = (version, value)
+    return value
+
+def invalidate_content(table):
+    """Сбросить кэш сообщений, построенных по таблице table."""
+    content_versions[table] += 1
+    if SHARED_STATE:
+        conn.execute("UPDATE content_versions SET version = version + 1 WHERE name=?", (table,))
+        conn.commit()
+
 # Функции для работы с данными (пользователи, заявки, вопросы, новости, FAQ, ресурсы)
 def ensure_user(user):
     """Убедиться, что пользователь есть в базе (если нет, добавить его)."""
@@ -168,7 +441,8 @@ def ensure_user(user):
 
 def update_user_group(user_id, group_name):
     """Обновить учебную группу пользователя и сбросить подгруппу (None)."""
-    cur.execute("UPDATE users SET group_name=?, subgroup=NULL WHERE user_id=?", (group_name, user_id))
+    cur.execute("UPDATE users SET group_name=?, group_key=?, subgroup=NULL WHERE user_id=?",
+                (group_name, group_key(group_name), user_id))
     conn.commit()
 
 def update_user_subgroup(user_id, subgroup):
@@ -200,21 +474,82 @@ def toggle_reminders(user_id):
     conn.commit()
     return new_state
 
+def toggle_news_mode(user_id):
+    """Переключить режим доставки новостей: 'instant' ↔ 'daily'. Возвращает новый режим."""
+    cur.execute("SELECT news_mode FROM users WHERE user_id=?", (user_id,))
+    row = cur.fetchone()
+    new_mode = "instant" if row and row[0] == "daily" else "daily"
+    cur.execute("UPDATE users SET news_mode=? WHERE user_id=?", (new_mode, user_id))
+    conn.commit()
+    return new_mode
+
 def get_user_group_sub(user_id):
     """Получить группу и подгруппу пользователя (возвращает tuple)."""
     cur.execute("SELECT group_name, subgroup FROM users WHERE user_id=?", (user_id,))
     return cur.fetchone()
 
 def get_user_profile(user_id):
-    """Получить информацию профиля пользователя: группа, подгруппа, notify, reminders."""
-    cur.execute("SELECT group_name, subgroup, notify, reminders FROM users WHERE user_id=?", (user_id,))
+    """Получить информацию профиля пользователя: группа, подгруппа, notify, reminders, news_mode."""
+    cur.execute("SELECT group_name, subgroup, notify, reminders, news_mode FROM users WHERE user_id=?", (user_id,))
     return cur.fetchone()
 
+# Индекс похожести открытых вопросов (строится лениво из базы при первом обращении)
+question_index = None
+question_index_max_id = 0
+question_index_version = None  # версия "questions" (ответы на вопросы), с которой сверен индекс
+question_index_lock = threading.Lock()
+
+def get_question_index():
+    """Вернуть индекс похожести неотвеченных вопросов, при необходимости построив его.
+    Вопросам без кластера (старые записи) кластер назначается здесь же одним пакетом.
+    При общем состоянии индекс дополняется вопросами, которые добавили другие процессы,
+    а после ответов в других процессах (версия "questions") из него убираются закрытые вопросы."""
+    global question_index, question_index_max_id, question_index_version
+    if question_index is not None and not SHARED_STATE:
+        return question_index
+    with question_index_lock:
+        index = question_index or SimilarityIndex()
+        version = content_version("questions")  # до выборки: ответ, данный во время сверки, не потеряется
+        if question_index is not None and version != question_index_version:
+            open_ids = {qid for (qid,) in conn.execute("SELECT id FROM questions WHERE answered=0")}
+            index.remove([qid for qid in index.ids() if qid not in open_ids])
+        rows = conn.execute("SELECT id, question, cluster_id FROM questions WHERE answered=0 AND id > ? ORDER BY id",
+                            (question_index_max_id,)).fetchall()
+        unassigned = []
+        for qid, text, cluster_id in rows:
+            question_index_max_id = max(question_index_max_id, qid)
+            if qid in index:
+                continue
+            assigned = index.add(qid, text, cluster_id)
+            if cluster_id is None:
+                unassigned.append((assigned, qid))
+        if unassigned:
+            conn.executemany("UPDATE questions SET cluster_id=? WHERE id=?", unassigned)
+            conn.commit()
+        question_index = index
+        question_index_version = version
+        return index
+
+def questions_answered(qids):
+    """Убрать отвеченные вопросы из индекса; другие процессы узнают о них по версии "questions"."""
+    if question_index is not None:
+        question_index.remove(qids)
+    if SHARED_STATE and qids:
+        invalidate_content("questions")
+
 def add_question(user_id, text):
-    """Сохранить вопрос пользователя (неотвеченный) в базе. Возвращает ID вопроса."""
-    cur.execute("INSERT INTO questions (user_id, question) VALUES (?, ?)", (user_id, text))
+    """Сохранить вопрос пользователя (неотвеченный) в базе, отнеся его к кластеру похожих.
+    Возвращает ID вопроса."""
+    index = get_question_index()
+    cluster_id = index.find_cluster(text)
+    cur.execute("INSERT INTO questions (user_id, question, cluster_id) VALUES (?, ?, ?)", (user_id, text, cluster_id))
+    qid = cur.lastrowid
+    if cluster_id is None:
+        cluster_id = qid
+        cur.execute("UPDATE questions SET cluster_id=? WHERE id=?", (qid, qid))
     conn.commit()
-    return cur.lastrowid
+    index.add(qid, text, cluster_id)
+    return qid
 
 def get_unanswered_questions():
     """Получить список всех вопросов пользователей без ответа (с именами пользователей)."""
@@ -234,8 +569,83 @@ def answer_question(qid, answer_text):
     user_id, question_text = row
     cur.execute("UPDATE questions SET answered=1, answer=?, answered_at=datetime('now') WHERE id=?", (answer_text, qid))
     conn.commit()
+    questions_answered([qid])
     return (user_id, question_text)
 
+def get_question_clusters():
+    """Получить кластеры похожих неотвеченных вопросов, крупные первыми.
+    Список tuple (cluster_id, count, ids, first_name, question, asked_at), где ids — ID вопросов
+    кластера по возрастанию, а имя, текст и время относятся к самому раннему вопросу."""
+    get_question_index()
+    cur.execute(
+        "SELECT q.cluster_id, COUNT(*), group_concat(q.id), MIN(q.id) "
+        "FROM questions q WHERE q.answered = 0 GROUP BY q.cluster_id "
+        "ORDER BY COUNT(*) DESC, MIN(q.id)"
+    )
+    groups = cur.fetchall()
+    if not groups:
+        return []
+    first_ids = [row[3] for row in groups]
+    placeholders = ",".join("?" * len(first_ids))
+    cur.execute(
+        "SELECT q.id, u.first_name, q.question, datetime(q.asked_at, 'localtime') "
+        f"FROM questions q LEFT JOIN users u ON q.user_id = u.user_id WHERE q.id IN ({placeholders})",
+        first_ids
+    )
+    firsts = {row[0]: row[1:] for row in cur.fetchall()}
+    result = []
+    for cluster_id, count, ids, first_id in groups:
+        first_name, question, asked_at = firsts[first_id]
+        id_list = sorted(int(x) for x in ids.split(","))
+        result.append((cluster_id, count, id_list, first_name, question, asked_at))
+    return result
+
+def get_question_cluster_id(qid):
+    """Получить ID кластера неотвеченного вопроса (или None)."""
+    get_question_index()
+    cur.execute("SELECT cluster_id FROM questions WHERE id=? AND answered=0", (qid,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def answer_cluster(cluster_id, answer_text):
+    """Ответить сразу на все неотвеченные вопросы кластера одним UPDATE.
+    Возвращает список tuple (id, user_id, question) закрытых вопросов."""
+    cur.execute(
+        "UPDATE questions SET answered=1, answer=?, answered_at=datetime('now') "
+        "WHERE cluster_id=? AND answered=0 RETURNING id, user_id, question",
+        (answer_text, cluster_id)
+    )
+    rows = cur.fetchall()
+    conn.commit()
+    questions_answered([row[0] for row in rows])
+    return rows
+
+def answer_questions_bulk(pairs):
+    """Ответить сразу на много вопросов в одной транзакции.
+    pairs — список (qid, answer_text). Пары загружаются executemany во временную таблицу,
+    затем один UPDATE ... FROM ... RETURNING закрывает все ещё открытые вопросы.
+    Возвращает список tuple (id, user_id, question, answer) реально закрытых вопросов."""
+    pairs = [(int(qid), text) for qid, text in pairs]
+    if not pairs:
+        return []
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_answers (qid INTEGER PRIMARY KEY, answer TEXT)")
+    try:
+        cur.execute("DELETE FROM bulk_answers")
+        cur.executemany("INSERT OR REPLACE INTO bulk_answers (qid, answer) VALUES (?, ?)", pairs)
+        cur.execute(
+            "UPDATE questions SET answered=1, answer=b.answer, answered_at=datetime('now') "
+            "FROM bulk_answers b WHERE questions.id = b.qid AND questions.answered = 0 "
+            "RETURNING questions.id, questions.user_id, questions.question, questions.answer"
+        )
+        rows = cur.fetchall()
+        cur.execute("DELETE FROM bulk_answers")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    questions_answered([row[0] for row in rows])
+    return rows
+
 def get_all_faq():
     """Получить все записи FAQ списком (question, answer)."""
     cur.execute("SELECT question, answer FROM faq")
@@ -245,14 +655,78 @@ def add_faq(question_text, answer_text):
     """Добавить новую запись в FAQ."""
     cur.execute("INSERT INTO faq (question, answer) VALUES (?, ?)", (question_text, answer_text))
     conn.commit()
+    invalidate_content("faq")
 
 def delete_faq(faq_id):
     """Удалить запись FAQ по ID. Возвращает True, если удалено успешно."""
     cur.execute("DELETE FROM faq WHERE id=?", (faq_id,))
     deleted = cur.rowcount
     conn.commit()
+    if deleted:
+        invalidate_content("faq")
     return deleted > 0
 
+# Служебные слова, которые не участвуют в поиске по FAQ
+FAQ_STOPWORDS = {
+    "как", "что", "где", "когда", "это", "для", "или", "если", "можно", "нужно", "мне", "меня",
+    "вас", "вам", "нас", "нам", "мой", "моя", "мои", "при", "про", "так", "уже", "все", "всё",
+    "есть", "был", "была", "будет", "чтобы", "почему", "какой", "какая", "какие", "ли", "же",
+}
+# Длина основы слова: грубая замена стемминга («экзаменационная» → «экзам*»)
+FAQ_STEM_LEN = 5
+
+def faq_terms(text):
+    """Разбить текст на основы слов для поиска по FAQ (без служебных и коротких слов)."""
+    words = re.findall(r"\w+", (text or "").lower())
+    terms = []
+    for w in words:
+        if len(w) < 3 or w in FAQ_STOPWORDS or w.isdigit():
+            continue
+        stem = w[:FAQ_STEM_LEN]
+        if stem not in terms:
+            terms.append(stem)
+    return terms
+
+def search_faq(query, limit=5):
+    """Найти записи FAQ по тексту запроса. Возвращает список (id, question, answer, score),
+    отсортированный по релевантности (bm25, меньше — лучше; вопрос весит вдвое больше ответа)."""
+    terms = faq_terms(query)
+    if not terms:
+        return []
+    if FTS_ENABLED:
+        match = " OR ".join(f'"{t}"*' for t in terms)
+        cur.execute(
+            "SELECT f.id, f.question, f.answer, bm25(faq_fts, 2.0, 1.0) AS score "
+            "FROM faq_fts JOIN faq f ON f.id = faq_fts.rowid "
+            "WHERE faq_fts MATCH ? ORDER BY score LIMIT ?",
+            (match, limit)
+        )
+        return cur.fetchall()
+    # Запасной вариант без FTS5: ранжирование по числу совпавших основ
+    cur.execute("SELECT id, question, answer FROM faq")
+    scored = []
+    for fid, q, a in cur.fetchall():
+        text = f"{q} {a}".lower()
+        hits = sum(1 for t in terms if t in text)
+        if hits:
+            scored.append((fid, q, a, -float(hits)))
+    scored.sort(key=lambda r: r[3])
+    return scored[:limit]
+
+def best_faq_match(text, min_overlap=0.5):
+    """Найти запись FAQ, достаточно похожую на вопрос пользователя, для автоответа.
+    Возвращает (id, question, answer) или None. Совпадение засчитывается, если вопрос FAQ
+    содержит не меньше min_overlap основ из текста (и минимум две, если их в тексте больше одной)."""
+    terms = faq_terms(text)
+    if not terms:
+        return None
+    for fid, q, a, _score in search_faq(text, limit=3):
+        faq_words = re.findall(r"\w+", q.lower())
+        matched = sum(1 for t in terms if any(w.startswith(t) for w in faq_words))
+        if matched >= min(2, len(terms)) and matched / len(terms) >= min_overlap:
+            return (fid, q, a)
+    return None
+
 def get_all_resources():
     """Получить все ресурсы (список tuple (name, url))."""
     cur.execute("SELECT name, url FROM resources")
@@ -262,35 +736,139 @@ def add_resource(name, url):
     """Добавить новый ресурс (ссылку)."""
     cur.execute("INSERT INTO resources (name, url) VALUES (?, ?)", (name, url))
     conn.commit()
+    invalidate_content("resources")
 
 def delete_resource(res_id):
     """Удалить ресурс по ID. Возвращает True, если удалён ресурс."""
     cur.execute("DELETE FROM resources WHERE id=?", (res_id,))
     deleted = cur.rowcount
     conn.commit()
+    if deleted:
+        invalidate_content("resources")
     return deleted > 0
 
+# Статусы заявок: код (для команд администратора) → значение в базе
+REQUEST_STATUSES = {
+    "new": "Принята",
+    "work": "В работе",
+    "ready": "Готова",
+    "done": "Выдана",
+    "rejected": "Отклонена",
+}
+# Допустимые переходы между статусами
+REQUEST_TRANSITIONS = {
+    "Принята": ("В работе", "Готова", "Отклонена"),
+    "В работе": ("Готова", "Отклонена"),
+    "Готова": ("Выдана",),
+    "Выдана": (),
+    "Отклонена": (),
+}
+# Незакрытые заявки (список администратора по умолчанию)
+OPEN_REQUEST_STATUSES = ("Принята", "В работе", "Готова")
+
 def insert_request(user_id, req_type, name, group_name, details, status="Принята"):
     """Добавить новую заявку (spravka, otsrochka, hvost) в базу данных."""
-    cur.execute("INSERT INTO requests (user_id, type, name, group_name, details, status) VALUES (?, ?, ?, ?, ?, ?)",
+    cur.execute("INSERT INTO requests (user_id, type, name, group_name, details, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, datetime('now'))",
                 (user_id, req_type, name, group_name, details, status))
     conn.commit()
     return cur.lastrowid
 
-def get_requests_by_user(user_id):
-    """Получить все заявки пользователя в виде списка tuple (type, details, status)."""
-    cur.execute("SELECT type, details, status FROM requests WHERE user_id=?", (user_id,))
+def get_requests_by_user(user_id, limit=None):
+    """Получить заявки пользователя, начиная с недавно изменённых, списком tuple
+    (type, details, status, updated_at). limit — только последние limit изменений
+    (читаются по индексу (user_id, updated_at))."""
+    sql = "SELECT type, details, status, updated_at FROM requests WHERE user_id=? ORDER BY updated_at DESC, id DESC"
+    params = [user_id]
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    cur.execute(sql, params)
     return cur.fetchall()
 
+def count_requests_by_user(user_id):
+    cur.execute("SELECT COUNT(*) FROM requests WHERE user_id=?", (user_id,))
+    return cur.fetchone()[0]
+
+def get_requests_page(statuses=OPEN_REQUEST_STATUSES, req_type=None, group_name=None, after_id=0, limit=20):
+    """Страница заявок для администратора (keyset-пагинация по id, без OFFSET).
+    Возвращает список tuple (id, user_id, type, name, group_name, details, status, updated_at);
+    следующая страница — after_id = id последней строки."""
+    placeholders = ",".join("?" * len(statuses))
+    sql = (f"SELECT id, user_id, type, name, group_name, details, status, updated_at FROM requests "
+           f"WHERE status IN ({placeholders}) AND id > ?")
+    params = list(statuses) + [after_id]
+    if req_type:
+        sql += " AND type = ?"
+        params.append(req_type)
+    if group_name:
+        sql += " AND group_name = ? COLLATE NOCASE"
+        params.append(group_name)
+    sql += " ORDER BY id LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+def set_requests_status(ids, status):
+    """Сменить статус многих заявок одной транзакцией. Меняются только заявки, для которых
+    переход в status допустим (REQUEST_TRANSITIONS). Возвращает список tuple
+    (id, user_id, type, details) изменённых заявок."""
+    ids = sorted({int(i) for i in ids})
+    sources = [old for old, targets in REQUEST_TRANSITIONS.items() if status in targets]
+    if not ids or not sources:
+        return []
+    placeholders = ",".join("?" * len(sources))
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_request_ids (id INTEGER PRIMARY KEY)")
+    try:
+        cur.execute("DELETE FROM bulk_request_ids")
+        cur.executemany("INSERT INTO bulk_request_ids (id) VALUES (?)", [(i,) for i in ids])
+        cur.execute(
+            f"UPDATE requests SET status=?, updated_at=datetime('now') "
+            f"FROM bulk_request_ids b WHERE requests.id = b.id AND requests.status IN ({placeholders}) "
+            f"RETURNING requests.id, requests.user_id, requests.type, requests.details",
+            [status] + sources,
+        )
+        rows = cur.fetchall()
+        cur.execute("DELETE FROM bulk_request_ids")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return sorted(rows)
+
 def get_all_news():
     """Получить все новости/объявления списком (content, created_at)."""
-    cur.execute("SELECT content, created_at FROM news ORDER BY created_at DESC")
+    cur.execute("SELECT content, created_at FROM news ORDER BY created_at DESC, id DESC")
     return cur.fetchall()
 
 def add_news(content):
-    """Добавить новую новость/объявление в базу данных."""
+    """Добавить новую новость/объявление в базу данных. Возвращает ID новости."""
     cur.execute("INSERT INTO news (content) VALUES (?)", (content,))
+    news_id = cur.lastrowid
+    conn.commit()
+    invalidate_content("news")
+    return news_id
+
+def get_user_ids_by_news_mode(mode):
+    """user_id пользователей с режимом доставки новостей mode (по индексу idx_users_news_mode)."""
+    return [row[0] for row in conn.execute("SELECT user_id FROM users WHERE news_mode=?", (mode,))]
+
+def claim_pending_news(mode, min_age=0):
+    """Забрать новости, ещё не разосланные в режиме mode: [(id, content), ...] от старых к новым.
+    Отметка «разослано до ID» сдвигается только если не изменилась с момента чтения, поэтому
+    при одновременном вызове из нескольких потоков или процессов новости получит один из них.
+    min_age — сколько секунд должно пройти с публикации самой старой новости (окно сводки);
+    пока окно не закрыто, возвращается пустой список."""
+    key = f"news_sent:{mode}"
+    last = get_state_value(key, "0")
+    rows = conn.execute("SELECT id, content, created_at FROM news WHERE id > ? ORDER BY id", (int(last),)).fetchall()
+    if not rows:
+        return []
+    if min_age and not conn.execute("SELECT ? <= datetime('now', ?)",
+                                    (rows[0][2], f"-{int(min_age)} seconds")).fetchone()[0]:
+        return []
+    c = conn.execute("UPDATE bot_state SET value=? WHERE key=? AND value=?", (str(rows[-1][0]), key, last))
     conn.commit()
+    return [(news_id, content) for news_id, content, _ in rows] if c.rowcount else []
 
 def get_all_user_ids():
     """Получить список всех user_id пользователей."""
@@ -303,6 +881,19 @@ def get_users_for_notify():
     cur.execute("SELECT user_id, group_name, subgroup FROM users WHERE notify=1 AND group_name IS NOT NULL")
     return cur.fetchall()
 
+def get_subscribers_in_groups(group_names):
+    """Получить (user_id, group_key, subgroup) пользователей с notify=1 из указанных групп.
+    Выборка по индексу idx_users_group_key, поэтому находятся и те, кто ввёл название
+    в другом регистре или с лишними пробелами."""
+    keys = sorted({group_key(name) for name in group_names} - {None})
+    rows = []
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        rows.extend(conn.execute(
+            f"SELECT user_id, group_key, subgroup FROM users "
+            f"WHERE group_key IN ({','.join('?' * len(chunk))}) AND notify=1", chunk).fetchall())
+    return rows
+
 def get_users_for_reminders():
     """Получить список user_id всех пользователей с reminders=1 (включены напоминания)."""
     cur.execute("SELECT user_id FROM users WHERE reminders=1")
@@ -310,27 +901,37 @@ def get_users_for_reminders():
     return [row[0] for row in result]
 
 def get_stats():
-    """Получить статистику использования (словарь с ключами users, requests_total, spravka, otsrochka, hvost, questions_total, questions_unanswered, news, faq, resources)."""
+    """Получить статистику использования (словарь с ключами users, requests_total, spravka, otsrochka, hvost, questions_total, questions_unanswered, news, faq, resources,
+    а также requests_archived, questions_archived, news_archived). Итоги включают архив."""
     stats = {}
     # Count users
     cur.execute("SELECT COUNT(*) FROM users")
     stats["users"] = cur.fetchone()[0] or 0
-    # Count requests total and by type
-    cur.execute("SELECT COUNT(*) FROM requests")
-    stats["requests_total"] = cur.fetchone()[0] or 0
-    cur.execute("SELECT type, COUNT(*) FROM requests GROUP BY type")
-    type_counts = {t: c for t, c in cur.fetchall()}
+    # Count requests total and by type (рабочая таблица и архив)
+    cur.execute("SELECT type, archived, COUNT(*) FROM requests_all GROUP BY type, archived")
+    type_counts = {}
+    stats["requests_archived"] = 0
+    for t, archived, c in cur.fetchall():
+        type_counts[t] = type_counts.get(t, 0) + c
+        if archived:
+            stats["requests_archived"] += c
+    stats["requests_total"] = sum(type_counts.values())
     stats["spravka"] = type_counts.get("spravka", 0)
     stats["otsrochka"] = type_counts.get("otsrochka", 0)
     stats["hvost"] = type_counts.get("hvost", 0)
-    # Questions total and unanswered
+    # Questions total and unanswered (в архиве только отвеченные)
     cur.execute("SELECT COUNT(*), SUM(CASE WHEN answered=0 THEN 1 ELSE 0 END) FROM questions")
     q_total, q_unanswered = cur.fetchone()
-    stats["questions_total"] = q_total or 0
+    cur.execute("SELECT COUNT(*) FROM questions_archive")
+    stats["questions_archived"] = cur.fetchone()[0] or 0
+    stats["questions_total"] = (q_total or 0) + stats["questions_archived"]
     stats["questions_unanswered"] = q_unanswered or 0
     # News count
     cur.execute("SELECT COUNT(*) FROM news")
-    stats["news"] = cur.fetchone()[0] or 0
+    news_live = cur.fetchone()[0] or 0
+    cur.execute("SELECT COUNT(*) FROM news_archive")
+    stats["news_archived"] = cur.fetchone()[0] or 0
+    stats["news"] = news_live + stats["news_archived"]
     # FAQ count
     cur.execute("SELECT COUNT(*) FROM faq")
     stats["faq"] = cur.fetchone()[0] or 0
@@ -338,6 +939,7 @@ def get_stats():
     cur.execute("SELECT COUNT(*) FROM resources")
     stats["resources"] = cur.fetchone()[0] or 0
     return stats
+
 def delete_news(news_id: int) -> bool:
     """
     Удалить новость по ID. 
@@ -346,4 +948,317 @@ def delete_news(news_id: int) -> bool:
     cur.execute("DELETE FROM news WHERE id = ?", (news_id,))
     deleted = cur.rowcount
     conn.commit()
+    if deleted:
+        invalidate_content("news")
     return deleted > 0
+
+# Таблицы, доступные для выгрузки (/export): столбцы, столбец времени для фильтров from/to
+# и допустимые фильтры {имя фильтра: столбец}
+# Столбцы журнала действий (audit_log) в порядке записи audit.AuditLog
+AUDIT_COLUMNS = ("created_at", "admin_id", "action", "target", "recipients", "ref", "details")
+
+EXPORT_TABLES = {
+    # source — откуда читать: заявки и вопросы выгружаются вместе с архивом (archived=1)
+    "requests": {
+        "source": "requests_all",
+        "columns": ["id", "user_id", "type", "name", "group_name", "details", "status", "created_at", "updated_at",
+                    "archived"],
+        "time_column": "created_at",
+        "filters": {"type": "type", "group": "group_name", "status": "status", "user": "user_id",
+                    "archived": "archived"},
+    },
+    "questions": {
+        "source": "questions_all",
+        "columns": ["id", "user_id", "question", "asked_at", "answered", "answer", "answered_at", "archived"],
+        "time_column": "asked_at",
+        "filters": {"answered": "answered", "user": "user_id", "archived": "archived"},
+    },
+    "news": {
+        "source": "news_all",
+        "columns": ["id", "content", "created_at", "archived"],
+        "time_column": "created_at",
+        "filters": {"archived": "archived"},
+    },
+    "audit": {
+        "source": "audit_log",
+        "columns": ["id", *AUDIT_COLUMNS],
+        "time_column": "created_at",
+        "filters": {"action": "action", "admin": "admin_id", "ref": "ref"},
+    },
+    "users": {
+        "columns": ["user_id", "first_name", "last_name", "username", "group_name", "subgroup", "notify", "reminders"],
+        "time_column": None,
+        "filters": {"group": "group_name", "subgroup": "subgroup", "notify": "notify", "reminders": "reminders"},
+    },
+}
+
+def build_export_query(table, filters):
+    """Собрать SELECT для выгрузки таблицы с фильтрами {имя: значение}.
+    Фильтры from/to ограничивают столбец времени (включительно, даты в формате ГГГГ-ММ-ДД).
+    Возвращает (sql, params); ValueError — при неизвестной таблице или фильтре."""
+    spec = EXPORT_TABLES.get(table)
+    if not spec:
+        raise ValueError(f"Неизвестная таблица: {table}")
+    where, params = [], []
+    for name, value in filters.items():
+        if name == "from" and spec["time_column"]:
+            where.append(f"{spec['time_column']} >= ?")
+            params.append(value)
+        elif name == "to" and spec["time_column"]:
+            where.append(f"{spec['time_column']} < date(?, '+1 day')")
+            params.append(value)
+        elif name in spec["filters"]:
+            where.append(f"{spec['filters'][name]} = ?")
+            params.append(value)
+        else:
+            raise ValueError(f"Неизвестный фильтр для {table}: {name}")
+    sql = f"SELECT {', '.join(spec['columns'])} FROM {spec.get('source', table)}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {spec['columns'][0]}"
+    return sql, params
+
+def iter_export_rows(table, filters=None, chunk_size=1000):
+    """Генератор строк таблицы для выгрузки: читает базу порциями по chunk_size (fetchmany),
+    поэтому память не зависит от размера таблицы. Использует собственный курсор."""
+    sql, params = build_export_query(table, filters or {})
+    c = conn.cursor()
+    try:
+        c.execute(sql, params)
+        while True:
+            rows = c.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        c.close()
+
+# ——————————————————————————————————————————————————————
+# Архив (политика хранения — retention.py)
+# ——————————————————————————————————————————————————————
+# Столбцы, переносимые в архив (в порядке *_archive без archived_at)
+ARCHIVE_COLUMNS = {
+    "questions": ["id", "user_id", "question", "asked_at", "answered", "answer", "answered_at", "cluster_id"],
+    "news": ["id", "content", "created_at"],
+    "requests": ["id", "user_id", "type", "name", "group_name", "details", "status", "created_at", "updated_at"],
+}
+ARCHIVE_BATCH = 500
+ARCHIVE_PAUSE = 0.02  # сек между пачками: ожидающие записи успевают получить блокировку
+
+def maintenance_connection():
+    """Отдельное соединение для обслуживания базы (архив, vacuum) в режиме autocommit:
+    транзакции задаются явно и не смешиваются с запросами обработчиков в общем conn."""
+    return sqlite3.connect(DB_FILE, timeout=30, isolation_level=None)
+
+def archive_rows(table, condition, params=(), batch_size=ARCHIVE_BATCH, pause=ARCHIVE_PAUSE):
+    """Перенести строки table, подходящие под condition (SQL-условие с параметрами params),
+    в {table}_archive. Каждая пачка из batch_size строк переносится отдельной короткой
+    транзакцией (BEGIN IMMEDIATE), поэтому обработчики не ждут блокировку записи долго.
+    Возвращает число перенесённых строк."""
+    columns = ", ".join(ARCHIVE_COLUMNS[table])
+    moved = 0
+    c = maintenance_connection()
+    try:
+        while True:
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [row[0] for row in c.execute(
+                    f"SELECT id FROM {table} WHERE {condition} ORDER BY id LIMIT ?", (*params, batch_size))]
+                if ids:
+                    marks = ",".join("?" * len(ids))
+                    c.execute(f"INSERT INTO {table}_archive ({columns}, archived_at) "
+                              f"SELECT {columns}, datetime('now') FROM {table} WHERE id IN ({marks})", ids)
+                    c.execute(f"DELETE FROM {table} WHERE id IN ({marks})", ids)
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+            moved += len(ids)
+            if len(ids) < batch_size:
+                break
+            time.sleep(pause)
+    finally:
+        c.close()
+    if moved and table == "news":
+        invalidate_content("news")
+    return moved
+
+audit_conn = None  # отдельное соединение фонового потока журнала (audit.AuditLog)
+
+def append_audit(rows):
+    """Дописать пачку записей журнала (кортежи в порядке AUDIT_COLUMNS) одной транзакцией."""
+    global audit_conn
+    if audit_conn is None:
+        # Пишет фоновый поток, а также /audit и atexit (flush); вызовы сериализует AuditLog
+        audit_conn = sqlite3.connect(DB_FILE, timeout=30, isolation_level=None, check_same_thread=False)
+    audit_conn.execute("BEGIN IMMEDIATE")
+    try:
+        audit_conn.executemany(f"INSERT INTO audit_log ({', '.join(AUDIT_COLUMNS)}) "
+                               f"VALUES ({', '.join('?' * len(AUDIT_COLUMNS))})", rows)
+        audit_conn.execute("COMMIT")
+    except Exception:
+        audit_conn.execute("ROLLBACK")
+        raise
+
+def get_audit_page(since, until, before=None, after=None, limit=20):
+    """Записи журнала с created_at в [since, until), новые сверху, не больше limit: старше
+    записи before или новее записи after (ID); без курсора — самые новые.
+    Возвращает (строки, есть ли записи старше, есть ли новее)."""
+    where, params = "created_at >= ? AND created_at < ?", (since, until)
+    select = f"SELECT id, {', '.join(AUDIT_COLUMNS)} FROM audit_log WHERE {where}"
+    if after is not None:
+        rows = conn.execute(f"{select} AND id > ? ORDER BY id LIMIT ?", (*params, after, limit)).fetchall()[::-1]
+    elif before is not None:
+        rows = conn.execute(f"{select} AND id < ? ORDER BY id DESC LIMIT ?", (*params, before, limit)).fetchall()
+    else:
+        rows = conn.execute(f"{select} ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+    if not rows:
+        return [], False, False
+    exists = f"SELECT EXISTS(SELECT 1 FROM audit_log WHERE {where} AND id {{}} ?)"
+    has_older = conn.execute(exists.format("<"), (*params, rows[-1][0])).fetchone()[0]
+    has_newer = conn.execute(exists.format(">"), (*params, rows[0][0])).fetchone()[0]
+    return rows, bool(has_older), bool(has_newer)
+
+def auto_vacuum_mode():
+    """0 — NONE, 1 — FULL, 2 — INCREMENTAL."""
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+def incremental_vacuum(max_pages=0):
+    """Вернуть ОС до max_pages свободных страниц (0 — все). Возвращает число освобождённых."""
+    c = maintenance_connection()
+    try:
+        before = c.execute("PRAGMA freelist_count").fetchone()[0]
+        # Прагма освобождает страницы по мере чтения результата — читаем его целиком
+        c.execute(f"PRAGMA incremental_vacuum({int(max_pages)})").fetchall()
+        return before - c.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        c.close()
+
+def enable_incremental_vacuum():
+    """Перевести существующую базу в auto_vacuum=INCREMENTAL: требует одного полного VACUUM
+    (база блокируется на время перестройки)."""
+    c = maintenance_connection()
+    try:
+        c.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        c.execute("VACUUM")
+    finally:
+        c.close()
+
+# ——————————————————————————————————————————————————————
+# Общее состояние для нескольких процессов (см. workers.py)
+# Эти функции вызываются из разных потоков, поэтому используют conn.execute
+# (отдельный курсор на вызов) вместо общего cur.
+# ——————————————————————————————————————————————————————
+def acquire_lease(name, owner, ttl):
+    """Взять или продлить аренду роли name (например, "scheduler") на ttl секунд.
+    Возвращает True, если аренда принадлежит owner."""
+    now = time.time()
+    c = conn.execute(
+        "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET owner=excluded.owner, expires_at=excluded.expires_at "
+        "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+        (name, owner, now + ttl, now)
+    )
+    conn.commit()
+    return c.rowcount > 0
+
+def claim_job_run(job_name, period):
+    """Отметить запуск задачи job_name за период period (например, дату "2024-06-10").
+    Возвращает True только для первого вызова за период — задача не выполнится дважды,
+    даже если роль планировщика перешла к другому экземпляру."""
+    c = conn.execute(
+        "INSERT INTO bot_state (key, value) VALUES (?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value=excluded.value WHERE bot_state.value < excluded.value",
+        (f"last_run:{job_name}", period)
+    )
+    conn.commit()
+    return c.rowcount > 0
+
+def release_lease(name, owner):
+    """Освободить аренду роли, если она принадлежит owner."""
+    conn.execute("DELETE FROM leases WHERE name=? AND owner=?", (name, owner))
+    conn.commit()
+
+def get_job_runs():
+    """Последние запуски ежедневных задач (claim_job_run): {задача: период}."""
+    rows = conn.execute("SELECT key, value FROM bot_state WHERE key LIKE 'last_run:%' ORDER BY key").fetchall()
+    return {key[len("last_run:"):]: value for key, value in rows}
+
+def get_state_value(key, default=None):
+    """Прочитать служебное значение (например, смещение getUpdates)."""
+    row = conn.execute("SELECT value FROM bot_state WHERE key=?", (key,)).fetchone()
+    return row[0] if row else default
+
+def enqueue_updates(updates, next_offset):
+    """Положить апдейты в общую очередь и запомнить следующее смещение getUpdates — в одной транзакции.
+    updates — список (update_id, chat_id, payload_json); повторно полученные апдейты игнорируются."""
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO update_queue (update_id, chat_id, payload) VALUES (?, ?, ?)", updates)
+        conn.execute("INSERT OR REPLACE INTO bot_state (key, value) VALUES ('updates_offset', ?)", (str(next_offset),))
+
+def claim_update(worker):
+    """Забрать следующий апдейт из очереди. Апдейты одного чата выдаются строго по порядку
+    и не обрабатываются параллельно: берётся только самый ранний апдейт своего чата.
+    Возвращает (update_id, payload_json) или None."""
+    c = conn.execute(
+        "UPDATE update_queue SET claimed_by=?, claimed_at=? WHERE update_id = ("
+        "  SELECT q.update_id FROM update_queue q WHERE q.claimed_by IS NULL AND NOT EXISTS ("
+        "    SELECT 1 FROM update_queue p WHERE p.chat_id = q.chat_id AND p.update_id < q.update_id)"
+        "  ORDER BY q.update_id LIMIT 1"
+        ") RETURNING update_id, payload",
+        (worker, time.time())
+    )
+    row = c.fetchone()
+    conn.commit()
+    return row
+
+def finish_update(update_id):
+    """Удалить обработанный апдейт из очереди."""
+    conn.execute("DELETE FROM update_queue WHERE update_id=?", (update_id,))
+    conn.commit()
+
+def requeue_stale_updates(timeout):
+    """Вернуть в очередь апдейты, которые взял упавший обработчик (дольше timeout секунд)."""
+    c = conn.execute("UPDATE update_queue SET claimed_by=NULL, claimed_at=NULL "
+                     "WHERE claimed_by IS NOT NULL AND claimed_at < ?", (time.time() - timeout,))
+    conn.commit()
+    return c.rowcount
+
+def get_conversation(chat_id):
+    """Получить состояние диалога чата (dict) или None."""
+    row = conn.execute("SELECT data FROM conversation_state WHERE chat_id=?", (chat_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def set_conversation(chat_id, data):
+    """Сохранить состояние диалога чата."""
+    conn.execute("INSERT OR REPLACE INTO conversation_state (chat_id, data, updated_at) "
+                 "VALUES (?, ?, CURRENT_TIMESTAMP)", (chat_id, json.dumps(data, ensure_ascii=False)))
+    conn.commit()
+
+def delete_conversation(chat_id):
+    """Удалить состояние диалога чата. Возвращает удалённое состояние или None."""
+    row = conn.execute("DELETE FROM conversation_state WHERE chat_id=? RETURNING data", (chat_id,)).fetchone()
+    conn.commit()
+    return json.loads(row[0]) if row else None
+
+def add_next_step(chat_id, callback_name, args):
+    """Запомнить next-step обработчик чата (по имени функции и JSON-сериализуемым аргументам)."""
+    conn.execute("INSERT INTO next_step_handlers (chat_id, callback, args) VALUES (?, ?, ?)",
+                 (chat_id, callback_name, json.dumps(args, ensure_ascii=False)))
+    conn.commit()
+
+def pop_next_steps(chat_id):
+    """Забрать (и удалить) next-step обработчики чата: список (callback_name, args)."""
+    rows = conn.execute("DELETE FROM next_step_handlers WHERE chat_id=? RETURNING id, callback, args",
+                        (chat_id,)).fetchall()
+    conn.commit()
+    return [(name, json.loads(args)) for _id, name, args in sorted(rows)]
+
+def has_next_steps(chat_id):
+    """Есть ли у чата сохранённые next-step обработчики."""
+    return conn.execute("SELECT 1 FROM next_step_handlers WHERE chat_id=? LIMIT 1", (chat_id,)).fetchone() is not None
+
+def clear_next_steps(chat_id):
+    """Удалить next-step обработчики чата."""
+    conn.execute("DELETE FROM next_step_handlers WHERE chat_id=?", (chat_id,))
+    conn.commit()
@@ -0,0 +1,155 @@
+"""Очередь исходящих сообщений с ограничением скорости отправки."""
+import logging
+import queue
+import threading
+import time
+
+# Telegram допускает около 30 сообщений в секунду на бота; оставляем запас
+DEFAULT_RATE = 25.0
+# Потоков отправки: при RTT до api.telegram.org ~100 мс один поток успевает лишь ~10 запросов
+# в секунду, и предел rate не достигается. Соединения берутся из общего пула (transport.py)
+DEFAULT_WORKERS = 4
+MAX_RETRIES = 3
+
+logger = logging.getLogger("delivery")
+
+
+class DeliveryBatch:
+    """Пакет сообщений: считает доставленные и неудачные, по завершении вызывает on_complete."""
+
+    def __init__(self, total, on_complete=None):
+        self.total = total
+        self.delivered = 0
+        self.failed = 0
+        self.on_complete = on_complete
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        if total == 0:
+            self._finish()
+
+    def _finish(self):
+        self.done.set()
+        if self.on_complete:
+            try:
+                self.on_complete(self.delivered, self.failed)
+            except Exception:
+                logger.exception("Ошибка в on_complete пакета рассылки")
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.delivered += 1
+            else:
+                self.failed += 1
+            finished = self.delivered + self.failed == self.total
+        if finished:
+            self._finish()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class RateLimitedSender:
+    """Фоновая отправка сообщений не быстрее rate штук в секунду (token bucket).
+
+    send_func(chat_id, text, **kwargs) — обычно bot.send_message. При ответе 429
+    (Too Many Requests) сообщение повторяется после паузы retry_after из ответа API; пауза общая
+    для всех потоков — лимит у Telegram один на бота, и остальные потоки получили бы свои 429.
+    Сообщения отправляют workers потоков с общим ограничением скорости; у каждого потока своя
+    очередь, и чат всегда попадает в одну и ту же, так что порядок сообщений в чате сохраняется.
+    Потоки запускаются лениво при первой отправке.
+    """
+
+    def __init__(self, send_func, rate=DEFAULT_RATE, burst=None, workers=DEFAULT_WORKERS):
+        self.send_func = send_func
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._paused_until = 0.0  # monotonic; до этого момента не отправляет ни один поток
+        self._bucket_lock = threading.Lock()
+        self._queues = [queue.Queue() for _ in range(max(1, int(workers)))]
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def submit(self, chat_id, text, batch=None, **kwargs):
+        """Поставить сообщение в очередь."""
+        self._ensure_started()
+        self._queues[hash(chat_id) % len(self._queues)].put((chat_id, text, kwargs, batch))
+
+    def submit_batch(self, messages, on_complete=None, **kwargs):
+        """Поставить в очередь список (chat_id, text). Возвращает DeliveryBatch."""
+        messages = list(messages)
+        batch = DeliveryBatch(len(messages), on_complete)
+        for chat_id, text in messages:
+            self.submit(chat_id, text, batch=batch, **kwargs)
+        return batch
+
+    def pending(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def join(self):
+        """Дождаться отправки всех сообщений из очереди."""
+        for q in self._queues:
+            q.join()
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if not self._threads:
+                self._threads = [self._start_worker(n) for n in range(len(self._queues))]
+
+    def _start_worker(self, n):
+        thread = threading.Thread(target=self._run, args=(self._queues[n],), name=f"delivery-{n}", daemon=True)
+        thread.start()
+        return thread
+
+    def _acquire(self):
+        while True:
+            with self._bucket_lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                    self._last = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def _pause(self, seconds):
+        """Остановить отправку во всех потоках на seconds секунд (ответ 429)."""
+        with self._bucket_lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            # после паузы корзина пуста: не отправлять сразу burst сообщений в только что снятый лимит
+            self._tokens = 0.0
+            self._last = self._paused_until
+
+    def _send(self, chat_id, text, kwargs):
+        for _ in range(MAX_RETRIES):
+            self._acquire()
+            try:
+                self.send_func(chat_id, text, **kwargs)
+                return True
+            except Exception as e:
+                if getattr(e, "error_code", None) != 429:
+                    logger.warning("Сообщение не доставлено: %s", e, extra={"chat_id": chat_id})
+                    return False
+                params = (getattr(e, "result_json", None) or {}).get("parameters") or {}
+                logger.info("429 от Telegram, пауза", extra={"chat_id": chat_id,
+                                                            "retry_after": params.get("retry_after", 1)})
+                self._pause(params.get("retry_after", 1))
+        logger.warning("Сообщение не доставлено после %d попыток", MAX_RETRIES, extra={"chat_id": chat_id})
+        return False
+
+    def _run(self, jobs):
+        while True:
+            chat_id, text, kwargs, batch = jobs.get()
+            ok = self._send(chat_id, text, kwargs)
+            if batch is not None:
+                batch.record(ok)
+            jobs.task_done()
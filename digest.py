@@ -0,0 +1,52 @@
+"""Сводки новостей: несколько объявлений уходят пользователю одним сообщением.
+
+Режим доставки выбирает пользователь (/digest, столбец users.news_mode):
+- instant — сразу после публикации. Если задано окно NEWS_DIGEST_WINDOW (минуты), рассылка
+  откладывается до конца окна, и всё, что администратор опубликовал за это время, приходит
+  одной сводкой. 0 — без окна, как раньше;
+- daily — одна сводка в сутки в NEWS_DIGEST_TIME (ЧЧ:ММ).
+
+Что уже разослано, хранится отдельно для каждого режима (db.claim_pending_news), поэтому
+сводку не отправят дважды ни после перезапуска, ни из нескольких экземпляров бота.
+"""
+import os
+
+from db import NEWS_MODES as MODES
+
+INSTANT, DAILY = MODES
+
+DEFAULT_WINDOW = 0  # минут
+DEFAULT_TIME = "18:00"
+MAX_MESSAGE_LEN = 4096  # ограничение Telegram на длину сообщения
+
+
+def window_seconds():
+    """Окно накопления мгновенных новостей в секундах (0 — рассылать сразу)."""
+    return int(float(os.getenv("NEWS_DIGEST_WINDOW", DEFAULT_WINDOW)) * 60)
+
+
+def digest_time():
+    return os.getenv("NEWS_DIGEST_TIME", DEFAULT_TIME)
+
+
+def describe_mode(mode):
+    if mode == DAILY:
+        return f"сводкой раз в день в {digest_time()}"
+    return "сразу после публикации"
+
+
+def format_digest(contents, mode=INSTANT):
+    """Тексты сообщений (Markdown) для новостей contents (от старых к новым).
+    Одна мгновенная новость — прежнее «Новое объявление»; длинная сводка делится на несколько
+    сообщений по границам новостей."""
+    if mode == INSTANT and len(contents) == 1:
+        return [f"📢 *Новое объявление:* {contents[0]}"]
+    title = "🗞 *Новости за день*" if mode == DAILY else "📢 *Новые объявления*"
+    messages = [f"{title} ({len(contents)}):"]
+    for content in contents:
+        item = f"• {content}"
+        if len(messages[-1]) + 2 + len(item) > MAX_MESSAGE_LEN:
+            messages.append(item)
+        else:
+            messages[-1] += "\n\n" + item
+    return messages
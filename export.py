@@ -0,0 +1,75 @@
+"""Потоковая выгрузка таблиц базы в CSV/XLSX для администратора (/export)."""
+import csv
+import os
+import tempfile
+from datetime import datetime
+
+import db
+
+FORMATS = ("csv", "xlsx")
+
+
+def parse_export_args(args):
+    """Разобрать аргументы «/export <таблица> [фильтр=значение ...] [csv|xlsx]».
+    Возвращает (таблица, фильтры, формат); ValueError — при ошибке."""
+    if not args:
+        raise ValueError("не указана таблица")
+    table = args[0].lower()
+    if table not in db.EXPORT_TABLES:
+        raise ValueError(f"неизвестная таблица «{table}»")
+    fmt = "csv"
+    filters = {}
+    for token in args[1:]:
+        if token.lower() in FORMATS:
+            fmt = token.lower()
+            continue
+        if "=" not in token:
+            raise ValueError(f"ожидался фильтр вида имя=значение, получено «{token}»")
+        name, value = token.split("=", 1)
+        filters[name.lower()] = value
+    db.build_export_query(table, filters)  # проверка фильтров до начала выгрузки
+    return table, filters, fmt
+
+
+def write_export(table, filters, fmt, directory=None):
+    """Записать выгрузку во временный файл построчно. Возвращает (путь, число строк)."""
+    columns = db.EXPORT_TABLES[table]["columns"]
+    rows = db.iter_export_rows(table, filters)
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}", dir=directory)
+    os.close(fd)
+    try:
+        count = _write_rows(path, table, columns, rows, fmt)
+    except BaseException:
+        # путь ещё не возвращён вызывающему, и удалить файл, кроме как здесь, некому
+        os.remove(path)
+        raise
+    return path, count
+
+
+def _write_rows(path, table, columns, rows, fmt):
+    """Записать заголовок и строки в файл path. Возвращает число строк."""
+    count = 0
+    if fmt == "csv":
+        # utf-8-sig — чтобы Excel корректно открыл кириллицу
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+    else:
+        from openpyxl import Workbook
+
+        # write_only: строки сразу уходят во временный XML и не копятся в памяти
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(table)
+        ws.append(columns)
+        for row in rows:
+            ws.append(row)
+            count += 1
+        wb.save(path)
+    return count
+
+
+def export_file_name(table, fmt):
+    return f"{table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
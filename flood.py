@@ -0,0 +1,134 @@
+"""Защита от флуда: ограничение частоты входящих сообщений по чатам и фильтр дублей.
+
+Проверки выполняются до обработчиков (middleware в bot.py, поллер в workers.py), поэтому
+лишние апдейты отбрасываются раньше, чем дойдут до SQLite или Telegram API.
+Состояние хранится в памяти процесса; при превышении max_chats вытесняются чаты,
+дольше всех не писавшие (LRU).
+
+Настройки (.env): FLOOD_RATE — сообщений в секунду на чат (0 — ограничение выключено),
+FLOOD_BURST — допустимая пачка сообщений подряд, DUPLICATE_WINDOW — за сколько секунд
+повтор того же текста считается дублем (0 — фильтр выключен).
+
+Дублем не считаются команды, кнопки меню (repeatable) и ответ в чате, где ждёт next-step
+обработчик: их повтор — обычное действие пользователя, а отброшенный ответ оставил бы диалог
+без продолжения.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_RATE = 1.0
+DEFAULT_BURST = 10
+DEFAULT_DUPLICATE_WINDOW = 10.0
+DEFAULT_MAX_CHATS = 100000
+
+
+class TokenBucketLimiter:
+    """Корзина токенов на каждый чат: rate токенов в секунду, не более burst."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_chats=DEFAULT_MAX_CHATS):
+        self.rate = rate
+        self.burst = burst
+        self.max_chats = max_chats
+        self._buckets = OrderedDict()  # chat_id -> [токены, время последнего пополнения]
+        self._lock = threading.Lock()
+
+    def allow(self, chat_id, now=None):
+        """Списать токен чата. False — лимит исчерпан, апдейт нужно отбросить."""
+        if self.rate <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._buckets[chat_id] = [float(self.burst), now]
+                if len(self._buckets) > self.max_chats:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(chat_id)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class DuplicateFilter:
+    """Отбрасывает повтор того же текста от того же чата в пределах window секунд."""
+
+    def __init__(self, window=DEFAULT_DUPLICATE_WINDOW, max_chats=DEFAULT_MAX_CHATS):
+        self.window = window
+        self.max_chats = max_chats
+        self._last = OrderedDict()  # chat_id -> (хеш текста, время)
+        self._lock = threading.Lock()
+
+    def is_duplicate(self, chat_id, text, now=None):
+        if self.window <= 0 or not text:
+            return False
+        now = time.monotonic() if now is None else now
+        key = hash(text)
+        with self._lock:
+            last = self._last.get(chat_id)
+            self._last[chat_id] = (key, now)
+            self._last.move_to_end(chat_id)
+            if len(self._last) > self.max_chats:
+                self._last.popitem(last=False)
+        return last is not None and last[0] == key and now - last[1] < self.window
+
+
+class FloodGuard:
+    """Ограничитель частоты и фильтр дублей вместе; exempt — чаты без ограничений (администратор)."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, duplicate_window=DEFAULT_DUPLICATE_WINDOW,
+                 max_chats=DEFAULT_MAX_CHATS, exempt=(), repeatable=()):
+        self.limiter = TokenBucketLimiter(rate, burst, max_chats)
+        self.duplicates = DuplicateFilter(duplicate_window, max_chats)
+        self.exempt = set(exempt)
+        self.repeatable = set(repeatable)  # тексты, которые можно повторять (кнопки меню)
+        self.dropped = 0
+        self._warned = OrderedDict()  # chat_id -> время последнего предупреждения
+        self._lock = threading.Lock()
+
+    def check(self, chat_id, text=None, now=None, awaiting_reply=None):
+        """Вернуть None, если апдейт можно обрабатывать, иначе причину: "rate" или "duplicate".
+        awaiting_reply(chat_id) — ждёт ли чат ответа на шаг диалога; вызывается только для дубля."""
+        if not chat_id or chat_id in self.exempt:
+            return None
+        # Дубль проверяется первым: повтор не должен расходовать токены
+        if (text and not self.is_repeatable(text) and self.duplicates.is_duplicate(chat_id, text, now)
+                and not (awaiting_reply and awaiting_reply(chat_id))):
+            reason = "duplicate"
+        elif not self.limiter.allow(chat_id, now):
+            reason = "rate"
+        else:
+            return None
+        with self._lock:
+            self.dropped += 1
+        return reason
+
+    def is_repeatable(self, text):
+        return text.startswith("/") or text in self.repeatable
+
+    def should_warn(self, chat_id, interval=60.0, now=None):
+        """Предупреждать о превышении лимита не чаще раза в interval секунд на чат."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last = self._warned.get(chat_id)
+            if last is not None and now - last < interval:
+                return False
+            self._warned[chat_id] = now
+            self._warned.move_to_end(chat_id)
+            if len(self._warned) > self.limiter.max_chats:
+                self._warned.popitem(last=False)
+            return True
+
+
+def update_text(update):
+    """Текст сообщения из апдейта-словаря (для фильтра дублей) или None."""
+    if "message" in update:
+        return update["message"].get("text")
+    return None
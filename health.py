@@ -0,0 +1,152 @@
+"""Признаки жизни бота: heartbeat циклов, перезапуск упавших фоновых потоков и /healthz.
+
+Циклы (polling, планировщик) отмечаются в Heartbeats на каждом проходе; отметка старше
+допустимого возраста означает, что цикл завис или умер. Фоновые потоки запускаются через
+ThreadSupervisor: упавший поток (необработанное исключение) пишется в лог и перезапускается
+при следующей проверке.
+
+Локальный HTTP-эндпоинт GET /healthz отдаёт JSON с возрастом отметок, задержкой апдейтов,
+состоянием потоков и последними запусками ежедневных задач: 200 — всё в порядке,
+503 — есть устаревшие отметки или мёртвые потоки (для systemd, Docker HEALTHCHECK, мониторинга).
+Настройки (.env): HEALTH_PORT (0 — эндпоинт выключен), HEALTH_HOST (по умолчанию только localhost).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8081
+SUPERVISE_INTERVAL = 10  # сек между проверками потоков
+
+logger = logging.getLogger("health")
+
+
+def update_lag(dates, now=None):
+    """Сколько секунд ждал самый старый апдейт пакета (dates — Unix-время сообщений).
+    Пустой пакет — очередь у Telegram пуста, задержки нет."""
+    if not dates:
+        return 0.0
+    return round(max(0.0, (now or time.time()) - min(dates)), 1)
+
+
+class Heartbeats:
+    """Отметки «цикл жив»: имя → время последнего прохода и сведения о нём."""
+
+    def __init__(self):
+        self._limits = {}  # имя → (допустимый возраст, сек; время регистрации)
+        self._beats = {}   # имя → (monotonic, Unix-время, сведения)
+        self._lock = threading.Lock()
+
+    def expect(self, name, max_age):
+        """Ожидать отметок name не реже чем раз в max_age секунд (отсчёт — с этого вызова)."""
+        with self._lock:
+            self._limits[name] = (max_age, time.monotonic())
+
+    def beat(self, name, **info):
+        with self._lock:
+            self._beats[name] = (time.monotonic(), time.time(), info)
+
+    def snapshot(self):
+        """{имя: {"age_s", "at", "stale", ...сведения}} для всех ожидаемых и отмеченных циклов."""
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for name in {**self._limits, **self._beats}:
+                max_age, since = self._limits.get(name, (None, now))
+                mono, at, info = self._beats.get(name, (None, None, {}))
+                age = now - (mono if mono is not None else since)
+                result[name] = {"age_s": round(age, 1), "at": at,
+                                "stale": max_age is not None and age > max_age, **info}
+            return result
+
+
+class ThreadSupervisor:
+    """Фоновые потоки-демоны, которые перезапускаются после падения."""
+
+    def __init__(self):
+        self._threads = {}  # имя → [функция, поток, число перезапусков]
+        self._lock = threading.Lock()
+
+    def start(self, name, target):
+        with self._lock:
+            self._threads[name] = [target, self._spawn(name, target), 0]
+
+    def _spawn(self, name, target):
+        def run():
+            try:
+                target()
+            except Exception:
+                logger.exception("Поток %s упал", name, extra={"thread_name": name})
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def check(self):
+        """Перезапустить завершившиеся потоки. Возвращает их имена."""
+        restarted = []
+        with self._lock:
+            for name, entry in self._threads.items():
+                if not entry[1].is_alive():
+                    entry[2] += 1
+                    logger.warning("Поток %s завершился, перезапуск", name,
+                                   extra={"thread_name": name, "restarts": entry[2]})
+                    entry[1] = self._spawn(name, entry[0])
+                    restarted.append(name)
+        return restarted
+
+    def run(self, interval=SUPERVISE_INTERVAL):
+        """Цикл проверки (запускается в отдельном потоке)."""
+        while True:
+            time.sleep(interval)
+            self.check()
+
+    def status(self):
+        with self._lock:
+            return {name: {"alive": thread.is_alive(), "restarts": restarts}
+                    for name, (_target, thread, restarts) in self._threads.items()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/healthz":
+            self.send_error(404)
+            return
+        try:
+            ok, report = self.server.report()
+        except Exception as e:
+            logger.exception("Ошибка построения /healthz")
+            ok, report = False, {"status": "error", "error": str(e)}
+        payload = json.dumps(report, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(200 if ok else 503)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def serve(report, host=None, port=None):
+    """Запустить /healthz в фоновом потоке. report() → (здоров ли, словарь отчёта).
+    Возвращает сервер или None, если эндпоинт выключен (HEALTH_PORT=0) или порт занят."""
+    host = host or os.getenv("HEALTH_HOST", DEFAULT_HOST)
+    port = int(os.getenv("HEALTH_PORT", DEFAULT_PORT)) if port is None else port
+    if port <= 0:
+        return None
+    try:
+        server = _Server((host, port), _Handler)
+    except OSError as e:
+        logger.warning("Эндпоинт /healthz не запущен: %s", e, extra={"host": host, "port": port})
+        return None
+    server.report = report
+    threading.Thread(target=server.serve_forever, name="healthz", daemon=True).start()
+    logger.info("Эндпоинт /healthz запущен", extra={"host": host, "port": server.server_address[1]})
+    return server
@@ -0,0 +1,136 @@
+"""Inline-режим: расписание любой группы в любом чате — «@бот ПИ-21», «@бот ПИ-21 2», «@бот ПИ».
+
+Результаты не зависят от пользователя, поэтому строятся заранее для всех групп сразу
+(ResultSet) и пересобираются только при смене расписания или даты. Каждый результат хранится
+уже сериализованным в JSON, так что ответ на запрос — поиск по словарю и склейка строк.
+Ответ помечается cache_time: Telegram сам отвечает на повторы того же запроса (от любых
+пользователей) и не присылает их боту. Пустой запрос — своя группа из профиля
+(личный результат, is_personal).
+
+Inline-режим включается у @BotFather командой /setinline.
+"""
+import threading
+from datetime import datetime, timedelta
+
+import telebot
+
+import timetable
+
+DEFAULT_CACHE_TIME = 300  # сек; INLINE_CACHE_TIME в .env
+PERSONAL_CACHE_TIME = 30  # пустой запрос (своя группа): кэш у Telegram отдельный для каждого
+MAX_RESULTS = 50          # ограничение Telegram на число результатов в одном ответе
+SUBGROUPS = (1, 2)
+
+DAY, TOMORROW, WEEK = "d", "t", "w"
+
+
+class PreparedResult(telebot.types.JsonSerializable):
+    """Результат inline-запроса, сериализованный один раз при построении набора."""
+
+    def __init__(self, result):
+        self._json = result.to_json()
+
+    def to_json(self):
+        return self._json
+
+
+def article(result_id, title, text, description=None):
+    return PreparedResult(telebot.types.InlineQueryResultArticle(
+        result_id, title, telebot.types.InputTextMessageContent(text, parse_mode="Markdown"),
+        description=description))
+
+
+def preview(classes):
+    """Описание результата: первые занятия дня одной строкой."""
+    lines = classes.splitlines()
+    if not lines:
+        return "нет занятий"
+    return "; ".join(lines[:2]) + (f" и ещё {len(lines) - 2}" if len(lines) > 2 else "")
+
+
+def group_subgroups(engine, group, today):
+    """Подгруппы группы с отдельными занятиями в окне расписания (как минимум первая)."""
+    subs = {lesson.subgroup for lesson in engine.between(group, today, engine.end)}
+    return [sub for sub in SUBGROUPS if sub in subs] or [SUBGROUPS[0]]
+
+
+def build_result_set(engine, today, render_weeks):
+    """ResultSet для всех групп engine. render_weeks(ключи) — сообщения /week для ключей
+    (группа, подгруппа, понедельник) одним пакетом (RenderPool.render_schedules)."""
+    tomorrow = today + timedelta(days=1)
+    monday = today - timedelta(days=today.weekday())
+    keys = [(group, sub) for group in engine.groups() for sub in group_subgroups(engine, group, today)]
+    weeks = render_weeks([(engine.names[group], sub, monday) for group, sub in keys])
+    groups = {}
+    for n, ((group, sub), week) in enumerate(zip(keys, weeks)):
+        name = engine.names[group]
+        results = []
+        for kind, day, label in ((DAY, today, "сегодня"), (TOMORROW, tomorrow, "завтра")):
+            classes = timetable.render_day(engine, name, sub, day)
+            results.append(article(f"{kind}{sub}.{n}", f"{name}, подгруппа {sub} — {label}",
+                                   timetable.format_day_message(name, sub, day, classes, today), preview(classes)))
+        results.append(article(f"{WEEK}{sub}.{n}", f"{name}, подгруппа {sub} — неделя",
+                               week or timetable.format_empty_week(name, sub, monday),
+                               f"{monday:%d.%m}–{monday + timedelta(days=5):%d.%m}"))
+        groups.setdefault(group, []).append((sub, results))
+    return ResultSet(engine, today, groups)
+
+
+def parse_query(query):
+    """«ПИ-21 2» → ("пи-21", 2); подгруппа None, если не указана."""
+    parts = (query or "").split()
+    sub = None
+    if len(parts) > 1 and parts[-1].isdigit():
+        sub = int(parts.pop())
+    return " ".join(parts).lower(), sub
+
+
+class ResultSet:
+    """Готовые результаты для всех групп: {группа: [(подгруппа, [сегодня, завтра, неделя]), ...]}."""
+
+    def __init__(self, engine, today, groups):
+        self.engine = engine
+        self.today = today
+        self.groups = groups
+        self.names = sorted(groups)
+
+    def search(self, query):
+        """Результаты для запроса: точное название группы — сегодня, завтра и неделя для каждой
+        подгруппы; начало названия — «сегодня» для всех подходящих групп."""
+        prefix, sub = parse_query(query)
+        if prefix in self.groups:
+            return [r for s, results in self.groups[prefix] if sub in (None, s) for r in results]
+        return [results[0] for name in self.names if name.startswith(prefix)
+                for s, results in self.groups[name] if sub in (None, s)]
+
+
+def cache_time(configured, now=None):
+    """cache_time для ответа: не дольше, чем до полуночи, — «сегодня» в кэше Telegram не
+    должно пережить смену даты."""
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(1, min(configured, int((midnight - now).total_seconds())))
+
+
+def page(results, offset):
+    """(результаты страницы, next_offset) для offset из запроса ("" — первая страница)."""
+    start = int(offset) if offset and offset.isdigit() else 0
+    end = start + MAX_RESULTS
+    return results[start:end], (str(end) if end < len(results) else "")
+
+
+class ResultCache:
+    """Последний построенный ResultSet; пересобирается, если сменились расписание или дата."""
+
+    def __init__(self):
+        self._set = None
+        self._lock = threading.Lock()
+
+    def get(self, engine, today, build):
+        result_set = self._set
+        if result_set is None or result_set.engine is not engine or result_set.today != today:
+            with self._lock:
+                result_set = self._set
+                if result_set is None or result_set.engine is not engine or result_set.today != today:
+                    result_set = self._set = build()
+        return result_set
@@ -0,0 +1,172 @@
+"""Структурированное логирование: JSON-записи, идентификатор апдейта и неблокирующая запись.
+
+Обработчики бота пишут в QueueHandler (быстрая постановка в очередь), а запись в файлы
+выполняет QueueListener в отдельном потоке. Файл логов ротируется по размеру; в консоль
+выводится краткая читаемая строка.
+
+Настройки (.env): LOG_FILE (по умолчанию logs/bot.log; пусто — только консоль), LOG_LEVEL,
+LOG_MAX_BYTES, LOG_BACKUPS.
+"""
+import atexit
+import copy
+import functools
+import json
+import logging
+import os
+import queue
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+DEFAULT_LOG_FILE = os.path.join("logs", "bot.log")
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+
+# Идентификатор обрабатываемого апдейта (корреляция всех записей одного апдейта)
+request_id = ContextVar("request_id", default=None)
+
+# Стандартные атрибуты LogRecord — всё остальное (extra=...) попадает в JSON как поля
+_STANDARD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id"}
+
+_listener = None
+
+
+def new_request_id():
+    """Начать новый апдейт: сгенерировать и установить идентификатор. Возвращает токен для reset."""
+    return request_id.set(uuid.uuid4().hex[:12])
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: ts, level, logger, msg, request_id и поля из extra."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        rid = getattr(record, "request_id", None)
+        if rid:
+            entry["request_id"] = rid
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ContextQueueHandler(QueueHandler):
+    """QueueHandler, который в потоке обработчика фиксирует request_id и текст исключения
+    (сам объект исключения в очередь не передаётся)."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.request_id = request_id.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def process_log_file(name):
+    """Отдельный файл лога для дочернего процесса («logs/bot.worker-0.log»): RotatingFileHandler
+    не согласует ротацию между процессами, поэтому общий файл пишет только главный процесс."""
+    log_file = os.getenv("LOG_FILE", DEFAULT_LOG_FILE)
+    if not log_file:
+        return ""
+    root, ext = os.path.splitext(log_file)
+    return f"{root}.{name}{ext}"
+
+
+def setup_logging(log_file=None, level=None, max_bytes=None, backups=None, console=True):
+    """Настроить корневой логгер (повторный вызов ничего не меняет). Возвращает QueueListener."""
+    global _listener
+    if _listener is not None:
+        return _listener
+    log_file = os.getenv("LOG_FILE", DEFAULT_LOG_FILE) if log_file is None else log_file
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    max_bytes = max_bytes or int(os.getenv("LOG_MAX_BYTES", DEFAULT_MAX_BYTES))
+    backups = backups if backups is not None else int(os.getenv("LOG_BACKUPS", DEFAULT_BACKUPS))
+
+    handlers = []
+    if log_file:
+        if os.path.dirname(log_file):
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        handlers.append(stream_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_ContextQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Дописать записи из очереди и остановить поток записи."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logged_handler(func, logger=None):
+    """Обернуть обработчик telebot: запись с именем обработчика, пользователем, временем
+    обработки и исходом (ok/error). Исключение записывается с трассировкой и пробрасывается дальше."""
+    logger = logger or logging.getLogger("bot.handlers")
+
+    @functools.wraps(func)
+    def wrapper(update, *args, **kwargs):
+        token = new_request_id() if request_id.get() is None else None
+        user_id = getattr(getattr(update, "from_user", None), "id", None)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = func(update, *args, **kwargs)
+            outcome = "ok"
+            return result
+        except Exception:
+            logger.exception("Ошибка в обработчике %s", func.__name__,
+                             extra={"handler": func.__name__, "user_id": user_id})
+            raise
+        finally:
+            logger.info("handled", extra={"handler": func.__name__, "user_id": user_id, "outcome": outcome,
+                                          "latency_ms": round((time.perf_counter() - started) * 1000, 2)})
+            if token is not None:
+                request_id.reset(token)
+
+    return wrapper
+
+
+def instrument_bot(bot):
+    """Обернуть logged_handler все зарегистрированные обработчики бота и будущие next-step обработчики."""
+    for name in dir(bot):
+        if name.endswith("_handlers") and isinstance(getattr(bot, name, None), list):
+            for handler in getattr(bot, name):
+                if isinstance(handler, dict) and "function" in handler and \
+                        not hasattr(handler["function"], "__wrapped__"):
+                    handler["function"] = logged_handler(handler["function"])
+
+    register = bot.register_next_step_handler
+
+    @functools.wraps(register)
+    def register_logged(message, callback, *args, **kwargs):
+        return register(message, logged_handler(callback), *args, **kwargs)
+
+    bot.register_next_step_handler = register_logged
@@ -0,0 +1,140 @@
+"""Навигация inline-кнопками: расписание по дням и неделям, постраничные новости и FAQ,
+журнал действий администратора (/audit).
+
+Нажатие кнопки редактирует то же сообщение (edit_message_text в bot.py), а не отправляет новое.
+callback_data компактна и версионирована: «<вид><версия>:<аргумент>», например «d1:261020» —
+расписание на 20.10.2026, «n1:2» — третья страница новостей. Группа и подгруппа в кнопку не
+пишутся: они читаются из профиля при нажатии. Кнопки старого формата (другая версия)
+распознаются, и пользователь получает подсказку повторить команду.
+"""
+from datetime import datetime, timedelta
+
+import telebot
+
+CALLBACK_VERSION = 1
+DAY, WEEK, NEWS, FAQ, AUDIT = "d", "w", "n", "f", "a"
+KINDS = (DAY, WEEK, NEWS, FAQ, AUDIT)
+MAX_CALLBACK_BYTES = 64  # ограничение Telegram на callback_data
+
+PAGE_SIZE = 5  # записей новостей и FAQ на странице
+# Сколько секунд клиент Telegram может кэшировать ответ на нажатие: повторные нажатия той же
+# кнопки в этом интервале не доходят до бота
+ANSWER_CACHE_TIME = 3
+
+SHORT_DAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+
+def pack(kind, arg):
+    """callback_data кнопки навигации."""
+    data = f"{kind}{CALLBACK_VERSION}:{arg}"
+    if len(data.encode("utf-8")) > MAX_CALLBACK_BYTES:
+        raise ValueError(f"callback_data длиннее {MAX_CALLBACK_BYTES} байт: {data}")
+    return data
+
+
+def unpack(data):
+    """(вид, аргумент) или None для кнопки другой версии; ValueError — не кнопка навигации."""
+    head, sep, arg = (data or "").partition(":")
+    if not sep or head[:1] not in KINDS or not head[1:].isdigit():
+        raise ValueError(f"не кнопка навигации: {data}")
+    if int(head[1:]) != CALLBACK_VERSION:
+        return None
+    return head[0], arg
+
+
+def is_navigation(data):
+    try:
+        unpack(data)
+    except ValueError:
+        return False
+    return True
+
+
+def pack_date(day):
+    return day.strftime("%y%m%d")
+
+
+def unpack_date(value):
+    return datetime.strptime(value, "%y%m%d").date()
+
+
+def page_count(total, size=PAGE_SIZE):
+    return max(1, -(-total // size))
+
+
+def _button(text, kind, arg):
+    return telebot.types.InlineKeyboardButton(text, callback_data=pack(kind, arg))
+
+
+def day_keyboard(day, today, covers):
+    """Кнопки «◀ вчера / Сегодня / завтра ▶» и переход к неделе.
+    covers(дата) — покрыта ли дата скомпилированным расписанием (за его пределы кнопок нет)."""
+    markup = telebot.types.InlineKeyboardMarkup()
+    row = []
+    prev_day, next_day = day - timedelta(days=1), day + timedelta(days=1)
+    if covers(prev_day):
+        row.append(_button(f"◀ {SHORT_DAYS[prev_day.weekday()]} {prev_day:%d.%m}", DAY, pack_date(prev_day)))
+    if day != today:
+        row.append(_button("Сегодня", DAY, pack_date(today)))
+    if covers(next_day):
+        row.append(_button(f"{SHORT_DAYS[next_day.weekday()]} {next_day:%d.%m} ▶", DAY, pack_date(next_day)))
+    markup.row(*row)
+    markup.row(_button("📅 Вся неделя", WEEK, pack_date(day)))
+    return markup
+
+
+def week_keyboard(monday, today, covers):
+    """Кнопки соседних недель и возврат к расписанию по дням."""
+    markup = telebot.types.InlineKeyboardMarkup()
+    row = []
+    prev_week, next_week = monday - timedelta(days=7), monday + timedelta(days=7)
+    if covers(prev_week):
+        row.append(_button(f"◀ {prev_week:%d.%m}", WEEK, pack_date(prev_week)))
+    if not monday <= today < next_week:
+        row.append(_button("Эта неделя", WEEK, pack_date(today)))
+    if covers(next_week):
+        row.append(_button(f"{next_week:%d.%m} ▶", WEEK, pack_date(next_week)))
+    markup.row(*row)
+    markup.row(_button("По дням", DAY, pack_date(today if monday <= today < next_week else monday)))
+    return markup
+
+
+def page_keyboard(kind, page, pages):
+    """Кнопки «◀ / ▶» для страницы page (с нуля) из pages; None, если страница одна."""
+    if pages <= 1:
+        return None
+    row = []
+    if page > 0:
+        row.append(_button("◀ Назад", kind, page - 1))
+    if page < pages - 1:
+        row.append(_button("Дальше ▶", kind, page + 1))
+    markup = telebot.types.InlineKeyboardMarkup()
+    markup.row(*row)
+    return markup
+
+
+def pack_audit(first, last, cursor=""):
+    """Аргумент кнопки журнала: период и курсор «b<ID>» (записи старше) или «a<ID>» (новее)."""
+    return f"{pack_date(first)}.{pack_date(last)}.{cursor}"
+
+
+def unpack_audit(arg):
+    """(первый день, последний день, курсор); ValueError — при ошибке."""
+    first, last, cursor = arg.split(".")
+    if cursor and (cursor[0] not in "ab" or not cursor[1:].isdigit()):
+        raise ValueError(f"неверный курсор журнала: {cursor}")
+    return unpack_date(first), unpack_date(last), cursor
+
+
+def audit_keyboard(first, last, rows, has_older, has_newer):
+    """Кнопки «◀ Новее / Раньше ▶» для страницы журнала rows (новые сверху); None — если листать некуда."""
+    row = []
+    if has_newer:
+        row.append(_button("◀ Новее", AUDIT, pack_audit(first, last, f"a{rows[0][0]}")))
+    if has_older:
+        row.append(_button("Раньше ▶", AUDIT, pack_audit(first, last, f"b{rows[-1][0]}")))
+    if not row:
+        return None
+    markup = telebot.types.InlineKeyboardMarkup()
+    markup.row(*row)
+    return markup
@@ -0,0 +1,137 @@
+"""Необязательный пул процессов для пакетного построения текстов (расписания, шаблоны).
+
+Построение текстов — чистый Python и держит GIL, поэтому большие пакеты (рассылка
+расписания тысячам пользователей) мешают интерактивным обработчикам. Пул выносит такие
+пакеты в отдельные процессы; маленькие пакеты строятся на месте — передача данных между
+процессами для них дороже самой работы (порог см. benchmarks/bench_render.py).
+
+Настройки (.env): RENDER_PROCESSES — число процессов (0 — пул выключен),
+RENDER_POOL_MIN_BATCH — минимальный размер пакета для пула.
+"""
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import timetable
+from schedule_engine import ScheduleEngine, empty_source
+
+DEFAULT_MIN_BATCH = 200
+
+# Скомпилированное расписание в процессе пула (задаётся инициализатором)
+_worker_engine = None
+
+
+def _init_worker(source, start, days):
+    global _worker_engine
+    _worker_engine = ScheduleEngine(source, start, days)
+
+
+def render_schedule_keys(engine, kind, keys):
+    """Построить тексты для списка ключей.
+    kind="day": ключи (группа, подгруппа, дата) → текст дня;
+    kind="week": ключи (группа, подгруппа, дата) → сообщение /week для недели с этой датой или None."""
+    if kind == "day":
+        return [timetable.render_day(engine, g, s, d) for g, s, d in keys]
+    if kind == "week":
+        parity = engine.week_parity if engine.uses_parity else (lambda d: None)
+        return [timetable.format_week_message(g, s, timetable.render_week(engine, g, s, d), parity(d),
+                                              d - timedelta(days=d.weekday()))
+                for g, s, d in keys]
+    raise ValueError(f"Неизвестный тип пакета: {kind}")
+
+
+def render_template_contexts(template, contexts):
+    """Подставить каждый словарь contexts в шаблон str.format."""
+    return [template.format_map(ctx) for ctx in contexts]
+
+
+def _render_schedule_chunk(kind, keys):
+    return render_schedule_keys(_worker_engine, kind, keys)
+
+
+def _chunks(items, n):
+    size = max(1, math.ceil(len(items) / n))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class RenderPool:
+    """Пакетное построение текстов: на месте или в пуле процессов (лениво создаваемом)."""
+
+    def __init__(self, processes=0, min_batch=DEFAULT_MIN_BATCH):
+        self.processes = processes
+        self.min_batch = min_batch
+        self._engine = ScheduleEngine(empty_source())
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def set_source(self, source, start=None, days=None):
+        """Задать исходные данные расписания (schedule_engine.ScheduleSource) и окно компиляции.
+        Пул пересоздаётся, чтобы его процессы скомпилировали то же расписание: новые пакеты
+        уходят в новый пул (создаётся лениво), а старый достраивает уже начатые пакеты
+        (рассылка, inline-режим в других потоках) и затем завершается."""
+        engine = ScheduleEngine(source, start, days or self._engine.days)
+        with self._lock:
+            self._engine = engine
+            old, self._executor = self._executor, None
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=False)
+        return engine
+
+    @property
+    def engine(self):
+        return self._engine
+
+    def use_pool(self, batch_size):
+        return self.processes > 0 and batch_size >= self.min_batch
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self._engine.source, self._engine.start, self._engine.days),
+                )
+            return self._executor
+
+    def warm_up(self):
+        """Запустить процессы пула заранее, чтобы первый пакет не ждал их старта."""
+        if self.processes > 0:
+            executor = self._get_executor()
+            list(executor.map(_render_schedule_chunk, ["day"] * self.processes, [[]] * self.processes))
+
+    def render_schedules(self, kind, keys):
+        """Построить тексты расписаний для ключей (см. render_schedule_keys), сохраняя порядок."""
+        keys = list(keys)
+        if not self.use_pool(len(keys)):
+            return render_schedule_keys(self._engine, kind, keys)
+        executor = self._get_executor()
+        chunks = _chunks(keys, self.processes * 4)
+        result = []
+        for part in executor.map(_render_schedule_chunk, [kind] * len(chunks), chunks):
+            result.extend(part)
+        return result
+
+    def render_templates(self, template, contexts):
+        """Подставить контексты в шаблон; большие пакеты — в пуле процессов."""
+        contexts = list(contexts)
+        if not self.use_pool(len(contexts)):
+            return render_template_contexts(template, contexts)
+        executor = self._get_executor()
+        chunks = _chunks(contexts, self.processes * 4)
+        result = []
+        for part in executor.map(render_template_contexts, [template] * len(chunks), chunks):
+            result.extend(part)
+        return result
+
+    def _shutdown_locked(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def shutdown(self):
+        with self._lock:
+            self._shutdown_locked()
@@ -0,0 +1,104 @@
+"""Политика хранения: перенос старых данных из рабочих таблиц в архивные (db.archive_rows).
+
+Правила (срок в днях, 0 — правило выключено; настраивается в .env):
+- вопросы, на которые ответили больше RETENTION_QUESTIONS_DAYS дней назад;
+- новости старше RETENTION_NEWS_DAYS дней;
+- закрытые заявки (выданные и отклонённые), не менявшиеся RETENTION_REQUESTS_DAYS дней.
+
+После переноса свободные страницы возвращаются ОС (incremental_vacuum). Архив остаётся
+доступен выгрузке (/export, столбец archived) и статистике (/stats) через представления *_all.
+Задача запускается планировщиком раз в сутки в RETENTION_TIME (ЧЧ:ММ).
+
+Базу, созданную до включения auto_vacuum, нужно один раз перевести в режим INCREMENTAL
+полным VACUUM — он блокирует базу на всё время перестройки, поэтому выполняется не ночной
+задачей, а вручную при остановленном боте:
+    python -m retention --enable-incremental-vacuum
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+
+import db
+import logs
+
+DEFAULT_QUESTIONS_DAYS = 90
+DEFAULT_NEWS_DAYS = 180
+DEFAULT_REQUESTS_DAYS = 180
+DEFAULT_TIME = "04:00"
+VACUUM_PAGES = 0  # сколько свободных страниц возвращать за запуск (0 — все)
+
+logger = logging.getLogger("retention")
+
+
+class RetentionRule(NamedTuple):
+    table: str
+    condition: str  # SQL-условие; последний параметр — смещение вида "-90 days"
+    params: tuple
+    days: int
+
+
+def closed_request_statuses():
+    return tuple(s for s in db.REQUEST_STATUSES.values() if s not in db.OPEN_REQUEST_STATUSES)
+
+
+def rules_from_env():
+    """Правила хранения с учётом настроек из окружения (выключенные правила не включаются)."""
+    closed = closed_request_statuses()
+    rules = [
+        RetentionRule("questions", "answered = 1 AND answered_at < datetime('now', ?)", (),
+                      int(os.getenv("RETENTION_QUESTIONS_DAYS", DEFAULT_QUESTIONS_DAYS))),
+        RetentionRule("news", "created_at < datetime('now', ?)", (),
+                      int(os.getenv("RETENTION_NEWS_DAYS", DEFAULT_NEWS_DAYS))),
+        RetentionRule("requests", f"status IN ({','.join('?' * len(closed))}) AND updated_at < datetime('now', ?)",
+                      closed, int(os.getenv("RETENTION_REQUESTS_DAYS", DEFAULT_REQUESTS_DAYS))),
+    ]
+    return [rule for rule in rules if rule.days > 0]
+
+
+def run_retention(rules=None, batch_size=db.ARCHIVE_BATCH, vacuum_pages=VACUUM_PAGES):
+    """Применить правила хранения и освободить место. Возвращает отчёт
+    {таблица: перенесено строк, ..., "freed_pages": n, "seconds": t}."""
+    started = time.perf_counter()
+    report = {}
+    for rule in rules_from_env() if rules is None else rules:
+        report[rule.table] = db.archive_rows(rule.table, rule.condition, (*rule.params, f"-{rule.days} days"),
+                                             batch_size)
+    if db.auto_vacuum_mode() == 2:
+        report["freed_pages"] = db.incremental_vacuum(vacuum_pages)
+    else:
+        # Без auto_vacuum=INCREMENTAL прагма ничего не освобождает; место переиспользуется базой
+        logger.warning("База не в режиме auto_vacuum=INCREMENTAL, место не возвращается ОС; "
+                       "выполните python -m retention --enable-incremental-vacuum при остановленном боте")
+        report["freed_pages"] = 0
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info("Архивация выполнена", extra={"retention": report})
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="перевести базу в auto_vacuum=INCREMENTAL (полный VACUUM)")
+    args = parser.parse_args(argv)
+    load_dotenv()
+    logs.setup_logging()
+    db.init_db()
+    if args.enable_incremental_vacuum:
+        if db.auto_vacuum_mode() == 2:
+            print("База уже в режиме auto_vacuum=INCREMENTAL")
+            return 0
+        started = time.perf_counter()
+        db.enable_incremental_vacuum()
+        print(f"База переведена в auto_vacuum=INCREMENTAL за {time.perf_counter() - started:.1f} с")
+        return 0
+    print(run_retention())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
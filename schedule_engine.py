@@ -0,0 +1,368 @@
+"""Движок расписания: базовая неделя, чётные/нечётные недели, замены по датам и праздники.
+
+Источник — книга schedule.xlsx:
+- лист Schedule (Group, Day, Time, Subgroup, Class и необязательный Week: «нечёт»/«чёт»,
+  odd/even, 1/2; пусто — каждую неделю); листы Odd/Even (или «Нечётная»/«Чётная») с теми же
+  столбцами задают занятия только своей недели;
+- лист Overrides (Date, Group, Time, Subgroup, Class) — разовые изменения: пустой Class или
+  «отмена» отменяет занятие в это время (без Time — весь день), иначе занятие в это время
+  заменяется указанным;
+- лист Holidays (Date, DateTo, Group, Name) — дни без занятий (без Group — для всех групп).
+
+Чётность недели считается от SEMESTER_START (первая неделя — нечётная). Источник
+компилируется в интервальный индекс на окно дат: для каждой группы — отсортированный список
+занятий с абсолютным временем начала в минутах, поэтому запросы «сегодня», «завтра», «неделя»,
+«сейчас» и «следующее занятие» выполняются бинарным поиском (O(log n) на группу); общий индекс
+всех групп по времени начала отвечает, какие группы на занятиях в момент T.
+"""
+import re
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+from timetable import WEEKDAY_NAMES, group_key
+
+DEFAULT_HORIZON_DAYS = 63  # окно компиляции: неделя назад и восемь недель вперёд
+MINUTES_PER_DAY = 24 * 60
+
+TIME_RANGE_RE = re.compile(r"^\s*(\d{1,2})[:.](\d{2})\s*[-–—]\s*(\d{1,2})[:.](\d{2})\s*$")
+CANCEL_WORDS = {"", "-", "—", "отмена", "отменено", "cancel", "cancelled"}
+
+
+class ScheduleSource(NamedTuple):
+    """Исходные данные расписания (только кортежи — передаётся в процессы пула)."""
+    lessons: tuple    # (группа, день недели, "ЧЧ:ММ-ЧЧ:ММ", подгруппа, предмет, чётность: None|1|0)
+    overrides: tuple  # (date, группа, время или None, подгруппа или None, предмет или None — отмена)
+    holidays: tuple   # (date с, date по, группа или None, название)
+    semester_start: date  # None — 1 сентября учебного года каждой даты (default_semester_start)
+
+
+class Lesson(NamedTuple):
+    start: int        # абсолютная минута: date.toordinal() * 1440 + минуты от полуночи
+    end: int
+    subgroup: int     # 0 — вся группа
+    time_range: str   # "08:30-10:00"
+    title: str
+
+    @property
+    def day(self):
+        return date.fromordinal(self.start // MINUTES_PER_DAY)
+
+
+def parse_time_range(text):
+    """«08:30-10:00» → (510, 600) минут от полуночи; ValueError — при неверном формате."""
+    match = TIME_RANGE_RE.match(str(text))
+    if not match:
+        raise ValueError(f"неверное время занятия: {text!r}")
+    h1, m1, h2, m2 = map(int, match.groups())
+    start, end = h1 * 60 + m1, h2 * 60 + m2
+    if not (0 <= start < end <= MINUTES_PER_DAY):
+        raise ValueError(f"неверное время занятия: {text!r}")
+    return start, end
+
+
+def minute_of(when):
+    """datetime → абсолютная минута (как Lesson.start)."""
+    return when.date().toordinal() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+
+
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_parity(value):
+    """Чётность недели из ячейки Week: 1 — нечётная, 0 — чётная, None — каждая неделя."""
+    text = str(value or "").strip().lower().replace("ё", "е")
+    if text in ("", "nan", "all", "каждая", "все"):
+        return None
+    if text.startswith("неч") or text in ("odd", "1", "н"):
+        return 1
+    if text.startswith("чет") or text in ("even", "2", "ч"):
+        return 0
+    raise ValueError(f"неизвестная чётность недели: {value!r}")
+
+
+def default_semester_start(today=None):
+    """1 сентября учебного года, в который попадает дата today (по умолчанию — сегодня)."""
+    today = today or date.today()
+    return date(today.year if today.month >= 9 else today.year - 1, 9, 1)
+
+
+def week_parity(day, semester_start):
+    """1 — нечётная неделя, 0 — чётная (неделя с semester_start — первая)."""
+    monday = day - timedelta(days=day.weekday())
+    first_monday = semester_start - timedelta(days=semester_start.weekday())
+    return ((monday - first_monday).days // 7 + 1) % 2
+
+
+class ScheduleEngine:
+    """Скомпилированное расписание на окно [start, start + days)."""
+
+    def __init__(self, source, start=None, days=DEFAULT_HORIZON_DAYS):
+        self.source = source
+        self.start = start or date.today() - timedelta(days=7)
+        self.days = days
+        self.names = {}      # ключ группы (timetable.group_key) -> название как в файле
+        self._starts = {}    # группа -> [Lesson.start, ...] (отсортировано)
+        self._lessons = {}   # группа -> [Lesson, ...] в том же порядке
+        self._compile()
+
+    @property
+    def end(self):
+        return self.start + timedelta(days=self.days)
+
+    def covers(self, day):
+        return self.start <= day < self.end
+
+    def groups(self):
+        return list(self._lessons)
+
+    def _compile(self):
+        weekly = {}  # (группа, номер дня недели) -> [(чётность, начало, конец, подгруппа, предмет)]
+        for group, day_name, time_range, subgroup, title, parity in self.source.lessons:
+            key = group_key(group)
+            self.names.setdefault(key, str(group))
+            start, end = parse_time_range(time_range)
+            weekly.setdefault((key, WEEKDAY_NAMES.index(day_name)), []).append(
+                (parity, start, end, int(subgroup or 0), str(title)))
+
+        overrides = {}  # (группа, дата) -> [(время или None, подгруппа или None, предмет или None)]
+        for day, group, time_range, subgroup, title in self.source.overrides:
+            key = group_key(group)
+            self.names.setdefault(key, str(group))
+            overrides.setdefault((key, day), []).append((time_range, subgroup, title))
+
+        holidays_all, holidays_group = set(), {}
+        for first, last, group, _name in self.source.holidays:
+            target = holidays_all if group is None else holidays_group.setdefault(group_key(group), set())
+            day = first
+            while day <= last:
+                target.add(day)
+                day += timedelta(days=1)
+
+        dates = [self.start + timedelta(days=i) for i in range(self.days)]
+        parities = {day: self.week_parity(day) for day in dates}
+        for group in self.names:
+            lessons = []
+            group_holidays = holidays_group.get(group, ())
+            for day in dates:
+                if day in holidays_all or day in group_holidays:
+                    continue
+                base = day.toordinal() * MINUTES_PER_DAY
+                day_lessons = [(s, e, sub, title)
+                               for parity, s, e, sub, title in weekly.get((group, day.weekday()), ())
+                               if parity is None or parity == parities[day]]
+                for time_range, subgroup, title in overrides.get((group, day), ()):
+                    day_lessons = apply_override(day_lessons, time_range, subgroup, title)
+                lessons.extend(Lesson(base + s, base + e, sub, f"{format_minutes(s)}-{format_minutes(e)}", title)
+                               for s, e, sub, title in day_lessons)
+            lessons.sort()
+            self._lessons[group] = lessons
+            self._starts[group] = [lesson.start for lesson in lessons]
+        # Общий индекс всех групп по времени начала — для запроса «кто на занятиях в момент T»
+        self._all = sorted((lesson, group) for group, lessons in self._lessons.items() for lesson in lessons)
+        self._all_starts = [lesson.start for lesson, _group in self._all]
+        self._max_duration = max((lesson.end - lesson.start for lesson, _group in self._all), default=0)
+
+    def _range(self, group_name, first, last):
+        """Занятия группы с началом в [first, last) (абсолютные минуты) — бинарным поиском."""
+        group = group_key(group_name)
+        starts = self._starts.get(group)
+        if not starts:
+            return []
+        return self._lessons[group][bisect_left(starts, first):bisect_left(starts, last)]
+
+    def between(self, group_name, first_day, last_day):
+        """Все занятия группы (любой подгруппы) с датами в [first_day, last_day)."""
+        return self._range(group_name, first_day.toordinal() * MINUTES_PER_DAY,
+                           last_day.toordinal() * MINUTES_PER_DAY)
+
+    @property
+    def uses_parity(self):
+        """Есть ли в расписании занятия только по чётным или нечётным неделям."""
+        return any(lesson[5] is not None for lesson in self.source.lessons)
+
+    def week_parity(self, day):
+        # Начало по умолчанию определяется для самой даты, а не один раз при чтении книги:
+        # иначе после 1 сентября чётность считалась бы от прошлого учебного года
+        return week_parity(day, self.source.semester_start or default_semester_start(day))
+
+    def lessons_on(self, group_name, subgroup, day):
+        """Занятия группы на дату: общие (подгруппа 0) и своей подгруппы."""
+        base = day.toordinal() * MINUTES_PER_DAY
+        subgroup = int(subgroup or 0)
+        return [lesson for lesson in self._range(group_name, base, base + MINUTES_PER_DAY)
+                if lesson.subgroup in (0, subgroup)]
+
+    def week_of(self, group_name, subgroup, day):
+        """Занятия недели, содержащей day: {дата понедельника..субботы: [Lesson, ...]}."""
+        monday = day - timedelta(days=day.weekday())
+        return {monday + timedelta(days=i): self.lessons_on(group_name, subgroup, monday + timedelta(days=i))
+                for i in range(6)}
+
+    def current_lessons(self, group_name, subgroup, when):
+        """Занятия группы, идущие в момент when (обычно одно)."""
+        now = minute_of(when)
+        subgroup = int(subgroup or 0)
+        return [lesson for lesson in self._range(group_name, now - self._max_duration, now + 1)
+                if lesson.end > now and lesson.subgroup in (0, subgroup)]
+
+    def groups_in_class(self, when):
+        """Все группы на занятиях в момент when: [(название группы, Lesson), ...].
+        Кандидаты — занятия, начавшиеся не раньше чем за максимальную длительность занятия до when
+        (бинарный поиск по общему индексу)."""
+        now = minute_of(when)
+        first = bisect_left(self._all_starts, now - self._max_duration)
+        last = bisect_left(self._all_starts, now + 1)
+        return [(self.names[group], lesson) for lesson, group in self._all[first:last] if lesson.end > now]
+
+    def next_lesson(self, group_name, subgroup, when):
+        """Ближайшее занятие, начинающееся не раньше when (datetime), или None в пределах окна."""
+        group = group_key(group_name)
+        starts = self._starts.get(group)
+        if not starts:
+            return None
+        subgroup = int(subgroup or 0)
+        now = minute_of(when)
+        lessons = self._lessons[group]
+        for i in range(bisect_left(starts, now), len(lessons)):
+            if lessons[i].subgroup in (0, subgroup):
+                return lessons[i]
+        return None
+
+
+def apply_override(day_lessons, time_range, subgroup, title):
+    """Применить разовое изменение к списку занятий дня [(начало, конец, подгруппа, предмет)].
+    Подгруппа не указана (или 0) — изменение касается всех занятий в это время, иначе только
+    занятий этой подгруппы."""
+    cancel = title is None or str(title).strip().lower() in CANCEL_WORDS
+    whole_group = subgroup in (None, 0)
+    if time_range is None:
+        if not cancel:
+            raise ValueError("для замены занятия нужно указать время")
+        return [] if whole_group else [l for l in day_lessons if l[2] != subgroup]
+    start, end = parse_time_range(time_range)
+    kept = [l for l in day_lessons if l[0] != start or not (whole_group or l[2] == subgroup)]
+    if not cancel:
+        kept.append((start, end, int(subgroup or 0), str(title)))
+    return kept
+
+
+def _cell(value):
+    """Значение ячейки pandas: NaN и пустые строки → None."""
+    if value is None or value != value:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _to_date(value):
+    value = _cell(value)
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if hasattr(value, "to_pydatetime"):
+        return value.to_pydatetime().date()
+    text = str(value)
+    for fmt in ("%Y-%m-%d", "%d.%m.%Y", "%d.%m.%y"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"неверная дата: {value!r}")
+
+
+def _sheets(book, *names):
+    """Листы книги с одним из имён (без учёта регистра)."""
+    wanted = {n.lower() for n in names}
+    return [df for name, df in book.items() if str(name).strip().lower() in wanted]
+
+
+def _strip_columns(df):
+    df = df.copy()
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+def read_workbook(path, semester_start=None):
+    """Прочитать книгу расписания в ScheduleSource.
+    FileNotFoundError — нет файла; KeyError — нет листа Schedule или нужных столбцов;
+    ValueError — неверное значение в ячейке (сообщение содержит лист и строку)."""
+    import pandas as pd
+
+    book = pd.read_excel(path, engine="openpyxl", sheet_name=None)
+    base = _sheets(book, "Schedule")
+    if not base:
+        raise KeyError(f"В файле {path} нет листа Schedule")
+    required = ["Group", "Day", "Time", "Subgroup", "Class"]
+    lessons = []
+    sheets = [("Schedule", base[0], None)]
+    sheets += [("Odd", df, 1) for df in _sheets(book, "Odd", "Нечётная", "Нечетная")]
+    sheets += [("Even", df, 0) for df in _sheets(book, "Even", "Чётная", "Четная")]
+    for sheet_name, df, sheet_parity in sheets:
+        df = _strip_columns(df)
+        missing = set(required) - set(df.columns)
+        if missing:
+            raise KeyError(f"В листе {sheet_name} файла {path} нет столбцов: {', '.join(sorted(missing))}")
+        has_week = "Week" in df.columns
+        for n, row in enumerate(df.itertuples(index=False), start=2):
+            row = row._asdict()
+            if _cell(row["Group"]) is None:
+                continue
+            try:
+                parity = sheet_parity if sheet_parity is not None else (parse_parity(row["Week"]) if has_week else None)
+                day_name = str(_cell(row["Day"]) or "").strip().capitalize()
+                if day_name not in WEEKDAY_NAMES:
+                    raise ValueError(f"неизвестный день недели: {row['Day']!r}")
+                time_range = str(_cell(row["Time"]) or "")
+                parse_time_range(time_range)
+            except ValueError as e:
+                raise ValueError(f"лист {sheet_name}, строка {n}: {e}") from None
+            lessons.append((str(row["Group"]).strip(), day_name, time_range, int(_cell(row["Subgroup"]) or 0),
+                            str(_cell(row["Class"]) or ""), parity))
+
+    overrides = []
+    for df in _sheets(book, "Overrides"):
+        df = _strip_columns(df)
+        for n, row in enumerate(df.itertuples(index=False), start=2):
+            row = row._asdict()
+            try:
+                day = _to_date(row.get("Date"))
+                group = _cell(row.get("Group"))
+                if day is None or group is None:
+                    continue
+                time_range = _cell(row.get("Time"))
+                if time_range is not None:
+                    parse_time_range(time_range)
+                subgroup = _cell(row.get("Subgroup"))
+                overrides.append((day, str(group).strip(), time_range,
+                                  None if subgroup is None else int(subgroup), _cell(row.get("Class"))))
+            except ValueError as e:
+                raise ValueError(f"лист Overrides, строка {n}: {e}") from None
+
+    holidays = []
+    for df in _sheets(book, "Holidays"):
+        df = _strip_columns(df)
+        for n, row in enumerate(df.itertuples(index=False), start=2):
+            row = row._asdict()
+            try:
+                first = _to_date(row.get("Date"))
+                if first is None:
+                    continue
+                last = _to_date(row.get("DateTo")) or first
+            except ValueError as e:
+                raise ValueError(f"лист Holidays, строка {n}: {e}") from None
+            group = _cell(row.get("Group"))
+            holidays.append((first, last, None if group is None else str(group).strip(),
+                             str(_cell(row.get("Name")) or "")))
+
+    return ScheduleSource(tuple(lessons), tuple(overrides), tuple(holidays), semester_start)
+
+
+def empty_source(semester_start=None):
+    return ScheduleSource((), (), (), semester_start)
@@ -0,0 +1,122 @@
+"""Поиск похожих вопросов: нормализация текста, шинглы, MinHash и LSH-индекс."""
+import re
+import threading
+import zlib
+
+# Мусорные слова, не влияющие на смысл вопроса
+STOPWORDS = {
+    "а", "и", "в", "во", "на", "по", "с", "со", "к", "ко", "у", "о", "об", "от", "до", "за", "из",
+    "ли", "же", "бы", "не", "то", "это", "пожалуйста", "подскажите", "скажите", "здравствуйте",
+    "привет", "добрый", "день", "вечер", "утро", "мне", "я", "мы", "вы",
+}
+
+NUM_HASHES = 32
+BANDS = 8  # 8 полос по 4 хеша: пары с Жаккаром ~0.6 попадают в кандидаты с вероятностью ~0.65
+ROWS = NUM_HASHES // BANDS
+_PRIME = (1 << 61) - 1
+# Фиксированные коэффициенты, чтобы сигнатуры не зависели от запуска процесса
+_COEFFS = [((i * 0x9E3779B97F4A7C15 + 0x632BE59BD9B4E019) % _PRIME | 1,
+            (i * 0xC2B2AE3D27D4EB4F + 0x165667B19E3779F9) % _PRIME) for i in range(1, NUM_HASHES + 1)]
+
+
+def normalize(text):
+    """Привести вопрос к каноническому виду: нижний регистр, «ё»→«е», без пунктуации и стоп-слов."""
+    text = (text or "").lower().replace("ё", "е")
+    words = [w for w in re.findall(r"\w+", text) if w not in STOPWORDS]
+    return " ".join(words)
+
+
+def shingles(text, k=3):
+    """Множество символьных k-грамм нормализованного текста."""
+    norm = normalize(text)
+    if len(norm) <= k:
+        return {norm} if norm else set()
+    return {norm[i:i + k] for i in range(len(norm) - k + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(shingle_set):
+    """MinHash-сигнатура множества шинглов (кортеж из NUM_HASHES чисел)."""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set] or [0]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _COEFFS)
+
+
+class SimilarityIndex:
+    """LSH-индекс по MinHash: быстро находит похожие элементы и их кластеры.
+
+    Кандидаты из общих LSH-полос проверяются точным коэффициентом Жаккара.
+    Потокобезопасен.
+    """
+
+    def __init__(self, threshold=0.6):
+        self.threshold = threshold
+        self._items = {}    # item_id -> (shingles, cluster_id, band_keys)
+        self._buckets = {}  # (номер полосы, значения полосы) -> set(item_id)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item_id):
+        return item_id in self._items
+
+    def ids(self):
+        with self._lock:
+            return list(self._items)
+
+    def _band_keys(self, sig):
+        return [(i, sig[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+
+    def find_cluster(self, text):
+        """Вернуть cluster_id самого похожего элемента (с Жаккаром ≥ threshold) или None."""
+        sh = shingles(text)
+        keys = self._band_keys(minhash(sh))
+        with self._lock:
+            return self._best_cluster(sh, keys)
+
+    def _best_cluster(self, sh, keys):
+        candidates = set()
+        for key in keys:
+            candidates |= self._buckets.get(key, set())
+        best, best_score = None, self.threshold
+        for cand in candidates:
+            cand_sh, cand_cluster, _ = self._items[cand]
+            score = jaccard(sh, cand_sh)
+            if score >= best_score:
+                best, best_score = cand_cluster, score
+        return best
+
+    def add(self, item_id, text, cluster_id=None):
+        """Добавить элемент. Если cluster_id не задан, он присоединяется к кластеру
+        самого похожего элемента или открывает новый кластер с cluster_id = item_id.
+        Возвращает итоговый cluster_id."""
+        sh = shingles(text)
+        keys = self._band_keys(minhash(sh))
+        with self._lock:
+            if cluster_id is None:
+                cluster_id = self._best_cluster(sh, keys)
+                if cluster_id is None:
+                    cluster_id = item_id
+            self._items[item_id] = (sh, cluster_id, keys)
+            for key in keys:
+                self._buckets.setdefault(key, set()).add(item_id)
+        return cluster_id
+
+    def remove(self, item_ids):
+        """Удалить элементы из индекса (например, отвеченные вопросы)."""
+        with self._lock:
+            for item_id in item_ids:
+                item = self._items.pop(item_id, None)
+                if not item:
+                    continue
+                for key in item[2]:
+                    bucket = self._buckets.get(key)
+                    if bucket:
+                        bucket.discard(item_id)
+                        if not bucket:
+                            del self._buckets[key]
@@ -0,0 +1,76 @@
+"""Фазы запуска бота: отложенная регистрация обработчиков и отчёт о времени запуска.
+
+bot.py при импорте только описывает обработчики (HandlerRegistry); бот, база и расписание
+создаются в bot.create_app() и при первом обращении. StartupTimer замеряет каждую фазу
+(импорт, база, бот, расписание, первый getUpdates), отчёт пишется в лог при запуске.
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("startup")
+
+
+class HandlerRegistry:
+    """Обработчики, описанные декораторами до создания бота; register(bot) регистрирует их
+    в том же порядке (порядок важен: первый подходящий обработчик выигрывает)."""
+
+    def __init__(self):
+        self.handlers = []  # (вид, функция, параметры фильтра)
+
+    def _add(self, kind, kwargs):
+        def decorator(func):
+            self.handlers.append((kind, func, kwargs))
+            return func
+        return decorator
+
+    def message_handler(self, **kwargs):
+        return self._add("message", kwargs)
+
+    def callback_query_handler(self, **kwargs):
+        return self._add("callback_query", kwargs)
+
+    def inline_handler(self, **kwargs):
+        return self._add("inline", kwargs)
+
+    def register(self, bot):
+        for kind, func, kwargs in self.handlers:
+            getattr(bot, f"register_{kind}_handler")(func, **kwargs)
+
+
+class StartupTimer:
+    """Длительность фаз запуска в порядке выполнения. Фаза с тем же именем (например,
+    повторная загрузка) не перезаписывает первую."""
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.phases = {}
+
+    def record(self, name, seconds):
+        self.phases.setdefault(name, seconds)
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        """{фаза: мс} и итог с момента started (включает время между фазами)."""
+        report = {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+        report["total"] = round(self.total() * 1000, 1)
+        return report
+
+    def format(self):
+        report = self.as_dict()
+        width = max(len(name) for name in report)
+        return "\n".join(f"{name.ljust(width)}  {ms:8.1f} мс" for name, ms in report.items())
+
+    def log(self):
+        logger.info("Время запуска: %s", ", ".join(f"{k}={v} мс" for k, v in self.as_dict().items()),
+                    extra={"startup_ms": self.as_dict()})
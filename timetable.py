@@ -0,0 +1,133 @@
+"""Построение текстов расписания по скомпилированному расписанию (без зависимостей от бота и pandas)."""
+from datetime import timedelta
+
+# Учебные дни недели (порядок вывода в /week)
+WEEK_DAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+# Названия дней по datetime.weekday()
+WEEKDAY_NAMES = WEEK_DAYS + ["Воскресенье"]
+
+
+def group_key(group_name):
+    """Ключ группы для сравнения: без лишних пробелов и без учёта регистра («Пи-21 » → «пи-21»).
+    Один и тот же для расписания (schedule_engine) и подписчиков (db.users.group_key)."""
+    return " ".join(str(group_name or "").split()).lower() or None
+
+
+def day_lines(engine, group_name, subgroup, day):
+    """Строки «08:30-10:00  Предмет» для группы на дату: общие занятия (Subgroup 0) и своей подгруппы.
+    engine — schedule_engine.ScheduleEngine."""
+    return [f"{lesson.time_range}  {lesson.title}" for lesson in engine.lessons_on(group_name, subgroup, day)]
+
+
+def render_day(engine, group_name, subgroup, day):
+    """Текст расписания на дату (пустая строка, если занятий нет)."""
+    return "\n".join(day_lines(engine, group_name, subgroup, day))
+
+
+def render_week(engine, group_name, subgroup, day):
+    """Расписание недели, содержащей day: {день недели: текст} (пустая строка для дней без занятий)."""
+    return {WEEKDAY_NAMES[d.weekday()]: "\n".join(f"{lesson.time_range}  {lesson.title}" for lesson in lessons)
+            for d, lessons in engine.week_of(group_name, subgroup, day).items()}
+
+
+def format_week_message(group_name, subgroup, week, parity=None, monday=None):
+    """Markdown-сообщение для /week или None, если на неделе нет занятий.
+    parity — 1 для нечётной недели, 0 для чётной (добавляется в заголовок);
+    monday — понедельник недели (даты в заголовках дней)."""
+    if not any(week.values()):
+        return None
+    label = {1: ", нечётная неделя", 0: ", чётная неделя"}.get(parity, "")
+    lines = [f"*Расписание на неделю ({group_name}, подгруппа {subgroup}){label}:*"]
+    for i, day in enumerate(WEEK_DAYS):
+        cls = week.get(day) or "_(нет занятий)_"
+        header = f"{day}, {monday + timedelta(days=i):%d.%m}" if monday else day
+        lines.append(f"\n*{header}:*\n{cls}")
+    return "\n".join(lines)
+
+
+def format_empty_week(group_name, subgroup, monday):
+    """Сообщение для недели без занятий (навигация по неделям)."""
+    return (f"*Расписание на неделю {monday:%d.%m}–{monday + timedelta(days=5):%d.%m} "
+            f"({group_name}, подгруппа {subgroup}):*\n_(нет занятий)_")
+
+
+def format_day_message(group_name, subgroup, day, classes, today):
+    """Markdown-сообщение расписания на дату (навигация по дням)."""
+    label = {0: " — сегодня", 1: " — завтра", -1: " — вчера"}.get((day - today).days, "")
+    return (f"*{WEEKDAY_NAMES[day.weekday()]}, {day:%d.%m}{label} ({group_name}, подгруппа {subgroup}):*\n"
+            f"{classes or '_(нет занятий)_'}")
+
+
+def format_daily_message(group_name, classes_today):
+    """Markdown-сообщение ежедневной рассылки расписания."""
+    return f"*Расписание на сегодня ({group_name}):*\n{classes_today}"
+
+
+def diff_schedules(old, new, first_day, days=14):
+    """Сравнить два скомпилированных расписания на days дней начиная с first_day
+    по ключам (группа в нижнем регистре, подгруппа, дата).
+    Возвращает ({ключ: (удалённые строки, добавленные строки)}, {группа в нижнем регистре: имя группы})
+    — только для изменившихся ключей; строки в формате «08:30-10:00  Предмет»."""
+    last_day = first_day + timedelta(days=days)
+    names = {**old.names, **new.names}
+
+    def group_lines(engine, group):
+        lines = {}
+        for lesson in engine.between(group, first_day, last_day):
+            lines.setdefault((group, lesson.subgroup, lesson.day), set()).add(f"{lesson.time_range}  {lesson.title}")
+        return lines
+
+    changes = {}
+    for group in names:
+        before, after = group_lines(old, group), group_lines(new, group)
+        for key in before.keys() | after.keys():
+            removed, added = before.get(key, set()), after.get(key, set())
+            if removed != added:
+                changes[key] = (sorted(removed - added), sorted(added - removed))
+    return changes, names
+
+
+def changes_for(changes, group_name, subgroup):
+    """Изменения, которые видит студент группы и подгруппы: {дата: (удалённые, добавленные)}
+    — общие занятия (подгруппа 0) и занятия своей подгруппы."""
+    group = group_key(group_name)
+    result = {}
+    for (g, sub, day), (removed, added) in changes.items():
+        if g == group and sub in (0, int(subgroup or 0)):
+            old_removed, old_added = result.get(day, ([], []))
+            result[day] = (sorted(old_removed + removed), sorted(old_added + added))
+    return result
+
+
+def format_changes_message(group_name, day_changes):
+    """Markdown-сообщение об изменениях расписания группы (только изменившиеся строки)."""
+    lines = [f"*Изменения в расписании ({group_name}):*"]
+    for day in sorted(day_changes):
+        removed, added = day_changes[day]
+        lines.append(f"\n*{WEEKDAY_NAMES[day.weekday()]}, {day:%d.%m}:*")
+        lines.extend(f"➖ {line}" for line in removed)
+        lines.extend(f"➕ {line}" for line in added)
+    return "\n".join(lines)
+
+
+def format_lesson(lesson, with_day=True):
+    """«Вторник, 20.10, 08:30-10:00 — Предмет» (или без дня)."""
+    text = f"{lesson.time_range} — {lesson.title}"
+    if with_day:
+        day = lesson.day
+        text = f"{WEEKDAY_NAMES[day.weekday()]}, {day:%d.%m}, {text}"
+    return text
+
+
+def format_duration(minutes):
+    """Длительность в минутах → «2 ч 15 мин», «40 мин»."""
+    hours, minutes = divmod(max(0, int(minutes)), 60)
+    days, hours = divmod(hours, 24)
+    parts = []
+    if days:
+        parts.append(f"{days} дн")
+    if hours:
+        parts.append(f"{hours} ч")
+    if minutes or not parts:
+        parts.append(f"{minutes} мин")
+    return " ".join(parts)
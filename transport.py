@@ -0,0 +1,64 @@
+"""HTTP-транспорт для вызовов Bot API: один общий requests.Session с пулом соединений.
+
+По умолчанию telebot создаёт отдельный Session в каждом потоке и пересоздаёт его раз в
+SESSION_TIME_TO_LIVE секунд, не закрывая старый. Здесь вместо этого ставится один Session
+на весь процесс (telebot.apihelper.session):
+- HTTPAdapter с пулом на POOL_SIZE соединений — keep-alive к api.telegram.org для всех потоков
+  (обработчики, рассылка, планировщик, long polling);
+- таймауты подключения и чтения, чтобы зависший запрос не держал поток обработчика;
+- повторы только при ошибке подключения (запрос ещё не ушёл). Повтора после таймаута чтения
+  и ответов 5xx нет: 502 шлюза может прийти, когда sendMessage уже выполнен, и пользователь
+  получил бы сообщение дважды. 429 тоже не повторяется здесь — его обрабатывает delivery.py.
+
+Настройки (.env): TELEGRAM_POOL_SIZE (0 — оставить транспорт telebot по умолчанию),
+TELEGRAM_CONNECT_TIMEOUT, TELEGRAM_READ_TIMEOUT (секунды), TELEGRAM_RETRIES.
+"""
+import logging
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 32
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 20.0  # getUpdates сам задаёт таймаут чтения под long polling
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF = 0.5  # пауза перед повтором: 0.5, 1, 2... сек
+
+logger = logging.getLogger("transport")
+
+
+def build_session(pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, backoff=RETRY_BACKOFF):
+    """Session с пулом на pool_size соединений к одному хосту и политикой повторов."""
+    retry = Retry(total=retries, connect=retries, read=0, status=0, other=0, backoff_factor=backoff,
+                  allowed_methods=None,  # telebot шлёт всё через POST; connect-повтор безопасен
+                  respect_retry_after_header=False, raise_on_status=False)
+    # pool_connections — сколько хостов держать (нужен один), pool_maxsize — соединений к хосту
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def install(session, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+    """Сделать session общим для всех вызовов telebot и задать таймауты по умолчанию."""
+    apihelper.session = session
+    apihelper.SESSION_TIME_TO_LIVE = None  # не пересоздавать: соединения живут в пуле
+    apihelper.CONNECT_TIMEOUT = connect_timeout
+    apihelper.READ_TIMEOUT = read_timeout
+    return session
+
+
+def configure_from_env():
+    """Настроить транспорт по .env. Возвращает Session или None (TELEGRAM_POOL_SIZE=0)."""
+    pool_size = int(os.getenv("TELEGRAM_POOL_SIZE", DEFAULT_POOL_SIZE))
+    if pool_size <= 0:
+        return None
+    session = install(build_session(pool_size, int(os.getenv("TELEGRAM_RETRIES", DEFAULT_RETRIES))),
+                      float(os.getenv("TELEGRAM_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+                      float(os.getenv("TELEGRAM_READ_TIMEOUT", DEFAULT_READ_TIMEOUT)))
+    logger.info("HTTP-транспорт настроен", extra={"pool_size": pool_size})
+    return session
@@ -0,0 +1,246 @@
+"""Многопроцессный режим бота: общий поллер, N процессов-обработчиков и общее состояние в SQLite.
+
+Запуск:
+    python -m workers --workers 4
+
+Схема работы:
+- поллер (роль с арендой "poller") получает апдейты через getUpdates и кладёт их в таблицу
+  update_queue; запустить второй экземпляр безопасно — он ждёт, пока аренда не освободится;
+- процессы-обработчики забирают апдейты из очереди (апдейты одного чата — строго по порядку)
+  и выполняют обычные обработчики bot.py;
+- планировщик ежедневных рассылок работает только у владельца аренды "scheduler" (см. bot.py);
+- SEND_RATE — общий предел для всех процессов: каждый отправляет не быстрее SEND_RATE / (N + 1);
+- состояние диалогов (temp_request) и next-step обработчики хранятся в SQLite, поэтому шаги
+  одного мастера заявки могут выполняться в разных процессах.
+
+Все экземпляры должны работать с одним файлом базы (один хост или общий локальный том).
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+import health
+import logs
+from delivery import DEFAULT_RATE
+from flood import update_text
+
+POLLER_LEASE_TTL = 60       # сек; продлевается на каждом цикле getUpdates
+LONG_POLLING_TIMEOUT = 20   # сек; меньше POLLER_LEASE_TTL
+STANDBY_SLEEP = 5           # как часто резервный экземпляр пытается взять аренду
+STALE_UPDATE_TIMEOUT = 300  # через сколько секунд апдейт упавшего обработчика вернётся в очередь
+IDLE_SLEEP = 0.05           # пауза обработчика при пустой очереди
+
+logger = logging.getLogger("workers")
+
+
+def instance_id():
+    """Уникальный идентификатор процесса для аренды ролей."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SharedState:
+    """Словарь состояний диалогов {chat_id: dict}, хранящийся в SQLite.
+
+    Поддерживает операции, которые использует bot.py: in, get, [], []=, pop, del.
+    Значения — обычные dict; изменения вложенного dict нужно сохранять присваиванием.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def __contains__(self, chat_id):
+        return self.db.get_conversation(chat_id) is not None
+
+    def __getitem__(self, chat_id):
+        data = self.db.get_conversation(chat_id)
+        if data is None:
+            raise KeyError(chat_id)
+        return data
+
+    def __setitem__(self, chat_id, data):
+        self.db.set_conversation(chat_id, data)
+
+    def __delitem__(self, chat_id):
+        if self.db.delete_conversation(chat_id) is None:
+            raise KeyError(chat_id)
+
+    def get(self, chat_id, default=None):
+        data = self.db.get_conversation(chat_id)
+        return default if data is None else data
+
+    def pop(self, chat_id, *default):
+        data = self.db.delete_conversation(chat_id)
+        if data is None:
+            if default:
+                return default[0]
+            raise KeyError(chat_id)
+        return data
+
+
+class SqliteHandlerBackend:
+    """Хранилище next-step обработчиков telebot в SQLite.
+
+    Обработчик сохраняется по имени функции; resolve(name) возвращает саму функцию
+    (в bot.py — поиск в globals()). Аргументы должны сериализоваться в JSON.
+    """
+
+    def __init__(self, db, resolve):
+        self.db = db
+        self.resolve = resolve
+
+    def register_handler(self, handler_group_id, handler):
+        self.db.add_next_step(handler_group_id, handler.callback.__name__,
+                              {"args": list(handler.args), "kwargs": handler.kwargs})
+
+    def clear_handlers(self, handler_group_id):
+        self.db.clear_next_steps(handler_group_id)
+
+    def has_handlers(self, handler_group_id):
+        return self.db.has_next_steps(handler_group_id)
+
+    def get_handlers(self, handler_group_id):
+        steps = self.db.pop_next_steps(handler_group_id)
+        if not steps:
+            return None
+        return [{"callback": self.resolve(name), "args": tuple(a["args"]), "kwargs": a["kwargs"]}
+                for name, a in steps]
+
+
+def update_chat_id(update):
+    """chat_id апдейта (для упорядочивания по чатам); 0 — если чата нет."""
+    for key in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if key in update:
+            return update[key]["chat"]["id"]
+    if "callback_query" in update:
+        cq = update["callback_query"]
+        if cq.get("message"):
+            return cq["message"]["chat"]["id"]
+        return cq["from"]["id"]
+    for key in ("inline_query", "chosen_inline_result", "my_chat_member", "chat_member"):
+        if key in update:
+            return update[key]["from"]["id"]
+    return 0
+
+
+def accept_update(app, update):
+    """Проверка апдейта защитой от флуда (flood.py) перед постановкой в очередь."""
+    chat_id = update_chat_id(update)
+    reason = app.flood_guard.check(chat_id, update_text(update), awaiting_reply=app.awaiting_reply)
+    if reason == "rate" and app.flood_guard.should_warn(chat_id):
+        app.sender.submit(chat_id, app.FLOOD_WARNING)
+    return reason is None
+
+
+def run_poller(app, owner, supervise=None):
+    """Цикл поллера: пока экземпляр владеет арендой "poller", переносит апдейты в очередь.
+    supervise() вызывается на каждом цикле (перезапуск упавших обработчиков)."""
+    import telebot
+
+    db = app.db
+    while True:
+        if supervise:
+            supervise()
+        if not db.acquire_lease("poller", owner, POLLER_LEASE_TTL):
+            app.heartbeats.beat("polling", leader=False)
+            time.sleep(STANDBY_SLEEP)
+            continue
+        offset = int(db.get_state_value("updates_offset", "0")) or None
+        try:
+            updates = telebot.apihelper.get_updates(app.bot.token, offset=offset,
+                                                    long_polling_timeout=LONG_POLLING_TIMEOUT)
+        except Exception as e:
+            logger.warning("Ошибка getUpdates: %s", e)
+            time.sleep(3)
+            continue
+        app.heartbeats.beat("polling", leader=True, updates=len(updates),
+                            lag_s=health.update_lag([u["message"]["date"] for u in updates if "message" in u]))
+        if updates:
+            # Флуд отбрасывается до записи в очередь; смещение сдвигается и за отброшенные апдейты
+            accepted = [u for u in updates if accept_update(app, u)]
+            db.enqueue_updates([(u["update_id"], update_chat_id(u), json.dumps(u, ensure_ascii=False))
+                                for u in accepted], updates[-1]["update_id"] + 1)
+        db.requeue_stale_updates(STALE_UPDATE_TIMEOUT)
+
+
+def worker_main(worker_no):
+    """Точка входа процесса-обработчика."""
+    import telebot
+
+    logs.setup_logging(log_file=logs.process_log_file(f"worker-{worker_no}"))
+    import bot as app
+
+    # Апдейты в очереди уже проверены защитой от флуда поллером (accept_update)
+    app.create_app(flood_middleware=False)
+    app.get_render_pool()
+    app.startup_timer.log()
+    app.bot.threaded = False  # апдейт должен быть обработан до удаления из очереди
+    threading.Thread(target=app.watch_schedule_file, daemon=True).start()
+    owner = f"{instance_id()}/w{worker_no}"
+    while True:
+        item = app.db.claim_update(owner)
+        if not item:
+            time.sleep(IDLE_SLEEP)
+            continue
+        update_id, payload = item
+        token = logs.request_id.set(f"u{update_id}")
+        try:
+            app.bot.process_new_updates([telebot.types.Update.de_json(payload)])
+        except Exception:
+            logger.exception("Ошибка обработки апдейта %s", update_id, extra={"update_id": update_id})
+        finally:
+            app.db.finish_update(update_id)
+            logs.request_id.reset(token)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", os.cpu_count() or 2)),
+                        help="число процессов-обработчиков")
+    args = parser.parse_args(argv)
+
+    # Дочерние процессы наследуют окружение: все используют общее состояние в SQLite
+    os.environ["STATE_BACKEND"] = "sqlite"
+    # Лимит Telegram — на бота, а очередь рассылки (RateLimitedSender) есть в каждом процессе:
+    # поллере (планировщик) и обработчиках. SEND_RATE делится между ними поровну
+    os.environ["SEND_RATE"] = str(float(os.getenv("SEND_RATE", DEFAULT_RATE)) / (args.workers + 1))
+    logs.setup_logging()
+    ctx = multiprocessing.get_context("spawn")
+    procs = {}
+
+    def start_worker(n):
+        p = ctx.Process(target=worker_main, args=(n,), name=f"worker-{n}", daemon=True)
+        p.start()
+        procs[n] = p
+
+    def supervise():
+        for n, p in list(procs.items()):
+            if not p.is_alive():
+                logger.warning("Обработчик %s завершился (код %s), перезапуск", n, p.exitcode)
+                start_worker(n)
+
+    for n in range(args.workers):
+        start_worker(n)
+
+    import bot as app
+
+    app.create_app()
+    app.get_render_pool()
+    app.startup_timer.log()
+    app.start_background()
+    owner = instance_id()
+    logger.info("Бот запущен: %s обработчиков, экземпляр %s", args.workers, owner)
+    try:
+        run_poller(app, owner, supervise)
+    finally:
+        app.db.release_lease("poller", owner)
+        app.db.release_lease("scheduler", owner)
+
+
+if __name__ == "__main__":
+    sys.exit(main())